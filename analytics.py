@@ -0,0 +1,303 @@
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+from store import CATEGORIES, iso_date
+
+# Per-user columnar copies of the expense history for analytics that the
+# rollup tables cannot answer (percentiles, top-N, arbitrary group-bys).
+# Each user's expenses in the store's default currency are held as parallel
+# NumPy arrays, about 17 bytes per row, loaded on first use and patched by
+# the store's write notifications. Amounts are int64 minor units; sums go
+# through float64 bincounts, which stay exact below 2**53 minor units.
+# Least recently used users are dropped once the cache exceeds its budget.
+CACHE_BYTES = 64 << 20
+LOAD_BATCH = 20_000
+LOAD_ATTEMPTS = 3
+GROUP_KEYS = ["category", "day", "month", "weekday"]
+WEEKDAYS = ["Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun"]
+
+
+def _day_numbers(dates):
+    try:
+        return np.array(dates, dtype="datetime64[D]").astype(np.int32)
+    except ValueError:
+        # A database not yet through the store's ISO-date migration can still
+        # hold dates like 2024-1-5.
+        return np.array([iso_date(d) for d in dates], dtype="datetime64[D]").astype(np.int32)
+
+
+def _day_number(date):
+    try:
+        return int(np.datetime64(date, "D").astype(np.int64))
+    except ValueError:
+        return int(np.datetime64(iso_date(date), "D").astype(np.int64))
+
+
+class UserColumns:
+    # ids ascending (expense ids only grow, so appends keep them sorted),
+    # days as int32 days since 1970-01-01, categories as uint8 codes into
+    # the cache's category list, amounts as int64 minor units. Arrays are over-allocated so single inserts
+    # append in place; only the first n entries are live. Appends only write
+    # past n, and updates and deletes replace the arrays, so a view handed
+    # out earlier never changes under a worker thread still reading it.
+    def __init__(self, ids, days, codes, amounts):
+        self.n = len(ids)
+        self.ids = ids
+        self.days = days
+        self.codes = codes
+        self.amounts = amounts
+
+    @property
+    def nbytes(self):
+        return self.ids.nbytes + self.days.nbytes + self.codes.nbytes + self.amounts.nbytes
+
+    def view(self):
+        n = self.n
+        return self.ids[:n], self.days[:n], self.codes[:n], self.amounts[:n]
+
+    def _find(self, expense_id):
+        i = int(np.searchsorted(self.ids[:self.n], expense_id))
+        return i if i < self.n and self.ids[i] == expense_id else None
+
+    def append(self, expense_id, day, code, amount):
+        if self.n and expense_id <= self.ids[self.n - 1]:
+            return False
+        if self.n == len(self.ids):
+            capacity = max(16, self.n * 2)
+            for name in ("ids", "days", "codes", "amounts"):
+                old = getattr(self, name)
+                grown = np.empty(capacity, dtype=old.dtype)
+                grown[:self.n] = old[:self.n]
+                setattr(self, name, grown)
+        n = self.n
+        self.ids[n], self.days[n], self.codes[n], self.amounts[n] = expense_id, day, code, amount
+        self.n += 1
+        return True
+
+    def update(self, expense_id, day, code, amount):
+        i = self._find(expense_id)
+        if i is None:
+            return False
+        self.days, self.codes, self.amounts = self.days.copy(), self.codes.copy(), self.amounts.copy()
+        self.days[i], self.codes[i], self.amounts[i] = day, code, amount
+        return True
+
+    def delete(self, expense_id):
+        i = self._find(expense_id)
+        if i is None:
+            return False
+        n = self.n
+        for name in ("ids", "days", "codes", "amounts"):
+            setattr(self, name, np.delete(getattr(self, name)[:n], i))
+        self.n -= 1
+        return True
+
+
+class ColumnarCache:
+    def __init__(self, store, max_bytes=CACHE_BYTES):
+        self.store = store
+        self.currency = store.currency
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        self.users = OrderedDict()
+        # Bumped by every write notification for a user, so a load that
+        # raced with a write is thrown away instead of cached stale; epoch is
+        # bumped when every user may have changed.
+        self.generations = {}
+        self.epoch = 0
+        self.categories = list(CATEGORIES)
+        self.codes = {name: i for i, name in enumerate(self.categories)}
+        store.listeners.append(self._on_write)
+
+    def close(self):
+        if self._on_write in self.store.listeners:
+            self.store.listeners.remove(self._on_write)
+        with self.lock:
+            self.users.clear()
+
+    @property
+    def nbytes(self):
+        with self.lock:
+            return sum(cols.nbytes for cols in self.users.values())
+
+    def _code(self, category):
+        # Called with self.lock held.
+        code = self.codes.get(category)
+        if code is None:
+            if len(self.categories) >= 255:
+                raise ValueError("too many distinct categories for the analytics cache")
+            code = self.codes[category] = len(self.categories)
+            self.categories.append(category)
+        return code
+
+    # ---- Loading ----
+    def _load(self, user):
+        ids, dates, categories, amounts = [], [], [], []
+        for batch in self.store.iter_expense_batches(user, LOAD_BATCH):
+            batch = [r for r in batch if r[5] == self.currency]
+            if not batch:
+                continue
+            batch_ids, batch_dates, batch_cats, _, batch_amounts, _ = zip(*batch)
+            ids.append(np.array(batch_ids, dtype=np.int64))
+            dates.append(_day_numbers(batch_dates))
+            categories.append(batch_cats)
+            amounts.append(np.array(batch_amounts, dtype=np.int64))
+        if not ids:
+            empty = np.empty(0, dtype=np.int64)
+            return empty, np.empty(0, dtype=np.int32), np.empty(0, dtype=np.uint8), np.empty(0, dtype=np.int64), []
+        ids = np.concatenate(ids)
+        order = np.argsort(ids, kind="stable")
+        return (ids[order], np.concatenate(dates)[order], order, np.concatenate(amounts)[order],
+                [c for batch in categories for c in batch])
+
+    def columns(self, user):
+        # Returns (ids, days, codes, amounts) arrays for `user`, loading
+        # them on first use. The arrays must be treated as read-only.
+        with self.lock:
+            cols = self.users.get(user)
+            if cols is not None:
+                self.users.move_to_end(user)
+                return cols.view()
+        for _ in range(LOAD_ATTEMPTS):
+            with self.lock:
+                generation = (self.epoch, self.generations.get(user, 0))
+            ids, days, order, amounts, categories = self._load(user)
+            with self.lock:
+                codes = np.array([self._code(c) for c in categories], dtype=np.uint8)
+                codes = codes[order] if len(codes) else np.empty(0, dtype=np.uint8)
+                cols = UserColumns(ids, days, codes, amounts)
+                if (self.epoch, self.generations.get(user, 0)) != generation:
+                    continue
+                self.users[user] = cols
+                self._evict(keep=user)
+                return cols.view()
+        # Writes kept landing mid-load; answer from the last load uncached.
+        return cols.view()
+
+    def _evict(self, keep):
+        total = sum(cols.nbytes for cols in self.users.values())
+        while total > self.max_bytes and len(self.users) > 1:
+            user = next(iter(self.users))
+            if user == keep:
+                self.users.move_to_end(user)
+                continue
+            total -= self.users.pop(user).nbytes
+
+    # ---- Write notifications ----
+    def _on_write(self, event, user, *details):
+        with self.lock:
+            if user is None:
+                self.users.clear()
+                self.epoch += 1
+                return
+            self.generations[user] = self.generations.get(user, 0) + 1
+            cols = self.users.get(user)
+            if cols is None:
+                return
+            patched = False
+            if event in ("insert", "update"):
+                expense_id, date, category, amount, currency = details[0]
+                if currency != self.currency:
+                    # Only the default currency is cached; an update may have
+                    # moved the expense out of it.
+                    if event == "update":
+                        cols.delete(expense_id)
+                    patched = True
+                else:
+                    args = (expense_id, _day_number(date), self._code(category), amount)
+                    patched = cols.append(*args) if event == "insert" else cols.update(*args)
+            elif event == "delete":
+                patched = cols.delete(details[0])
+            if not patched:
+                del self.users[user]
+
+    # ---- Analytics ----
+    def _select(self, user, start=None, end=None, category=None):
+        ids, days, codes, amounts = self.columns(user)
+        mask = None
+        if start is not None:
+            mask = days >= _day_number(start)
+        if end is not None:
+            upper = days <= _day_number(end)
+            mask = upper if mask is None else mask & upper
+        if category is not None:
+            with self.lock:
+                code = self.codes.get(category.strip().title(), -1)
+            match = codes == code
+            mask = match if mask is None else mask & match
+        if mask is None:
+            return ids, days, codes, amounts
+        return ids[mask], days[mask], codes[mask], amounts[mask]
+
+    def summary(self, user, start=None, end=None):
+        # (total, count, [(category, total), ...]) for the range.
+        _, _, codes, amounts = self._select(user, start, end)
+        sums = np.bincount(codes, weights=amounts, minlength=len(self.categories))
+        return (int(amounts.sum()), int(len(amounts)),
+                [(self.categories[i], int(sums[i])) for i in np.flatnonzero(sums)])
+
+    def group_by(self, user, key="category", start=None, end=None, category=None):
+        # [(group, total, count), ...] ordered by group. Day groups are
+        # YYYY-MM-DD strings, months YYYY-MM, weekdays Mon..Sun.
+        if key not in GROUP_KEYS:
+            raise ValueError(f"key must be one of {', '.join(GROUP_KEYS)}")
+        _, days, codes, amounts = self._select(user, start, end, category)
+        if key == "category":
+            groups, labels = codes.astype(np.int64), self.categories
+        elif key == "weekday":
+            # Day 0 (1970-01-01) was a Thursday.
+            groups, labels = (days.astype(np.int64) + 3) % 7, WEEKDAYS
+        elif key == "month":
+            groups = days.astype("datetime64[D]").astype("datetime64[M]").astype(np.int64)
+            labels = None
+        else:
+            groups, labels = days.astype(np.int64), None
+        keys, inverse = np.unique(groups, return_inverse=True)
+        totals = np.bincount(inverse, weights=amounts, minlength=len(keys))
+        counts = np.bincount(inverse, minlength=len(keys))
+        if labels is not None:
+            names = [labels[k] for k in keys]
+        elif key == "month":
+            names = keys.astype("datetime64[M]").astype(str).tolist()
+        else:
+            names = keys.astype("datetime64[D]").astype(str).tolist()
+        return [(name, int(t), int(c)) for name, t, c in zip(names, totals, counts)]
+
+    def percentiles(self, user, qs=(50, 90, 99), start=None, end=None, category=None):
+        # {q: amount} over individual expense amounts, rounded to the minor
+        # unit; empty when none match.
+        amounts = self._select(user, start, end, category)[3]
+        if not len(amounts):
+            return {}
+        return {q: int(round(v)) for q, v in zip(qs, np.percentile(amounts, qs))}
+
+    def top_n(self, user, n=10, start=None, end=None, category=None):
+        # The n largest expenses as (id, date, category, amount), largest first.
+        ids, days, codes, amounts = self._select(user, start, end, category)
+        if not len(amounts):
+            return []
+        n = min(n, len(amounts))
+        idx = np.argpartition(amounts, len(amounts) - n)[-n:]
+        idx = idx[np.argsort(amounts[idx], kind="stable")[::-1]]
+        dates = days[idx].astype("datetime64[D]").astype(str).tolist()
+        return [(int(ids[i]), d, self.categories[codes[i]], int(amounts[i])) for i, d in zip(idx, dates)]
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_cache(store):
+    # One cache per store; None when the store cannot notify it of writes
+    # (service.RemoteStore), since a cache there would silently go stale.
+    global _cache
+    if not hasattr(store, "listeners"):
+        return None
+    with _cache_lock:
+        if _cache is None or _cache.store is not store:
+            if _cache is not None:
+                _cache.close()
+            _cache = ColumnarCache(store)
+        return _cache
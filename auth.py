@@ -0,0 +1,172 @@
+import base64
+import hashlib
+import hmac
+import json
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+
+# Default cost parameters. benchmarks/kdf.py measures this machine and can
+# store tuned values in the database's settings table under KDF_SETTING.
+DEFAULT_PARAMS = {"algorithm": "scrypt", "n": 2 ** 14, "r": 8, "p": 1}
+PBKDF2_PARAMS = {"algorithm": "pbkdf2_sha256", "iterations": 600_000}
+KDF_SETTING = "kdf_params"
+SALT_BYTES = 16
+HASH_BYTES = 32
+
+# Login throttling: after MAX_FAILURES failed attempts for a username within
+# FAILURE_WINDOW seconds, further attempts are refused until the oldest one
+# ages out. Only the most recent TRACKED_USERS usernames are remembered.
+MAX_FAILURES = 5
+FAILURE_WINDOW = 300
+TRACKED_USERS = 10_000
+
+
+class LoginThrottled(Exception):
+    def __init__(self, retry_after):
+        super().__init__(f"Too many failed attempts. Try again in {int(retry_after) + 1} seconds.")
+        self.retry_after = retry_after
+
+
+# ---------------- Hashing ----------------
+def _b64(data):
+    return base64.b64encode(data).decode("ascii")
+
+
+def _unb64(text):
+    return base64.b64decode(text.encode("ascii"))
+
+
+def default_params():
+    return dict(DEFAULT_PARAMS) if hasattr(hashlib, "scrypt") else dict(PBKDF2_PARAMS)
+
+
+def _derive(password, salt, params):
+    secret = password.encode("utf-8")
+    if params["algorithm"] == "scrypt":
+        n, r, p = params["n"], params["r"], params["p"]
+        return hashlib.scrypt(secret, salt=salt, n=n, r=r, p=p, dklen=HASH_BYTES,
+                              maxmem=2 * 128 * n * r * p + (1 << 20))
+    return hashlib.pbkdf2_hmac("sha256", secret, salt, params["iterations"], dklen=HASH_BYTES)
+
+
+def _encode_params(params):
+    if params["algorithm"] == "scrypt":
+        return f"scrypt${params['n']}${params['r']}${params['p']}"
+    return f"pbkdf2_sha256${params['iterations']}"
+
+
+def _parse(stored):
+    # Returns (params, salt, digest), or None for a legacy plaintext value.
+    parts = stored.split("$")
+    try:
+        if parts[0] == "scrypt" and len(parts) == 6:
+            params = {"algorithm": "scrypt", "n": int(parts[1]), "r": int(parts[2]), "p": int(parts[3])}
+        elif parts[0] == "pbkdf2_sha256" and len(parts) == 4:
+            params = {"algorithm": "pbkdf2_sha256", "iterations": int(parts[1])}
+        else:
+            return None
+        return params, _unb64(parts[-2]), _unb64(parts[-1])
+    except ValueError:
+        return None
+
+
+def hash_password(password, params=None):
+    params = params or default_params()
+    salt = os.urandom(SALT_BYTES)
+    return f"{_encode_params(params)}${_b64(salt)}${_b64(_derive(password, salt, params))}"
+
+
+def verify_password(password, stored, params=None):
+    # Returns (ok, needs_rehash). Plaintext rows left over from before
+    # hashing was introduced verify by constant-time comparison and always
+    # need a rehash; hashes made with other cost parameters do too.
+    parsed = _parse(stored)
+    if parsed is None:
+        return hmac.compare_digest(password.encode("utf-8"), stored.encode("utf-8")), True
+    stored_params, salt, digest = parsed
+    ok = hmac.compare_digest(_derive(password, salt, stored_params), digest)
+    return ok, stored_params != (params or default_params())
+
+
+# ---------------- Throttling ----------------
+class LoginThrottle:
+    def __init__(self, max_failures=MAX_FAILURES, window=FAILURE_WINDOW, tracked=TRACKED_USERS):
+        self.max_failures = max_failures
+        self.window = window
+        self.tracked = tracked
+        self.failures = OrderedDict()
+        self.lock = threading.Lock()
+
+    def check(self, username):
+        now = time.monotonic()
+        with self.lock:
+            attempts = self.failures.get(username)
+            if not attempts:
+                return
+            while attempts and now - attempts[0] > self.window:
+                attempts.popleft()
+            if len(attempts) >= self.max_failures:
+                raise LoginThrottled(self.window - (now - attempts[0]))
+
+    def record_failure(self, username):
+        with self.lock:
+            attempts = self.failures.pop(username, None) or deque(maxlen=self.max_failures)
+            attempts.append(time.monotonic())
+            self.failures[username] = attempts
+            while len(self.failures) > self.tracked:
+                self.failures.popitem(last=False)
+
+    def clear(self, username):
+        with self.lock:
+            self.failures.pop(username, None)
+
+
+# ---------------- Authenticator ----------------
+class Authenticator:
+    # login() and register() run the KDF, so call them off the Tk thread
+    # (see background.TkExecutor); they only touch the store and throttle.
+    def __init__(self, store, throttle=None):
+        self.store = store
+        self.throttle = throttle or LoginThrottle()
+        stored = store.get_setting(KDF_SETTING)
+        self.params = json.loads(stored) if stored else default_params()
+        # Unknown usernames are checked against this so they cost the same
+        # as a wrong password and do not reveal which accounts exist.
+        self._dummy = hash_password("", self.params)
+
+    def register(self, username, password):
+        return self.store.create_user(username, hash_password(password, self.params))
+
+    def login(self, username, password):
+        ok, new_hash = self.authenticate(username, password)
+        if new_hash is not None:
+            self.store.set_password_hash(username, new_hash)
+        return ok
+
+    def authenticate(self, username, password):
+        # login() without the write: returns (ok, new_hash), new_hash being
+        # the password hashed with the current parameters when the stored one
+        # used older ones (else None), for the caller to store where it does
+        # its writes (the service's writer thread).
+        self.throttle.check(username)
+        stored = self.store.get_password_hash(username)
+        ok, needs_rehash = verify_password(password, stored if stored is not None else self._dummy, self.params)
+        if not ok or stored is None:
+            self.throttle.record_failure(username)
+            return False, None
+        self.throttle.clear(username)
+        return True, hash_password(password, self.params) if needs_rehash else None
+
+
+_authenticator = None
+_authenticator_lock = threading.Lock()
+
+
+def get_authenticator(store):
+    global _authenticator
+    with _authenticator_lock:
+        if _authenticator is None or _authenticator.store is not store:
+            _authenticator = Authenticator(store)
+        return _authenticator
@@ -0,0 +1,174 @@
+import queue
+import threading
+import time
+import tkinter as tk
+from tkinter import ttk
+from concurrent.futures import ThreadPoolExecutor
+
+POLL_MS = 50
+# Quick queries finish before this and never flash a progress window.
+DIALOG_DELAY_MS = 300
+
+
+class Cancelled(Exception):
+    pass
+
+
+class Task:
+    def __init__(self, fn=None, on_done=None, on_error=None, on_cancel=None):
+        self.fn = fn
+        self.future = None
+        self.runtime = None
+        self.progress = None
+        self.on_done = on_done
+        self.on_error = on_error
+        self.on_cancel = on_cancel
+        self._finish_callbacks = []
+        self._cancel = threading.Event()
+
+    @property
+    def cancelled(self):
+        return self._cancel.is_set()
+
+    def cancel(self):
+        self._cancel.set()
+        if self.future is not None:
+            self.future.cancel()
+
+    # ---- Called from the worker ----
+    def check(self):
+        if self._cancel.is_set():
+            raise Cancelled()
+
+    def report(self, done, total=None, message=None):
+        # Also a cancellation point, so long loops only need to call this.
+        self.check()
+        self.progress = (done, total, message)
+
+    # ---- Called on the Tk thread ----
+    def add_finish_callback(self, fn):
+        self._finish_callbacks.append(fn)
+
+    def _finish(self):
+        for fn in self._finish_callbacks:
+            fn()
+
+
+class TkExecutor:
+    # Runs blocking work (SQLite queries, file writes) on worker threads and
+    # hands the results back to Tk. Tk is not thread-safe, so workers never
+    # touch widgets: finished futures are queued and drained by an after()
+    # loop on the Tk thread, which then runs the on_done/on_error callbacks.
+    def __init__(self, root, max_workers=2):
+        self.root = root
+        self.pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="bytebank-worker")
+        self._finished = queue.SimpleQueue()
+        self._closed = False
+        # Called as callback_hook(task, seconds) after each task's callbacks
+        # ran on the Tk thread when set (see diagnostics.py).
+        self.callback_hook = None
+        self.root.after(POLL_MS, self._drain)
+
+    def submit(self, fn, *args, on_done=None, on_error=None, on_cancel=None, with_task=False):
+        # With with_task=True, fn receives the Task as its first argument so
+        # it can report progress and honour cancellation between batches.
+        task = Task(fn, on_done, on_error, on_cancel)
+
+        def run():
+            task.check()
+            started = time.perf_counter()
+            try:
+                return fn(task, *args) if with_task else fn(*args)
+            finally:
+                task.runtime = time.perf_counter() - started
+
+        task.future = self.pool.submit(run)
+        task.future.add_done_callback(lambda _: self._finished.put(task))
+        return task
+
+    def shutdown(self):
+        self._closed = True
+        self.pool.shutdown(wait=False, cancel_futures=True)
+
+    def _drain(self):
+        if self._closed:
+            return
+        while True:
+            try:
+                task = self._finished.get_nowait()
+            except queue.Empty:
+                break
+            try:
+                started = time.perf_counter()
+                self._deliver(task)
+                if self.callback_hook is not None:
+                    self.callback_hook(task, time.perf_counter() - started)
+            except Exception as e:
+                self.root.report_callback_exception(type(e), e, e.__traceback__)
+        self.root.after(POLL_MS, self._drain)
+
+    def _deliver(self, task):
+        task._finish()
+        future = task.future
+        error = None if future.cancelled() else future.exception()
+        if task.cancelled or future.cancelled() or isinstance(error, Cancelled):
+            if task.on_cancel:
+                task.on_cancel()
+        elif error is not None:
+            if task.on_error:
+                task.on_error(error)
+            else:
+                self.root.report_callback_exception(type(error), error, error.__traceback__)
+        elif task.on_done:
+            task.on_done(future.result())
+
+
+class ProgressDialog:
+    def __init__(self, master, task, title, message):
+        self.master = master
+        self.task = task
+        self.title = title
+        self.message = message
+        self.top = None
+        self.finished = False
+        task.add_finish_callback(self.close)
+        master.after(DIALOG_DELAY_MS, self._show)
+
+    def _show(self):
+        if self.finished:
+            return
+        self.top = tk.Toplevel(self.master)
+        self.top.title(self.title)
+        self.top.configure(bg="black")
+        self.top.resizable(False, False)
+        self.top.transient(self.master)
+        self.top.protocol("WM_DELETE_WINDOW", self.task.cancel)
+        self.label = tk.Label(self.top, text=self.message, fg="white", bg="black", font=("Helvetica", 11))
+        self.label.pack(padx=16, pady=(14, 6))
+        self.bar = ttk.Progressbar(self.top, length=280, mode="indeterminate")
+        self.bar.pack(padx=16, pady=6)
+        self.bar.start(12)
+        tk.Button(self.top, text="Cancel", command=self.task.cancel, width=12, bg="white", fg="black",
+                  bd=0, activebackground="#e0e0e0").pack(pady=(6, 14))
+        self._tick()
+
+    def _tick(self):
+        if self.finished or self.top is None:
+            return
+        if self.task.cancelled:
+            self.label.configure(text="Cancelling...")
+        elif self.task.progress is not None:
+            done, total, message = self.task.progress
+            if total:
+                if self.bar["mode"] != "determinate":
+                    self.bar.stop()
+                    self.bar.configure(mode="determinate", maximum=total)
+                self.bar["value"] = done
+            self.label.configure(text=message or f"{self.message} {done:,}" + (f" / {total:,}" if total else ""))
+        self.top.after(POLL_MS * 2, self._tick)
+
+    def close(self):
+        self.finished = True
+        if self.top is not None:
+            self.top.destroy()
+            self.top = None
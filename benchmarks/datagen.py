@@ -0,0 +1,110 @@
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import date, timedelta
+
+from store import ExpenseStore
+from money import DEFAULT_CURRENCY
+
+# Run from the project folder:
+#   python -m benchmarks.datagen --preset medium --out bench-medium.db
+PRESETS = {"small": (1_000, 5), "medium": (100_000, 50), "large": (10_000_000, 1_000)}
+BATCH_SIZE = 50_000
+
+# Share of expenses per category and (median, spread) of a lognormal amount.
+CATEGORY_MIX = [
+    ("Food", 0.45, (250, 0.8)),
+    ("Transport", 0.25, (120, 0.7)),
+    ("Bills", 0.12, (1500, 0.6)),
+    ("Others", 0.15, (800, 1.1)),
+    ("Rent", 0.03, (15000, 0.25)),
+]
+DESCRIPTIONS = {
+    "Food": ["biryani", "groceries", "coffee", "pizza", "swiggy order", "zomato order", "bakery", "tea stall",
+             "dinner with friends", "vegetables", "milk", "lunch"],
+    "Transport": ["uber", "ola", "metro card", "bus pass", "petrol", "auto rickshaw", "train ticket", "parking"],
+    "Bills": ["electricity bill", "water bill", "internet", "mobile recharge", "gas cylinder", "netflix", "insurance"],
+    "Others": ["shoes", "birthday gift", "movie tickets", "pharmacy", "doctor visit", "books", "haircut", "clothes"],
+    "Rent": ["house rent", "monthly rent", "rent"],
+}
+
+
+def user_names(count):
+    return [f"user{i:04d}" for i in range(count)]
+
+
+def generate_rows(rows, users, years, seed):
+    # Users get a Zipf-like share of the rows (a few very heavy accounts),
+    # dates are uniform over the last `years` years, amounts lognormal per
+    # category (in paise, at least one rupee).
+    rng = random.Random(seed)
+    names = user_names(users)
+    weights = [1.0 / (rank + 1) for rank in range(users)]
+    categories = [c for c, _, _ in CATEGORY_MIX]
+    shares = [w for _, w, _ in CATEGORY_MIX]
+    amount_params = {c: p for c, _, p in CATEGORY_MIX}
+    end = date.today()
+    span = int(years * 365)
+    start_ordinal = (end - timedelta(days=span)).toordinal()
+    for _ in range(rows):
+        category = rng.choices(categories, shares)[0]
+        median, sigma = amount_params[category]
+        amount = round(median * rng.lognormvariate(0, sigma) * 100)
+        day = date.fromordinal(start_ordinal + rng.randrange(span)).isoformat()
+        description = rng.choice(DESCRIPTIONS[category])
+        if rng.random() < 0.3:
+            description += f" #{rng.randrange(1000)}"
+        yield rng.choices(names, weights)[0], day, category, description, max(amount, 100), DEFAULT_CURRENCY
+
+
+def generate(path, rows, users, years=5, seed=42, progress=True):
+    if os.path.exists(path):
+        raise FileExistsError(f"{path} already exists")
+    store = ExpenseStore(path)
+    started = time.perf_counter()
+    with store.transaction() as cur:
+        cur.executemany("INSERT INTO users (username, password) VALUES (?, '!')", [(n,) for n in user_names(users)])
+    done = 0
+    with store.bulk_load():
+        batch = []
+        for row in generate_rows(rows, users, years, seed):
+            batch.append(row)
+            if len(batch) >= BATCH_SIZE:
+                done += store.add_expenses(batch)
+                batch = []
+                if progress:
+                    print(f"\r{done:,} / {rows:,} rows", end="", file=sys.stderr)
+        if batch:
+            done += store.add_expenses(batch)
+    store.conn.execute("ANALYZE")
+    store.close()
+    if progress:
+        print(f"\r{done:,} rows for {users} users in {time.perf_counter() - started:.1f}s", file=sys.stderr)
+    return done
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate a synthetic bytebank.db for benchmarking.")
+    parser.add_argument("--out", required=True, help="database file to create")
+    parser.add_argument("--preset", choices=sorted(PRESETS), help="rows/users preset (small=1k, medium=100k, large=10M)")
+    parser.add_argument("--rows", type=int, help="number of expenses")
+    parser.add_argument("--users", type=int, help="number of users")
+    parser.add_argument("--years", type=float, default=5, help="history length (default: %(default)s)")
+    parser.add_argument("--seed", type=int, default=42, help="random seed (default: %(default)s)")
+    args = parser.parse_args(argv)
+
+    rows, users = PRESETS.get(args.preset, (1_000, 5))
+    rows = args.rows or rows
+    users = args.users or users
+    try:
+        generate(args.out, rows, users, args.years, args.seed)
+    except FileExistsError as e:
+        print(e, file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
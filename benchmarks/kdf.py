@@ -0,0 +1,66 @@
+import argparse
+import hashlib
+import json
+import statistics
+import sys
+import time
+
+from auth import hash_password, KDF_SETTING
+from store import get_store, DB_NAME
+
+# Run from the project folder:  python -m benchmarks.kdf --target-ms 250 [--apply]
+
+
+def time_hash(params, repeat):
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        hash_password("benchmark-password", params)
+        samples.append((time.perf_counter() - started) * 1000)
+    return statistics.median(samples)
+
+
+def candidates():
+    if hasattr(hashlib, "scrypt"):
+        for log_n in range(12, 21):
+            yield {"algorithm": "scrypt", "n": 2 ** log_n, "r": 8, "p": 1}
+    else:
+        for iterations in (100_000, 200_000, 400_000, 600_000, 1_000_000, 2_000_000):
+            yield {"algorithm": "pbkdf2_sha256", "iterations": iterations}
+
+
+def calibrate(target_ms, repeat=3):
+    # Costs grow monotonically, so stop at the first one over the target and
+    # keep the last one that fit.
+    results = []
+    chosen = None
+    for params in candidates():
+        ms = time_hash(params, repeat)
+        results.append({"params": params, "median_ms": round(ms, 2)})
+        if ms > target_ms:
+            break
+        chosen = params
+    return chosen, results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Pick password-hashing cost parameters for a target login latency.")
+    parser.add_argument("--target-ms", type=float, default=250.0, help="maximum time one hash may take (default: %(default)s)")
+    parser.add_argument("--repeat", type=int, default=3, help="timed runs per setting (median is used)")
+    parser.add_argument("--apply", action="store_true", help="store the chosen parameters in the database")
+    parser.add_argument("--db", default=DB_NAME, help="database file for --apply (default: %(default)s)")
+    args = parser.parse_args(argv)
+
+    chosen, results = calibrate(args.target_ms, args.repeat)
+    print(json.dumps({"target_ms": args.target_ms, "chosen": chosen, "results": results}, indent=2))
+    if chosen is None:
+        print("Even the cheapest setting exceeds the target; raise --target-ms.", file=sys.stderr)
+        return 1
+    if args.apply:
+        get_store(args.db).set_setting(KDF_SETTING, json.dumps(chosen))
+        print(f"Saved to {args.db}; existing passwords are rehashed on their next login.", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
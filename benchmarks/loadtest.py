@@ -0,0 +1,186 @@
+import argparse
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import threading
+import time
+import uuid
+from datetime import date, timedelta
+
+from service import RemoteStore, RemoteError
+from benchmarks.suite import percentile
+
+# Run from the project folder, against a running service:
+#   python -m benchmarks.loadtest --url http://127.0.0.1:8765 --users 50 --duration 20
+# or let it start one on a copy of a database (e.g. from benchmarks.datagen):
+#   python -m benchmarks.loadtest --db bench-medium.db --users 50
+#
+# Each simulated user registers its own account, then loops over a mix of
+# the GUI's operations with no think time, so the result is the service's
+# saturated throughput.
+DEFAULT_USERS = 20
+DEFAULT_DURATION = 15.0
+SEED_ROWS = 500
+# (operation, weight)
+MIX = [
+    ("page", 35),
+    ("scroll", 10),
+    ("summary", 15),
+    ("search", 10),
+    ("date_totals", 10),
+    ("add", 15),
+    ("update", 5),
+]
+WORDS = ["biryani", "coffee", "uber", "rent", "netflix", "groceries", "metro", "pizza"]
+
+
+def random_expense(rng):
+    day = date.today() - timedelta(days=rng.randrange(730))
+    category = rng.choice(["Food", "Transport", "Rent", "Bills", "Others"])
+    return day.isoformat(), category, f"{rng.choice(WORDS)} #{rng.randrange(100)}", rng.randrange(1000, 200000), "INR"
+
+
+class SimulatedUser(threading.Thread):
+    def __init__(self, url, index, deadline, seed):
+        super().__init__(name=f"loadtest-{index}", daemon=True)
+        self.client = RemoteStore(url)
+        self.username = f"loadtest-{uuid.uuid4().hex[:10]}"
+        self.deadline = deadline
+        self.rng = random.Random(seed)
+        self.latencies = {name: [] for name, _ in MIX}
+        self.errors = 0
+        self.ids = []
+
+    def setup(self):
+        password = uuid.uuid4().hex
+        if not self.client.register(self.username, password) or not self.client.login(self.username, password):
+            raise RuntimeError(f"could not create {self.username}")
+        rows = [(self.username,) + random_expense(self.rng) for _ in range(SEED_ROWS)]
+        self.client.add_expenses(rows)
+        self.ids = [r[0] for r in self.client.page_expenses(self.username, limit=100)]
+
+    def step(self, op):
+        user, client, rng = self.username, self.client, self.rng
+        if op == "page":
+            client.page_expenses(user)
+        elif op == "scroll":
+            rows = client.page_expenses(user)
+            if rows:
+                client.page_expenses(user, after=client.expense_key(rows[-1]))
+        elif op == "summary":
+            client.total_amount(user)
+            client.category_totals(user)
+        elif op == "search":
+            client.search_expenses(user, rng.choice(WORDS)[:3])
+        elif op == "date_totals":
+            client.date_totals(user)
+        elif op == "add":
+            self.ids.append(client.add_expense(user, *random_expense(rng)))
+        elif op == "update" and self.ids:
+            client.update_expense(user, rng.choice(self.ids), *random_expense(rng))
+
+    def run(self):
+        names = [name for name, _ in MIX]
+        weights = [w for _, w in MIX]
+        while time.perf_counter() < self.deadline:
+            op = self.rng.choices(names, weights)[0]
+            started = time.perf_counter()
+            try:
+                self.step(op)
+            except (OSError, RemoteError):
+                self.errors += 1
+                continue
+            self.latencies[op].append((time.perf_counter() - started) * 1000)
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_service(db, readers):
+    port = _free_port()
+    proc = subprocess.Popen([sys.executable, "service.py", "--db", db, "--port", str(port), "--readers", str(readers)],
+                            cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=0.5).close()
+            return proc, f"http://127.0.0.1:{port}"
+        except OSError:
+            if proc.poll() is not None:
+                break
+            time.sleep(0.1)
+    proc.kill()
+    raise RuntimeError("service did not start")
+
+
+def run(url, users, duration, seed=1):
+    sims = [SimulatedUser(url, i, 0, seed + i) for i in range(users)]
+    for sim in sims:
+        sim.setup()
+    started = time.perf_counter()
+    for sim in sims:
+        sim.deadline = started + duration
+        sim.start()
+    for sim in sims:
+        sim.join()
+    elapsed = time.perf_counter() - started
+    results = {}
+    for name, _ in MIX:
+        samples = sorted(ms for sim in sims for ms in sim.latencies[name])
+        if samples:
+            results[name] = {"requests": len(samples), "p50_ms": round(percentile(samples, 0.50), 3),
+                             "p95_ms": round(percentile(samples, 0.95), 3)}
+    total = sum(r["requests"] for r in results.values())
+    return {
+        "users": users,
+        "duration_s": round(elapsed, 2),
+        "operations": total,
+        "operations_per_sec": round(total / elapsed, 1),
+        "errors": sum(sim.errors for sim in sims),
+        "results": results,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load-test the ByteBank HTTP service with simulated users.")
+    target = parser.add_mutually_exclusive_group(required=True)
+    target.add_argument("--url", help="running service to test")
+    target.add_argument("--db", help="start a service on this database for the duration of the test (it adds test users, so use a copy)")
+    parser.add_argument("--users", type=int, default=DEFAULT_USERS, help="simulated users (default: %(default)s)")
+    parser.add_argument("--duration", type=float, default=DEFAULT_DURATION, help="seconds (default: %(default)s)")
+    parser.add_argument("--readers", type=int, default=4, help="reader threads when starting a service")
+    parser.add_argument("--out", help="write JSON results here (default: stdout)")
+    args = parser.parse_args(argv)
+
+    proc = None
+    url = args.url
+    if args.db:
+        proc, url = start_service(args.db, args.readers)
+    try:
+        report = run(url, args.users, args.duration)
+    finally:
+        if proc is not None:
+            proc.terminate()
+            proc.wait()
+    for name, r in report["results"].items():
+        print(f"{name:12} {r['requests']:7} req   p50 {r['p50_ms']:8.2f} ms   p95 {r['p95_ms']:8.2f} ms",
+              file=sys.stderr)
+    print(f"{report['operations_per_sec']:,.0f} operations/sec with {report['users']} users, "
+          f"{report['errors']} errors", file=sys.stderr)
+    result = json.dumps(report, indent=2)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            f.write(result + "\n")
+    else:
+        print(result)
+    return 1 if report["errors"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,67 @@
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+
+# Run from the project folder:  python -m benchmarks.startup [--max-ms 150]
+# Times "import gui" (everything the login window needs) with -X importtime
+# and fails if it regresses past the threshold or pulls in a module that is
+# supposed to load lazily.
+DEFAULT_MAX_MS = 150.0
+LAZY_MODULES = ["matplotlib", "numpy", "charts", "analytics"]
+
+
+def measure(module="gui"):
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                          capture_output=True, text=True, check=True)
+    total_us = None
+    imported = {}
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        _, cumulative_us, name = line.split("|")
+        name = name.strip()
+        imported[name] = int(cumulative_us)
+        if name == module:
+            total_us = int(cumulative_us)
+    return total_us / 1000.0, imported
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Startup import-time benchmark.")
+    parser.add_argument("--max-ms", type=float, default=DEFAULT_MAX_MS,
+                        help="fail if the median import time exceeds this (default: %(default)s)")
+    parser.add_argument("--runs", type=int, default=5, help="interpreter launches to time")
+    parser.add_argument("--top", type=int, default=10, help="slowest modules to list")
+    args = parser.parse_args(argv)
+
+    samples = []
+    imported = {}
+    for _ in range(args.runs):
+        ms, imported = measure()
+        samples.append(ms)
+    median = statistics.median(samples)
+    eager = sorted({name.split(".")[0] for name in imported} & set(LAZY_MODULES))
+    slowest = sorted(imported.items(), key=lambda kv: kv[1], reverse=True)[:args.top]
+    result = {
+        "median_ms": round(median, 2),
+        "samples_ms": [round(s, 2) for s in samples],
+        "max_ms": args.max_ms,
+        "eager_lazy_modules": eager,
+        "slowest_cumulative_ms": {name: round(us / 1000.0, 2) for name, us in slowest},
+    }
+    print(json.dumps(result, indent=2))
+
+    status = 0
+    if median > args.max_ms:
+        print(f"REGRESSION: import gui took {median:.1f} ms (limit {args.max_ms:.1f} ms)", file=sys.stderr)
+        status = 1
+    if eager:
+        print(f"REGRESSION: imported at startup: {', '.join(eager)}", file=sys.stderr)
+        status = 1
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
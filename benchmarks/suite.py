@@ -0,0 +1,239 @@
+import argparse
+import csv
+import json
+import os
+import platform
+import sqlite3
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+from store import ExpenseStore
+from exporter import export_expenses
+from benchmarks.datagen import generate, PRESETS
+
+# Run from the project folder:
+#   python -m benchmarks.suite run --preset medium --out before.json
+#   python -m benchmarks.suite compare before.json after.json
+#
+# "legacy.*" cases replay the SQL the GUI issued before the ExpenseStore
+# (fresh connection per call, fetchall of every row); "store.*" cases time the
+# ExpenseStore calls that replaced them. Both run against the same database
+# file, so the comparison isolates query shape rather than schema (the legacy
+# SQL reads today's integer amount_minor column in place of the old REAL one).
+DEFAULT_REPEAT = 15
+REGRESSION_THRESHOLD = 0.20
+
+LEGACY_VIEW = "SELECT id, date, category, description, amount_minor FROM expenses WHERE user=? ORDER BY date DESC, id DESC"
+LEGACY_FILTER_CATEGORY = "SELECT id, date, category, description, amount_minor FROM expenses WHERE user=? AND LOWER(category)=? ORDER BY date DESC"
+LEGACY_FILTER_DATE = "SELECT id, date, category, description, amount_minor FROM expenses WHERE user=? AND date=? ORDER BY id DESC"
+LEGACY_TOTAL = "SELECT SUM(amount_minor) FROM expenses WHERE user=?"
+LEGACY_CATEGORY_GROUP = "SELECT category, SUM(amount_minor) FROM expenses WHERE user=? GROUP BY category"
+LEGACY_DATE_GROUP = "SELECT date, SUM(amount_minor) FROM expenses WHERE user=? GROUP BY date ORDER BY date"
+LEGACY_EXPORT = "SELECT id, date, category, description, amount_minor FROM expenses WHERE user=? ORDER BY date DESC"
+
+# The SQL a store method would need for analytics the rollups cannot answer,
+# timed against the same questions asked of analytics.ColumnarCache.
+SQL_COUNT = "SELECT COUNT(*) FROM expenses WHERE user=?"
+SQL_NTH_AMOUNT = "SELECT amount_minor FROM expenses WHERE user=? ORDER BY amount_minor LIMIT 1 OFFSET ?"
+SQL_TOP_N = "SELECT id, date, category, amount_minor FROM expenses WHERE user=? ORDER BY amount_minor DESC LIMIT 10"
+SQL_WEEKDAY = "SELECT strftime('%w', date), SUM(amount_minor), COUNT(*) FROM expenses WHERE user=? GROUP BY 1"
+SQL_RANGE_CATEGORY = ("SELECT category, SUM(amount_minor) FROM expenses WHERE user=? AND date BETWEEN ? AND ? "
+                      "GROUP BY category")
+
+
+def legacy_query(path, sql, params):
+    conn = sqlite3.connect(path)
+    try:
+        return conn.execute(sql, params).fetchall()
+    finally:
+        conn.close()
+
+
+def legacy_export(path, user, out):
+    rows = legacy_query(path, LEGACY_EXPORT, (user,))
+    with open(out, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(["ID", "Date", "Category", "Description", "Amount"])
+        for r in rows:
+            writer.writerow(r)
+    return rows
+
+
+def build_cases(path, store, user, sample_date, tmpdir):
+    out = os.path.join(tmpdir, "export.csv")
+    return {
+        "legacy.view": lambda: legacy_query(path, LEGACY_VIEW, (user,)),
+        "store.view": lambda: store.page_expenses(user),
+        "legacy.filter_category": lambda: legacy_query(path, LEGACY_FILTER_CATEGORY, (user, "Food")),
+        "store.filter_category": lambda: store.page_expenses(user, category="Food"),
+        "legacy.filter_date": lambda: legacy_query(path, LEGACY_FILTER_DATE, (user, sample_date)),
+        "store.filter_date": lambda: store.page_expenses(user, date=sample_date),
+        "legacy.summary": lambda: (legacy_query(path, LEGACY_TOTAL, (user,)),
+                                   legacy_query(path, LEGACY_CATEGORY_GROUP, (user,))),
+        "store.summary": lambda: (store.total_amount(user), store.category_totals(user)),
+        "legacy.category_group": lambda: legacy_query(path, LEGACY_CATEGORY_GROUP, (user,)),
+        "store.category_group": lambda: store.category_totals(user),
+        "legacy.date_group": lambda: legacy_query(path, LEGACY_DATE_GROUP, (user,)),
+        "store.date_group": lambda: store.date_totals(user),
+        "legacy.export": lambda: legacy_export(path, user, out),
+        "store.export": lambda: export_expenses(store, user, out),
+        "store.search": lambda: store.search_expenses(user, "bir"),
+    }
+
+
+def sql_percentiles(store, user, qs=(50, 90, 99)):
+    count = store.conn.execute(SQL_COUNT, (user,)).fetchone()[0]
+    return [store.conn.execute(SQL_NTH_AMOUNT, (user, int((count - 1) * q / 100))).fetchone() for q in qs]
+
+
+def build_analytics_cases(store, user, sample_date):
+    # Skipped without NumPy. "cache.load" is the cold cost paid once per
+    # user; the other cache cases run against the warm cache.
+    try:
+        from analytics import ColumnarCache
+    except ImportError:
+        return {}
+    cache = ColumnarCache(store)
+    start = f"{int(sample_date[:4]) - 1}{sample_date[4:]}"
+
+    def cold_load():
+        cache.users.pop(user, None)
+        cache.columns(user)
+
+    return {
+        "cache.load": cold_load,
+        "sql.percentiles": lambda: sql_percentiles(store, user),
+        "cache.percentiles": lambda: cache.percentiles(user),
+        "sql.top_n": lambda: store.conn.execute(SQL_TOP_N, (user,)).fetchall(),
+        "cache.top_n": lambda: cache.top_n(user, 10),
+        "sql.weekday": lambda: store.conn.execute(SQL_WEEKDAY, (user,)).fetchall(),
+        "cache.weekday": lambda: cache.group_by(user, "weekday"),
+        "sql.range_summary": lambda: store.conn.execute(SQL_RANGE_CATEGORY, (user, start, sample_date)).fetchall(),
+        "cache.range_summary": lambda: cache.summary(user, start, sample_date),
+    }
+
+
+def percentile(sorted_samples, q):
+    if len(sorted_samples) == 1:
+        return sorted_samples[0]
+    pos = (len(sorted_samples) - 1) * q
+    lo = int(pos)
+    hi = min(lo + 1, len(sorted_samples) - 1)
+    return sorted_samples[lo] + (sorted_samples[hi] - sorted_samples[lo]) * (pos - lo)
+
+
+def time_case(fn, repeat, warmup=1):
+    for _ in range(warmup):
+        fn()
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - started) * 1000)
+    samples.sort()
+    return {
+        "runs": repeat,
+        "p50_ms": round(percentile(samples, 0.50), 3),
+        "p95_ms": round(percentile(samples, 0.95), 3),
+        "min_ms": round(samples[0], 3),
+        "max_ms": round(samples[-1], 3),
+    }
+
+
+def run(path, repeat, only=None):
+    store = ExpenseStore(path)
+    # The heaviest account is the worst case every screen has to handle.
+    user, rows = store.conn.execute("SELECT user, SUM(count) FROM rollup_category GROUP BY user ORDER BY 2 DESC LIMIT 1").fetchone()
+    sample_date = store.conn.execute("SELECT day FROM rollup_day WHERE user=? ORDER BY count DESC LIMIT 1", (user,)).fetchone()[0]
+    results = {}
+    with tempfile.TemporaryDirectory() as tmpdir:
+        cases = build_cases(path, store, user, sample_date, tmpdir)
+        cases.update(build_analytics_cases(store, user, sample_date))
+        for name, fn in cases.items():
+            if only and not any(name.endswith(o) or name == o for o in only):
+                continue
+            results[name] = time_case(fn, repeat)
+            print(f"{name:24} p50 {results[name]['p50_ms']:10.3f} ms   p95 {results[name]['p95_ms']:10.3f} ms",
+                  file=sys.stderr)
+    meta = {
+        "database": os.path.abspath(path),
+        "expenses": store.conn.execute("SELECT COUNT(*) FROM expenses").fetchone()[0],
+        "users": len(store.expense_users()),
+        "bench_user": user,
+        "bench_user_expenses": rows,
+        "repeat": repeat,
+        "python": platform.python_version(),
+        "sqlite": sqlite3.sqlite_version,
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+    }
+    store.close()
+    return {"meta": meta, "results": results}
+
+
+def compare(base, new, threshold=REGRESSION_THRESHOLD):
+    # Returns (report lines, regressions). A case regresses when its p50 or
+    # p95 grew by more than `threshold` (fractional) against the base run.
+    lines, regressions = [], []
+    for name in sorted(set(base["results"]) | set(new["results"])):
+        old, cur = base["results"].get(name), new["results"].get(name)
+        if old is None or cur is None:
+            lines.append(f"{name:24} {'only in new' if old is None else 'missing from new'}")
+            continue
+        flags = []
+        for key in ("p50_ms", "p95_ms"):
+            if old[key] > 0 and cur[key] > old[key] * (1 + threshold):
+                flags.append(f"{key} +{(cur[key] / old[key] - 1) * 100:.0f}%")
+        change = (cur["p50_ms"] / old["p50_ms"] - 1) * 100 if old["p50_ms"] else 0.0
+        line = f"{name:24} p50 {old['p50_ms']:10.3f} -> {cur['p50_ms']:10.3f} ms ({change:+.0f}%)"
+        if flags:
+            line += "  REGRESSION: " + ", ".join(flags)
+            regressions.append(name)
+        lines.append(line)
+    return lines, regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="ByteBank query benchmark suite.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    run_cmd = commands.add_parser("run", help="time the GUI's queries and write JSON results")
+    run_cmd.add_argument("--db", help="existing database to benchmark")
+    run_cmd.add_argument("--preset", choices=sorted(PRESETS), default="medium",
+                         help="dataset to generate when --db is not given (default: %(default)s)")
+    run_cmd.add_argument("--repeat", type=int, default=DEFAULT_REPEAT, help="timed runs per case")
+    run_cmd.add_argument("--only", nargs="*", help="run only these cases (e.g. view store.summary)")
+    run_cmd.add_argument("--out", help="write JSON here (default: stdout)")
+    cmp_cmd = commands.add_parser("compare", help="flag regressions between two result files")
+    cmp_cmd.add_argument("base")
+    cmp_cmd.add_argument("new")
+    cmp_cmd.add_argument("--threshold", type=float, default=REGRESSION_THRESHOLD,
+                         help="allowed fractional slowdown of p50/p95 (default: %(default)s)")
+    args = parser.parse_args(argv)
+
+    if args.command == "compare":
+        with open(args.base, encoding="utf-8") as f:
+            base = json.load(f)
+        with open(args.new, encoding="utf-8") as f:
+            new = json.load(f)
+        lines, regressions = compare(base, new, args.threshold)
+        print("\n".join(lines))
+        return 1 if regressions else 0
+
+    path = args.db
+    if path is None:
+        path = os.path.join(tempfile.gettempdir(), f"bytebank-bench-{args.preset}.db")
+        if not os.path.exists(path):
+            rows, users = PRESETS[args.preset]
+            generate(path, rows, users)
+    result = json.dumps(run(path, args.repeat, args.only), indent=2)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            f.write(result + "\n")
+    else:
+        print(result)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
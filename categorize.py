@@ -0,0 +1,169 @@
+import re
+from collections import Counter, defaultdict
+
+# Automatic categories for imported transactions. A user's rules are one of
+#   keyword   "swiggy", "uber eats"  the word or phrase anywhere in the description
+#   merchant  "amzn*"                a merchant as statements spell it: any word
+#                                    starting with it ("AMZN MKTP", "AMZNPAY")
+#   regex     "/^atm wdl?/"          a regular expression
+# all case-insensitive. Every rule of a user is compiled into one regular
+# expression, its keywords and merchants folded into a trie (shared prefixes
+# factored out), so a description is matched in one pass of the regex engine
+# however many rules there are. Where several rules match, the one starting
+# earliest in the description wins; at the same spot regexes come first, then
+# the longest keyword or merchant.
+# Descriptions no rule matches are decided by the user's labelled history:
+# the same description labelled the same way before, else the first word that
+# has (nearly) always meant one category.
+RULE_KINDS = ["keyword", "merchant", "regex"]
+WORD_RE = re.compile(r"\w+")
+LEARN_MIN_COUNT = 3
+LEARN_MIN_SHARE = 0.9
+LEARN_MIN_LENGTH = 3
+MEMO_SIZE = 1 << 16
+# Group numbers shift once rules are combined, and names could collide.
+_UNSUPPORTED = re.compile(r"\\[1-9]|\(\?P[<=]")
+
+
+def normalize(description):
+    return " ".join((description or "").lower().split())
+
+
+def parse_rule(text):
+    # "/.../" is a regex, a trailing "*" a merchant, anything else a keyword.
+    # Returns (kind, pattern) with the pattern checked.
+    text = " ".join((text or "").split())
+    if len(text) > 2 and text.startswith("/") and text.endswith("/"):
+        kind, pattern = "regex", text[1:-1]
+    elif text.endswith("*"):
+        kind, pattern = "merchant", text[:-1].rstrip()
+    else:
+        kind, pattern = "keyword", text
+    return kind, check_rule(kind, pattern)
+
+
+def rule_text(kind, pattern):
+    return f"/{pattern}/" if kind == "regex" else f"{pattern}*" if kind == "merchant" else pattern
+
+
+def check_rule(kind, pattern):
+    # Returns the pattern as stored; raises ValueError when it cannot be used.
+    if kind not in RULE_KINDS:
+        raise ValueError(f"rule kind must be one of {', '.join(RULE_KINDS)}")
+    if kind != "regex":
+        pattern = normalize(pattern)
+        if not pattern:
+            raise ValueError("rule pattern is empty")
+        return pattern
+    if not pattern or _UNSUPPORTED.search(pattern):
+        raise ValueError("regex rules cannot be empty or use backreferences or named groups")
+    try:
+        re.compile(f"(?P<r0>(?i:{pattern}))")
+    except re.error as e:
+        raise ValueError(f"invalid regex {pattern!r}: {e}")
+    return pattern
+
+
+def _trie_pattern(words):
+    # One alternation matching any of `words`, longest first at each spot.
+    trie = {}
+    for word in words:
+        node = trie
+        for ch in word:
+            node = node.setdefault(ch, {})
+        node[""] = {}
+
+    def walk(node):
+        branches = [re.escape(ch) + walk(child) for ch, child in sorted(node.items()) if ch]
+        if not branches:
+            return ""
+        body = branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+        return f"(?:{body})?" if "" in node else body
+
+    return walk(trie)
+
+
+def learn(history):
+    # history is (description, category, count) rows. Returns (exact, words):
+    # normalized descriptions and single words mapped to the category they
+    # were given at least LEARN_MIN_SHARE of the time.
+    by_text = defaultdict(Counter)
+    for description, category, count in history:
+        text = normalize(description)
+        if text:
+            by_text[text][category] += count
+    exact = {}
+    by_word = defaultdict(Counter)
+    for text, labels in by_text.items():
+        category, count = labels.most_common(1)[0]
+        if count >= LEARN_MIN_SHARE * sum(labels.values()):
+            exact[text] = category
+        for word in set(WORD_RE.findall(text)):
+            if len(word) >= LEARN_MIN_LENGTH and not word.isdigit():
+                by_word[word].update(labels)
+    words = {}
+    for word, labels in by_word.items():
+        category, count = labels.most_common(1)[0]
+        total = sum(labels.values())
+        if total >= LEARN_MIN_COUNT and count >= LEARN_MIN_SHARE * total:
+            words[word] = category
+    return exact, words
+
+
+class Categorizer:
+    def __init__(self, rules=(), history=()):
+        # rules are (kind, pattern, category) with checked patterns; history
+        # as for learn().
+        self.regexes = []
+        self.keywords = {}
+        self.merchants = {}
+        for kind, pattern, category in rules:
+            if kind == "regex":
+                self.regexes.append((pattern, category))
+            else:
+                (self.keywords if kind == "keyword" else self.merchants)[pattern] = category
+        parts = [f"(?P<r{i}>(?i:{pattern}))" for i, (pattern, _) in enumerate(self.regexes)]
+        literals = []
+        if self.keywords:
+            literals.append(f"(?P<kw>{_trie_pattern(self.keywords)})(?!\\w)")
+        if self.merchants:
+            literals.append(f"(?P<m>{_trie_pattern(self.merchants)})")
+        if literals:
+            parts.append("(?<!\\w)(?:" + "|".join(literals) + ")")
+        self.pattern = re.compile("|".join(parts)) if parts else None
+        self.exact, self.words = learn(history)
+        self.memo = {}
+
+    @classmethod
+    def for_user(cls, store, user, learn_history=True):
+        rules = [(kind, pattern, category) for _, kind, pattern, category in store.category_rules(user)]
+        return cls(rules, store.description_categories(user) if learn_history else ())
+
+    def categorize(self, description):
+        # The category for `description`, or None when nothing points to one.
+        # Imports repeat the same descriptions, so answers are memoized.
+        category = self.memo.get(description, self)
+        if category is self:
+            if len(self.memo) >= MEMO_SIZE:
+                self.memo.clear()
+            category = self.memo[description] = self._match(normalize(description))
+        return category
+
+    def _match(self, text):
+        if self.pattern is not None:
+            m = self.pattern.search(text)
+            if m is not None:
+                group = m.lastgroup
+                if group == "kw":
+                    return self.keywords[m.group("kw")]
+                if group == "m":
+                    return self.merchants[m.group("m")]
+                return self.regexes[int(group[1:])][1]
+        category = self.exact.get(text)
+        if category is not None:
+            return category
+        for word in WORD_RE.findall(text):
+            category = self.words.get(word)
+            if category is not None:
+                return category
+        return None
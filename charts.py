@@ -0,0 +1,250 @@
+import calendar
+import tkinter as tk
+from tkinter import messagebox
+from datetime import date, datetime
+
+import numpy as np
+import matplotlib.dates as mdates
+from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg, NavigationToolbar2Tk
+from matplotlib.figure import Figure
+
+from money import format_amount, exponent
+
+# The date chart never draws more than about this many bars; the bucket size
+# grows with the visible span instead.
+MAX_BARS = 120
+BUCKETS = [("day", 1), ("week", 7), ("month", 31), ("year", 366)]
+ZOOM_DEBOUNCE_MS = 250
+
+
+# ---------------- Bucketing ----------------
+def choose_bucket(start, end, max_bars=MAX_BARS):
+    span = (end - start).days + 1
+    for name, days in BUCKETS:
+        if span / days <= max_bars:
+            return name
+    return "year"
+
+
+def bucket_totals(keys, totals, bucket):
+    # keys are sorted datetime64 day (or month) starts from the rollups and
+    # totals their amounts in minor units. Returns (bucket start, width in days, total)
+    # arrays, summing runs of keys that fall into the same bucket.
+    if len(keys) == 0:
+        return np.array([], dtype="datetime64[D]"), np.array([], dtype=np.int64), np.array([], dtype=np.int64)
+    if bucket == "week":
+        days = keys.astype("datetime64[D]").astype(np.int64)
+        # Day 0 (1970-01-01) was a Thursday; shift so weeks start on Monday.
+        starts = (days - (days + 3) % 7).astype("datetime64[D]")
+    elif bucket == "month":
+        starts = keys.astype("datetime64[M]")
+    elif bucket == "year":
+        starts = keys.astype("datetime64[Y]")
+    else:
+        starts = keys.astype("datetime64[D]")
+    edges = np.flatnonzero(np.concatenate(([True], starts[1:] != starts[:-1])))
+    sums = np.add.reduceat(totals, edges)
+    first = starts[edges]
+    left = first.astype("datetime64[D]")
+    if bucket == "week":
+        right = left + 7
+    else:
+        right = (first + 1).astype("datetime64[D]")
+    return left, (right - left).astype(np.int64), sums
+
+
+def parse_keys(keys, unit):
+    # Rollup keys as datetime64 days ("D") or months ("M"). A key that does
+    # not parse (say "2024-1-" from an unpadded date) would otherwise leave
+    # its total out of the chart unnoticed.
+    try:
+        return np.array(keys, dtype=f"datetime64[{unit}]")
+    except ValueError:
+        bad = []
+        for key in keys:
+            try:
+                np.datetime64(key, unit)
+            except (TypeError, ValueError):
+                bad.append(key)
+        raise ValueError(f"malformed rollup keys {', '.join(map(repr, bad[:5]))}"
+                         f"{' ...' if len(bad) > 5 else ''}; run 'store.py verify-rollups --fix'")
+
+
+def _partial_months(start, end):
+    # (first, last) for the first and last month of [start, end] when the
+    # range covers only part of them.
+    def month_end(day):
+        return day.replace(day=calendar.monthrange(day.year, day.month)[1])
+
+    parts = []
+    first_last = min(end, month_end(start))
+    if start.day != 1 or first_last != month_end(start):
+        parts.append((start, first_last))
+    if (end.year, end.month) != (start.year, start.month) and end != month_end(end):
+        parts.append((end.replace(day=1), end))
+    return parts
+
+
+def load_series(store, user, start, end, bucket):
+    # Month and year buckets come from the monthly rollup, except for edge
+    # months the range only partly covers, which are summed from the daily
+    # one so they hold just the days asked for; day and week buckets come
+    # from the daily rollup, limited to the requested range.
+    start_s, end_s = start.isoformat(), end.isoformat()
+    if bucket in ("month", "year"):
+        months = dict(store.month_totals(user, start_s, end_s))
+        for first, last in _partial_months(start, end):
+            days = store.date_totals(user, first.isoformat(), last.isoformat())
+            months.pop(first.isoformat()[:7], None)
+            if days:
+                months[first.isoformat()[:7]] = sum(total for _, total in days)
+        rows = sorted(months.items())
+        keys = parse_keys([r[0] for r in rows], "M")
+    else:
+        rows = store.date_totals(user, start_s, end_s)
+        keys = parse_keys([r[0] for r in rows], "D")
+    totals = np.fromiter((r[1] for r in rows), dtype=np.int64, count=len(rows))
+    return bucket_totals(keys, totals, bucket)
+
+
+# ---------------- Category chart ----------------
+def show_category_chart(master, username, rows):
+    categories, amounts = zip(*rows)
+    fig = Figure(figsize=(5,5), dpi=100)
+    ax = fig.add_subplot(111)
+    ax.pie(amounts, labels=categories, autopct='%1.1f%%', startangle=90, colors=['#555','#888','#aaa','#ccc','#eee'])
+    ax.set_title(f"{username}'s Expenses by Category")
+
+    win = tk.Toplevel(master)
+    win.title("Category-wise Expenses")
+    canvas = FigureCanvasTkAgg(fig, master=win)
+    canvas.draw()
+    canvas.get_tk_widget().pack()
+
+
+# ---------------- Date chart ----------------
+class DateChart:
+    # Bars are re-queried for the visible range whenever the view changes
+    # (range selector, toolbar zoom or pan), so only that slice of the
+    # rollups is read and drawn.
+    def __init__(self, master, store, executor, username, bounds):
+        self.store = store
+        self.executor = executor
+        self.username = username
+        self.first = date.fromisoformat(bounds[0])
+        self.last = date.fromisoformat(bounds[1])
+        self.bars = None
+        self.pending = None
+        self.loading = None
+        self.setting_view = False
+
+        self.win = tk.Toplevel(master)
+        self.win.title("Date-wise Expenses")
+        self.win.configure(bg="black")
+
+        controls = tk.Frame(self.win, bg="black")
+        controls.pack(fill="x", padx=8, pady=6)
+        tk.Label(controls, text="From:", fg="white", bg="black").pack(side="left")
+        self.entry_from = tk.Entry(controls, width=12)
+        self.entry_from.pack(side="left", padx=4)
+        tk.Label(controls, text="To:", fg="white", bg="black").pack(side="left")
+        self.entry_to = tk.Entry(controls, width=12)
+        self.entry_to.pack(side="left", padx=4)
+        btn_style = {"bg": "white", "fg": "black", "bd": 0, "activebackground": "#e0e0e0"}
+        tk.Button(controls, text="Apply", command=self.apply_range, **btn_style).pack(side="left", padx=4)
+        tk.Button(controls, text="All", command=self.reset_range, **btn_style).pack(side="left", padx=4)
+        self.status = tk.Label(controls, fg="gray", bg="black")
+        self.status.pack(side="right")
+
+        self.fig = Figure(figsize=(7,4), dpi=100)
+        self.ax = self.fig.add_subplot(111)
+        self.ax.set_ylabel("Amount")
+        self.ax.set_title(f"{username}'s Expenses Over Time")
+        locator = mdates.AutoDateLocator()
+        self.ax.xaxis.set_major_locator(locator)
+        self.ax.xaxis.set_major_formatter(mdates.ConciseDateFormatter(locator))
+        self.ax.callbacks.connect("xlim_changed", self._on_xlim_changed)
+
+        self.canvas = FigureCanvasTkAgg(self.fig, master=self.win)
+        NavigationToolbar2Tk(self.canvas, self.win).update()
+        self.canvas.get_tk_widget().pack(fill="both", expand=True)
+        self.reset_range()
+
+    def reset_range(self):
+        self.set_view(self.first, self.last)
+
+    def apply_range(self):
+        try:
+            start = datetime.strptime(self.entry_from.get().strip(), "%Y-%m-%d").date()
+            end = datetime.strptime(self.entry_to.get().strip(), "%Y-%m-%d").date()
+        except ValueError:
+            messagebox.showerror("Invalid", "Dates must be YYYY-MM-DD.", parent=self.win)
+            return
+        if end < start:
+            messagebox.showerror("Invalid", "'From' must not be after 'To'.", parent=self.win)
+            return
+        self.set_view(start, end)
+
+    def set_view(self, start, end):
+        self.setting_view = True
+        try:
+            self.ax.set_xlim(mdates.date2num(start), mdates.date2num(end) + 1)
+        finally:
+            self.setting_view = False
+        self.load(start, end)
+
+    def _on_xlim_changed(self, ax):
+        if self.setting_view:
+            return
+        if self.pending is not None:
+            self.win.after_cancel(self.pending)
+        self.pending = self.win.after(ZOOM_DEBOUNCE_MS, self._reload_visible)
+
+    def _reload_visible(self):
+        self.pending = None
+        lo, hi = self.ax.get_xlim()
+        start = max(mdates.num2date(lo).date(), self.first)
+        end = min(mdates.num2date(hi).date(), self.last)
+        if start <= end:
+            self.load(start, end)
+
+    def load(self, start, end):
+        self.entry_from.delete(0, tk.END)
+        self.entry_from.insert(0, start.isoformat())
+        self.entry_to.delete(0, tk.END)
+        self.entry_to.insert(0, end.isoformat())
+        bucket = choose_bucket(start, end)
+        self.status.configure(text=f"Loading {bucket} totals...")
+        if self.loading is not None:
+            self.loading.cancel()
+        self.loading = self.executor.submit(load_series, self.store, self.username, start, end, bucket,
+                                            on_done=lambda series: self.draw(series, bucket),
+                                            on_error=self.failed)
+
+    def failed(self, error):
+        if not self.win.winfo_exists():
+            return
+        self.loading = None
+        self.status.configure(text="Loading failed")
+        messagebox.showerror("Chart", f"Could not load totals: {error}", parent=self.win)
+
+    def draw(self, series, bucket):
+        if not self.win.winfo_exists():
+            return
+        self.loading = None
+        left, widths, totals = series
+        currency = self.store.currency
+        heights = totals / 10 ** exponent(currency)
+        if self.bars is not None:
+            self.bars.remove()
+        self.bars = self.ax.bar(mdates.date2num(left), heights, width=widths, align="edge",
+                                color="black", edgecolor="white", linewidth=0.3)
+        self.setting_view = True
+        try:
+            self.ax.set_ylim(0, (heights.max() if len(heights) else 1) * 1.1)
+        finally:
+            self.setting_view = False
+        self.ax.set_xlabel(f"Date ({bucket}ly totals)" if bucket != "day" else "Date (daily totals)")
+        total = format_amount(int(totals.sum()), currency, code=True)
+        self.status.configure(text=f"{len(totals)} {bucket} bars, total {total}")
+        self.canvas.draw_idle()
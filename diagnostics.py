@@ -0,0 +1,278 @@
+import functools
+import os
+import threading
+import time
+import tkinter as tk
+from tkinter import ttk
+from collections import deque, namedtuple
+
+# Opt-in timing of store calls, SQL reads, background tasks and Tk callbacks.
+# Nothing is wrapped until enable() runs: either at startup when
+# BYTEBANK_DIAGNOSTICS is set, or from the hidden Diagnostics window
+# (Ctrl+Shift+D in the main window).
+ENV_VAR = "BYTEBANK_DIAGNOSTICS"
+LOG_NAME = "bytebank-diagnostics.log"
+LOG_BYTES = 1_000_000
+LOG_BACKUPS = 3
+RECENT = 1000
+# Reads slower than this get their EXPLAIN QUERY PLAN captured (once per
+# statement); anything slower than SLOW_MS is also written to the log.
+SLOW_QUERY_MS = 50
+SLOW_MS = 100
+
+# ExpenseStore methods timed as whole operations. Generators (iter_*) are
+# left alone; their callers (exports) show up as background tasks.
+STORE_OPERATIONS = [
+    "create_user", "get_password_hash", "set_password_hash",
+    "add_expense", "add_expenses", "get_expense", "update_expense", "delete_expense",
+    "page_expenses", "search_expenses", "count_expenses",
+    "total_amount", "category_totals", "date_totals", "month_totals", "date_bounds",
+    "currency_totals", "set_budget", "budgets", "expense_alerts",
+    "add_recurring", "recurring_rules", "delete_recurring", "materialize_recurring",
+    "backup", "maintain", "compact", "archive", "count_history",
+    "add_category_rule", "category_rules", "delete_category_rule", "description_categories", "recategorize",
+]
+
+Sample = namedtuple("Sample", "when kind name ms rows detail")
+
+
+def callable_name(fn):
+    # "open_main_window.<locals>.summarize_expenses.<locals>.show" -> "summarize_expenses.show"
+    name = getattr(fn, "__qualname__", None) or getattr(fn, "__name__", None) or repr(fn)
+    return name.split("open_main_window.<locals>.")[-1].replace(".<locals>.", ".")
+
+
+def _short_sql(sql, width=90):
+    sql = " ".join(sql.split())
+    return sql if len(sql) <= width else sql[:width - 3] + "..."
+
+
+# ---------------- Registry ----------------
+class Metrics:
+    def __init__(self, log_path=None, recent=RECENT, slow_query_ms=SLOW_QUERY_MS, slow_ms=SLOW_MS):
+        self.lock = threading.Lock()
+        self.recent = deque(maxlen=recent)
+        self.totals = {}
+        self.plans = {}
+        self.slow_query_ms = slow_query_ms
+        self.slow_ms = slow_ms
+        self.log = None
+        if log_path:
+            # Imported here so the app's startup does not pay for logging.
+            import logging
+            from logging.handlers import RotatingFileHandler
+            self.log = logging.getLogger("bytebank.diagnostics")
+            self.log.setLevel(logging.INFO)
+            self.log.propagate = False
+            handler = RotatingFileHandler(log_path, maxBytes=LOG_BYTES, backupCount=LOG_BACKUPS, encoding="utf-8")
+            handler.setFormatter(logging.Formatter("%(asctime)s %(message)s"))
+            self.log.addHandler(handler)
+
+    def record(self, kind, name, ms, rows=None, detail=None):
+        sample = Sample(time.time(), kind, name, ms, rows, detail)
+        with self.lock:
+            self.recent.append(sample)
+            count, total, worst = self.totals.get((kind, name), (0, 0.0, 0.0))
+            self.totals[(kind, name)] = (count + 1, total + ms, max(worst, ms))
+        if self.log is not None and ms >= self.slow_ms:
+            self.log.info("%s %s %.1f ms rows=%s%s", kind, name, ms, "-" if rows is None else rows,
+                          f" plan: {detail}" if detail else "")
+        return sample
+
+    def slowest(self, limit=50):
+        with self.lock:
+            samples = list(self.recent)
+        return sorted(samples, key=lambda s: s.ms, reverse=True)[:limit]
+
+    def summary(self):
+        # (kind, name, calls, mean ms, max ms), slowest total time first.
+        with self.lock:
+            items = list(self.totals.items())
+        items.sort(key=lambda item: item[1][1], reverse=True)
+        return [(kind, name, count, total / count, worst) for (kind, name), (count, total, worst) in items]
+
+    def clear(self):
+        with self.lock:
+            self.recent.clear()
+            self.totals.clear()
+
+    # ---- Hooks ----
+    def timed(self, kind, name, fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            result = fn(*args, **kwargs)
+            self.record(kind, name, (time.perf_counter() - started) * 1000,
+                        len(result) if isinstance(result, list) else None)
+            return result
+        return wrapper
+
+    def on_query(self, store, sql, params, seconds, rows):
+        ms = seconds * 1000
+        plan = None
+        if ms >= self.slow_query_ms:
+            plan = self.plans.get(sql)
+            if plan is None:
+                try:
+                    plan = " | ".join(store.explain(sql, params))
+                except Exception as e:
+                    plan = f"(explain failed: {e})"
+                self.plans[sql] = plan
+        self.record("query", _short_sql(sql), ms, rows, plan)
+
+    def on_task_done(self, task, seconds):
+        name = callable_name(task.fn)
+        if task.runtime is not None:
+            self.record("task", name, task.runtime * 1000)
+        self.record("tk", name + " (callback)", seconds * 1000)
+
+
+_metrics = None
+_metrics_lock = threading.Lock()
+
+
+def current():
+    return _metrics
+
+
+def enable(store=None, executor=None, log_path=None):
+    # Safe to call repeatedly; objects that are already instrumented are
+    # left as they are.
+    global _metrics
+    with _metrics_lock:
+        if _metrics is None:
+            if log_path is None and store is not None:
+                # Next to the database, or the working directory for a service.RemoteStore.
+                log_path = os.path.join(os.path.dirname(os.path.abspath(getattr(store, "path", LOG_NAME))), LOG_NAME)
+            _metrics = Metrics(log_path)
+        metrics = _metrics
+    if store is not None and getattr(store, "query_hook", None) is None:
+        for name in STORE_OPERATIONS:
+            if hasattr(store, name):
+                setattr(store, name, metrics.timed("store", name, getattr(store, name)))
+        store.query_hook = functools.partial(metrics.on_query, store)
+    if executor is not None and executor.callback_hook is None:
+        executor.callback_hook = metrics.on_task_done
+    return metrics
+
+
+def enabled_by_env():
+    return os.environ.get(ENV_VAR, "").strip().lower() not in ("", "0", "no", "false", "off")
+
+
+def tk_command(label, fn):
+    # Wraps a button command so its time on the Tk thread is recorded once
+    # diagnostics are on; until then it costs one global lookup per click.
+    @functools.wraps(fn)
+    def command(*args):
+        metrics = _metrics
+        if metrics is None:
+            return fn(*args)
+        started = time.perf_counter()
+        try:
+            return fn(*args)
+        finally:
+            metrics.record("tk", label, (time.perf_counter() - started) * 1000)
+    return command
+
+
+# ---------------- Window ----------------
+REFRESH_MS = 1000
+COLUMNS = [
+    ("ms", "ms", 80, "e"),
+    ("kind", "Kind", 60, "w"),
+    ("name", "Operation", 360, "w"),
+    ("rows", "Rows", 70, "e"),
+    ("when", "When", 80, "w"),
+]
+SUMMARY_COLUMNS = [
+    ("kind", "Kind", 60, "w"),
+    ("name", "Operation", 360, "w"),
+    ("calls", "Calls", 70, "e"),
+    ("mean", "Mean ms", 80, "e"),
+    ("max", "Max ms", 80, "e"),
+]
+
+
+class DiagnosticsWindow:
+    def __init__(self, master, metrics):
+        self.metrics = metrics
+        self.details = {}
+        self.win = tk.Toplevel(master)
+        self.win.title("Diagnostics")
+        self.win.configure(bg="black")
+        self.win.geometry("720x520")
+
+        controls = tk.Frame(self.win, bg="black")
+        controls.pack(fill="x", padx=8, pady=6)
+        btn_style = {"bg": "white", "fg": "black", "bd": 0, "activebackground": "#e0e0e0"}
+        self.view = tk.StringVar(value="slowest")
+        tk.Radiobutton(controls, text="Slowest recent", variable=self.view, value="slowest", command=self.refresh,
+                       fg="white", bg="black", selectcolor="black", activebackground="black").pack(side="left")
+        tk.Radiobutton(controls, text="Totals", variable=self.view, value="totals", command=self.refresh,
+                       fg="white", bg="black", selectcolor="black", activebackground="black").pack(side="left")
+        tk.Button(controls, text="Clear", command=self.clear, **btn_style).pack(side="right", padx=4)
+        self.status = tk.Label(controls, fg="gray", bg="black")
+        self.status.pack(side="right", padx=8)
+
+        body = tk.Frame(self.win)
+        body.pack(fill="both", expand=True, padx=8)
+        self.tree = ttk.Treeview(body, show="headings", selectmode="browse", height=16)
+        scrollbar = ttk.Scrollbar(body, orient="vertical", command=self.tree.yview)
+        self.tree.configure(yscrollcommand=scrollbar.set)
+        self.tree.pack(side="left", fill="both", expand=True)
+        scrollbar.pack(side="right", fill="y")
+        self.tree.bind("<<TreeviewSelect>>", self._show_detail)
+
+        self.detail = tk.Text(self.win, height=5, wrap="word", bg="black", fg="white", bd=0)
+        self.detail.pack(fill="x", padx=8, pady=6)
+        self._tick()
+
+    def _set_columns(self, columns):
+        self.tree.configure(columns=[c[0] for c in columns])
+        for col, label, width, anchor in columns:
+            self.tree.heading(col, text=label)
+            self.tree.column(col, width=width, anchor=anchor, stretch=(col == "name"))
+
+    def _tick(self):
+        if not self.win.winfo_exists():
+            return
+        self.refresh()
+        self.win.after(REFRESH_MS, self._tick)
+
+    def refresh(self):
+        selected = self.tree.selection()
+        self.tree.delete(*self.tree.get_children())
+        self.details.clear()
+        if self.view.get() == "slowest":
+            self._set_columns(COLUMNS)
+            for i, s in enumerate(self.metrics.slowest()):
+                iid = str(i)
+                self.tree.insert("", "end", iid=iid, values=(
+                    f"{s.ms:.1f}", s.kind, s.name, "" if s.rows is None else s.rows,
+                    time.strftime("%H:%M:%S", time.localtime(s.when))))
+                self.details[iid] = s.detail
+        else:
+            self._set_columns(SUMMARY_COLUMNS)
+            for i, (kind, name, calls, mean, worst) in enumerate(self.metrics.summary()):
+                self.tree.insert("", "end", iid=str(i), values=(kind, name, calls, f"{mean:.1f}", f"{worst:.1f}"))
+        if selected and self.tree.exists(selected[0]):
+            self.tree.selection_set(selected[0])
+        self.status.configure(text=f"{len(self.metrics.recent)} samples")
+
+    def _show_detail(self, _event=None):
+        selected = self.tree.selection()
+        if not selected:
+            return
+        values = self.tree.item(selected[0], "values")
+        text = " ".join(str(v) for v in values)
+        plan = self.details.get(selected[0])
+        if plan:
+            text += "\n\nQuery plan: " + plan
+        self.detail.delete("1.0", tk.END)
+        self.detail.insert("1.0", text)
+
+    def clear(self):
+        self.metrics.clear()
+        self.detail.delete("1.0", tk.END)
+        self.refresh()
@@ -0,0 +1,293 @@
+import time
+import tkinter as tk
+from tkinter import ttk
+from datetime import datetime
+
+from store import ExpenseStore, SORT_KEYS
+from money import parse_amount, format_amount
+
+PAGE_SIZE = 200
+# Rows kept in the Treeview: the visible window plus a prefetched page on each
+# side. Older pages are dropped as the user scrolls, so memory stays flat no
+# matter how many expenses the user has.
+MAX_ROWS = 3 * PAGE_SIZE
+# Fetch the next/previous page once the view is this close to either edge.
+PREFETCH_AT = 0.15
+
+COLUMNS = [
+    ("id", "ID", 60, "e"),
+    ("date", "Date", 100, "w"),
+    ("category", "Category", 100, "w"),
+    ("description", "Description", 280, "w"),
+    ("amount", "Amount", 110, "e"),
+]
+
+
+def amount_text(store, amount_minor, currency):
+    # Amounts in the store's default currency are shown bare, others with
+    # their code.
+    return format_amount(amount_minor, currency, code=currency != store.currency)
+
+
+class ExpenseGrid(tk.Frame):
+    def __init__(self, master, store, user, category=None, date=None, sort="date", descending=True):
+        super().__init__(master)
+        self.store = store
+        self.user = user
+        self.filters = {"category": category, "date": date}
+        self.sort = sort
+        self.descending = descending
+        self.keys = {}
+        self.has_prev = False
+        self.has_next = False
+        self._busy = False
+
+        self.tree = ttk.Treeview(self, columns=[c[0] for c in COLUMNS], show="headings",
+                                 selectmode="browse", height=20)
+        for col, label, width, anchor in COLUMNS:
+            self.tree.column(col, width=width, anchor=anchor, stretch=(col == "description"))
+            if col in SORT_KEYS:
+                self.tree.heading(col, text=label, command=lambda c=col: self.sort_by(c))
+            else:
+                self.tree.heading(col, text=label)
+        self.scrollbar = ttk.Scrollbar(self, orient="vertical", command=self.tree.yview)
+        self.tree.configure(yscrollcommand=self._on_scroll)
+        self.tree.pack(side="left", fill="both", expand=True)
+        self.scrollbar.pack(side="right", fill="y")
+        self.reload()
+
+    # ---- Loading ----
+    def reload(self):
+        self.tree.delete(*self.tree.get_children())
+        self.keys.clear()
+        rows = self._fetch()
+        self._insert(rows, "end")
+        self.has_prev = False
+        self.has_next = len(rows) == PAGE_SIZE
+        self._update_headings()
+        return len(rows)
+
+    def sort_by(self, col):
+        if col == self.sort:
+            self.descending = not self.descending
+        else:
+            self.sort = col
+            self.descending = col == "date"
+        self.reload()
+
+    def _fetch(self, after=None, before=None):
+        return self.store.page_expenses(self.user, self.sort, self.descending, after=after, before=before,
+                                        limit=PAGE_SIZE, **self.filters)
+
+    def _insert(self, rows, where):
+        index = 0 if where == "start" else "end"
+        for row in (reversed(rows) if where == "start" else rows):
+            iid = str(row[0])
+            rid, date, cat, desc, amt, cur = row
+            self.tree.insert("", index, iid=iid, values=(rid, date, cat, desc or "", amount_text(self.store, amt, cur)))
+            self.keys[iid] = ExpenseStore.expense_key(row, self.sort)
+
+    def _drop(self, items):
+        self.tree.delete(*items)
+        for iid in items:
+            del self.keys[iid]
+
+    def _on_scroll(self, first, last):
+        self.scrollbar.set(first, last)
+        if self._busy:
+            return
+        if self.has_next and float(last) > 1 - PREFETCH_AT:
+            self._busy = True
+            self.after_idle(self._load_next)
+        elif self.has_prev and float(first) < PREFETCH_AT:
+            self._busy = True
+            self.after_idle(self._load_prev)
+
+    def _load_next(self):
+        try:
+            children = self.tree.get_children()
+            rows = self._fetch(after=self.keys[children[-1]])
+            self.has_next = len(rows) == PAGE_SIZE
+            if rows:
+                anchor = self._first_visible(children)
+                self._insert(rows, "end")
+                children = self.tree.get_children()
+                if len(children) > MAX_ROWS:
+                    self._drop(children[:len(children) - MAX_ROWS])
+                    self.has_prev = True
+                self._restore(anchor)
+        finally:
+            self._busy = False
+
+    def _load_prev(self):
+        try:
+            children = self.tree.get_children()
+            rows = self._fetch(before=self.keys[children[0]])
+            self.has_prev = len(rows) == PAGE_SIZE
+            if rows:
+                anchor = self._first_visible(children)
+                self._insert(rows, "start")
+                children = self.tree.get_children()
+                if len(children) > MAX_ROWS:
+                    self._drop(children[MAX_ROWS:])
+                    self.has_next = True
+                self._restore(anchor)
+        finally:
+            self._busy = False
+
+    # Keep the row the user was looking at in place while pages are added
+    # and dropped around it.
+    def _first_visible(self, children):
+        first = self.tree.yview()[0]
+        return children[min(int(first * len(children)), len(children) - 1)]
+
+    def _restore(self, anchor):
+        children = self.tree.get_children()
+        self.tree.yview_moveto(self.tree.index(anchor) / len(children))
+
+    def _update_headings(self):
+        for col, label, _, _ in COLUMNS:
+            if col == self.sort:
+                label += " ▼" if self.descending else " ▲"
+            self.tree.heading(col, text=label)
+
+
+def open_expense_grid(master, store, user, title, **filters):
+    win = tk.Toplevel(master)
+    win.title(title)
+    win.geometry("700x480")
+    win.configure(bg="white")
+    grid = ExpenseGrid(win, store, user, **filters)
+    grid.pack(fill="both", expand=True, padx=8, pady=8)
+    return grid
+
+
+# ---------------- Search ----------------
+SEARCH_PAGE_SIZE = 100
+SEARCH_DEBOUNCE_MS = 300
+
+
+class SearchWindow:
+    # Ranked description search combined with date, amount and category
+    # filters. Queries run on the background executor and restart (after a
+    # short debounce) as the user types; "More results" fetches the next page.
+    def __init__(self, master, store, executor, user, categories):
+        self.store = store
+        self.executor = executor
+        self.user = user
+        self.query = None
+        self.offset = 0
+        self.task = None
+        self.pending = None
+
+        self.win = tk.Toplevel(master)
+        self.win.title("Search Expenses")
+        self.win.geometry("760x520")
+        self.win.configure(bg="black")
+
+        form = tk.Frame(self.win, bg="black")
+        form.pack(fill="x", padx=8, pady=8)
+        label = {"fg": "white", "bg": "black"}
+        tk.Label(form, text="Search:", **label).grid(row=0, column=0, sticky="w")
+        self.entry_text = tk.Entry(form, width=40)
+        self.entry_text.grid(row=0, column=1, columnspan=3, sticky="we", padx=4, pady=3)
+        tk.Label(form, text="Category:", **label).grid(row=0, column=4, sticky="w", padx=(8, 0))
+        self.category = tk.StringVar(value="All")
+        tk.OptionMenu(form, self.category, "All", *categories, command=lambda _: self.schedule()).grid(row=0, column=5, sticky="w")
+        tk.Label(form, text="From:", **label).grid(row=1, column=0, sticky="w")
+        self.entry_from = tk.Entry(form, width=12)
+        self.entry_from.grid(row=1, column=1, sticky="w", padx=4, pady=3)
+        tk.Label(form, text="To:", **label).grid(row=1, column=2, sticky="w")
+        self.entry_to = tk.Entry(form, width=12)
+        self.entry_to.grid(row=1, column=3, sticky="w", padx=4, pady=3)
+        tk.Label(form, text="Amount:", **label).grid(row=1, column=4, sticky="w", padx=(8, 0))
+        amounts = tk.Frame(form, bg="black")
+        amounts.grid(row=1, column=5, sticky="w")
+        self.entry_min = tk.Entry(amounts, width=8)
+        self.entry_min.pack(side="left")
+        tk.Label(amounts, text="to", **label).pack(side="left", padx=3)
+        self.entry_max = tk.Entry(amounts, width=8)
+        self.entry_max.pack(side="left")
+        for entry in (self.entry_text, self.entry_from, self.entry_to, self.entry_min, self.entry_max):
+            entry.bind("<KeyRelease>", lambda e: self.schedule())
+            entry.bind("<Return>", lambda e: self.search())
+
+        table = tk.Frame(self.win)
+        table.pack(fill="both", expand=True, padx=8)
+        self.tree = ttk.Treeview(table, columns=[c[0] for c in COLUMNS], show="headings", selectmode="browse")
+        for col, text, width, anchor in COLUMNS:
+            self.tree.heading(col, text=text)
+            self.tree.column(col, width=width, anchor=anchor, stretch=(col == "description"))
+        scrollbar = ttk.Scrollbar(table, orient="vertical", command=self.tree.yview)
+        self.tree.configure(yscrollcommand=scrollbar.set)
+        self.tree.pack(side="left", fill="both", expand=True)
+        scrollbar.pack(side="right", fill="y")
+
+        bottom = tk.Frame(self.win, bg="black")
+        bottom.pack(fill="x", padx=8, pady=8)
+        self.status = tk.Label(bottom, text="", fg="gray", bg="black")
+        self.status.pack(side="left")
+        self.more = tk.Button(bottom, text="More results", command=self.load_more, state="disabled",
+                              bg="white", fg="black", bd=0, activebackground="#e0e0e0")
+        self.more.pack(side="right")
+        self.entry_text.focus_set()
+        self.search()
+
+    def schedule(self):
+        if self.pending is not None:
+            self.win.after_cancel(self.pending)
+        self.pending = self.win.after(SEARCH_DEBOUNCE_MS, self.search)
+
+    def _read_filters(self):
+        query = {"text": self.entry_text.get()}
+        for key, entry in (("start", self.entry_from), ("end", self.entry_to)):
+            value = entry.get().strip()
+            if value:
+                try:
+                    value = datetime.strptime(value, "%Y-%m-%d").date().isoformat()
+                except ValueError:
+                    raise ValueError("Dates must be YYYY-MM-DD.")
+            query[key] = value or None
+        for key, entry in (("min_amount", self.entry_min), ("max_amount", self.entry_max)):
+            value = entry.get().strip()
+            try:
+                query[key] = parse_amount(value, self.store.currency) if value else None
+            except ValueError:
+                raise ValueError("Amounts must be numbers.")
+        query["category"] = None if self.category.get() == "All" else self.category.get()
+        return query
+
+    def search(self):
+        self.pending = None
+        try:
+            self.query = self._read_filters()
+        except ValueError as e:
+            self.status.configure(text=str(e))
+            return
+        self.offset = 0
+        self.tree.delete(*self.tree.get_children())
+        self._fetch()
+
+    def load_more(self):
+        self._fetch()
+
+    def _fetch(self):
+        if self.task is not None:
+            self.task.cancel()
+        self.status.configure(text="Searching...")
+        self.more.configure(state="disabled")
+        started = time.perf_counter()
+        query = dict(self.query, limit=SEARCH_PAGE_SIZE, offset=self.offset)
+        self.task = self.executor.submit(lambda: self.store.search_expenses(self.user, **query),
+                                         on_done=lambda rows: self._show(rows, started))
+
+    def _show(self, rows, started):
+        if not self.win.winfo_exists():
+            return
+        self.task = None
+        for rid, date, cat, desc, amt, cur in rows:
+            self.tree.insert("", "end", values=(rid, date, cat, desc or "", amount_text(self.store, amt, cur)))
+        self.offset += len(rows)
+        elapsed = (time.perf_counter() - started) * 1000
+        self.status.configure(text=f"{self.offset} results shown ({elapsed:.0f} ms)" if self.offset else "No matches")
+        self.more.configure(state="normal" if len(rows) == SEARCH_PAGE_SIZE else "disabled")
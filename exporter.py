@@ -0,0 +1,275 @@
+import argparse
+import csv
+import gzip
+import hashlib
+import os
+import sys
+import time
+from collections import Counter
+from datetime import date
+
+from store import get_store, CATEGORIES, DB_NAME
+from money import format_amount
+
+BATCH_SIZE = 5000
+HEADER = ["ID", "Date", "Category", "Description", "Amount", "Currency"]
+FORMATS = ["csv", "csv.gz", "parquet", "arrow", "npz"]
+EXTENSIONS = {"csv": ".csv", "csv.gz": ".csv.gz", "parquet": ".parquet", "arrow": ".arrow", "npz": ".npz"}
+
+
+class ExportError(Exception):
+    pass
+
+
+class ExportReport:
+    def __init__(self, path, fmt):
+        self.path = path
+        self.format = fmt
+        self.rows = 0
+        self.elapsed = 0.0
+
+    def summary(self):
+        rate = self.rows / self.elapsed if self.elapsed > 0 else 0.0
+        return (f"Exported {self.rows} rows to {os.path.basename(self.path)} ({self.format}) "
+                f"in {self.elapsed:.2f}s ({rate:,.0f} rows/sec)")
+
+
+def detect_format(path):
+    name = path.lower()
+    if name.endswith(".csv.gz") or name.endswith(".gz"):
+        return "csv.gz"
+    for fmt, ext in EXTENSIONS.items():
+        if name.endswith(ext):
+            return fmt
+    if name.endswith(".feather") or name.endswith(".ipc"):
+        return "arrow"
+    return "csv"
+
+
+def columnar_format():
+    # Parquet when pyarrow is installed, otherwise NumPy's .npz.
+    try:
+        import pyarrow  # noqa: F401
+        return "parquet"
+    except ImportError:
+        return "npz"
+
+
+# ---------------- Writers ----------------
+# Each writer consumes the batch iterator and returns the number of rows
+# written. They write to a temporary path that export_expenses renames into
+# place, so a failed or cancelled export never leaves a truncated file.
+# Text formats write amounts as exact decimals ("1234.50"); the columnar
+# ones keep the integer minor units and the currency next to them.
+def _write_csv(fp, batches):
+    writer = csv.writer(fp)
+    writer.writerow(HEADER)
+    rows = 0
+    for batch in batches:
+        writer.writerows((rid, day, cat, desc, format_amount(minor, cur), cur)
+                         for rid, day, cat, desc, minor, cur in batch)
+        rows += len(batch)
+    return rows
+
+
+def write_csv(path, batches):
+    with open(path, "w", newline="", encoding="utf-8") as fp:
+        return _write_csv(fp, batches)
+
+
+def write_csv_gz(path, batches):
+    with gzip.open(path, "wt", newline="", encoding="utf-8", compresslevel=6) as fp:
+        return _write_csv(fp, batches)
+
+
+def _arrow_batches(batches):
+    import pyarrow as pa
+    schema = pa.schema([("id", pa.int64()), ("date", pa.string()),
+                        ("category", pa.dictionary(pa.int8(), pa.string())),
+                        ("description", pa.string()), ("amount_minor", pa.int64()),
+                        ("currency", pa.string())])
+    # One fixed category dictionary for every batch: Arrow IPC files reject
+    # a dictionary that changes between batches.
+    names = pa.array(CATEGORIES, pa.string())
+    codes = {name: i for i, name in enumerate(CATEGORIES)}
+
+    def encode(cats):
+        try:
+            return pa.DictionaryArray.from_arrays(pa.array([codes[c] for c in cats], pa.int8()), names)
+        except KeyError as e:
+            raise ExportError(f"unexpected category {e.args[0]!r}")
+
+    def convert():
+        for batch in batches:
+            ids, dates, cats, descs, amounts, currencies = zip(*batch)
+            yield pa.record_batch([pa.array(ids, pa.int64()), pa.array(dates, pa.string()), encode(cats),
+                                   pa.array(descs, pa.string()), pa.array(amounts, pa.int64()),
+                                   pa.array(currencies, pa.string())], schema=schema)
+    return schema, convert()
+
+
+def write_parquet(path, batches):
+    try:
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise ExportError("Parquet export needs pyarrow; use .npz instead")
+    schema, records = _arrow_batches(batches)
+    rows = 0
+    with pq.ParquetWriter(path, schema, compression="zstd") as writer:
+        for record in records:
+            writer.write_batch(record)
+            rows += record.num_rows
+    return rows
+
+
+def write_arrow(path, batches):
+    try:
+        import pyarrow as pa
+    except ImportError:
+        raise ExportError("Arrow export needs pyarrow; use .npz instead")
+    schema, records = _arrow_batches(batches)
+    rows = 0
+    with pa.OSFile(path, "wb") as sink, pa.ipc.new_file(sink, schema) as writer:
+        for record in records:
+            writer.write_batch(record)
+            rows += record.num_rows
+    return rows
+
+
+def write_npz(path, batches):
+    try:
+        import numpy as np
+    except ImportError:
+        raise ExportError("NumPy export needs numpy installed")
+    # Columns are converted batch by batch into compact arrays; only those
+    # arrays, never the row tuples, are held until the file is written.
+    codes = {name: i for i, name in enumerate(CATEGORIES)}
+    names = list(CATEGORIES)
+    cols = {"id": [], "date": [], "category": [], "description": [], "amount_minor": [], "currency": []}
+    for batch in batches:
+        ids, dates, cats, descs, amounts, currencies = zip(*batch)
+        for cat in cats:
+            if cat not in codes:
+                codes[cat] = len(names)
+                names.append(cat)
+        cols["id"].append(np.array(ids, dtype=np.int64))
+        cols["date"].append(np.array(dates, dtype="datetime64[D]"))
+        cols["category"].append(np.array([codes[c] for c in cats], dtype=np.uint8))
+        cols["description"].append(np.array(descs, dtype=str))
+        cols["amount_minor"].append(np.array(amounts, dtype=np.int64))
+        cols["currency"].append(np.array(currencies, dtype="U3"))
+    arrays = {k: np.concatenate(v) if v else np.array([]) for k, v in cols.items()}
+    with open(path, "wb") as fp:
+        np.savez_compressed(fp, categories=np.array(names, dtype=str), **arrays)
+    return len(arrays["id"])
+
+
+WRITERS = {"csv": write_csv, "csv.gz": write_csv_gz, "parquet": write_parquet,
+           "arrow": write_arrow, "npz": write_npz}
+
+
+# ---------------- Export ----------------
+def export_expenses(store, user, path, fmt=None, start=None, end=None, category=None,
+                    batch_size=BATCH_SIZE, progress=None, history=False):
+    # progress(rows_done, rows_total) is called after every batch; raising
+    # from it (e.g. background.Cancelled) aborts the export. history=True
+    # includes years moved to archive files (store.py archive).
+    fmt = fmt or detect_format(path)
+    if fmt not in WRITERS:
+        raise ExportError(f"unknown export format {fmt!r}")
+    report = ExportReport(path, fmt)
+    started = time.perf_counter()
+    count, stream = store.count_expenses, store.iter_expense_batches
+    if history:
+        count, stream = store.count_history, store.iter_history_batches
+    total = count(user, start, end, category) if progress else None
+
+    def batches():
+        done = 0
+        for batch in stream(user, batch_size, start, end, category):
+            yield batch
+            done += len(batch)
+            if progress:
+                progress(done, total)
+
+    tmp = path + ".part"
+    try:
+        report.rows = WRITERS[fmt](tmp, batches())
+        os.replace(tmp, path)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+    report.elapsed = time.perf_counter() - started
+    return report
+
+
+# ---------------- CLI ----------------
+def _iso_date(text):
+    try:
+        return date.fromisoformat(text).isoformat()
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid date {text!r}, expected YYYY-MM-DD")
+
+
+def _safe_name(user):
+    return "".join(c if c.isalnum() or c in "-_." else "_" for c in user)
+
+
+def _file_names(users):
+    # {user: file name part}. Usernames that only differ in replaced
+    # characters ("a b", "a_b") or in case (on Windows) would share a file,
+    # so those get a short hash of the raw username appended.
+    names = {user: _safe_name(user) for user in users}
+    clashes = Counter(name.lower() for name in names.values())
+    for user, name in names.items():
+        if name != user or clashes[name.lower()] > 1:
+            names[user] = f"{name}-{hashlib.sha1(user.encode('utf-8')).hexdigest()[:8]}"
+    return names
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Export ByteBank expenses (e.g. from a nightly cron job).")
+    who = parser.add_mutually_exclusive_group(required=True)
+    who.add_argument("--user", help="export a single user's expenses")
+    who.add_argument("--all-users", action="store_true", help="export every user, one file each")
+    parser.add_argument("--out", required=True,
+                        help="output file, or a directory when --all-users is used")
+    parser.add_argument("--format", choices=FORMATS + ["columnar"],
+                        help="output format (default: from the file extension, csv.gz for --all-users); "
+                             "'columnar' picks parquet when pyarrow is available, else npz")
+    parser.add_argument("--from", dest="start", type=_iso_date, help="first date to include (YYYY-MM-DD)")
+    parser.add_argument("--to", dest="end", type=_iso_date, help="last date to include (YYYY-MM-DD)")
+    parser.add_argument("--category", help="only export this category")
+    parser.add_argument("--all-history", action="store_true", help="include archived years")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE, help="rows fetched per batch")
+    parser.add_argument("--db", default=DB_NAME, help="database file (default: %(default)s)")
+    args = parser.parse_args(argv)
+
+    fmt = columnar_format() if args.format == "columnar" else args.format
+    store = get_store(args.db)
+    if args.all_users:
+        fmt = fmt or "csv.gz"
+        os.makedirs(args.out, exist_ok=True)
+        stamp = date.today().strftime("%Y%m%d")
+        names = _file_names(store.expense_users())
+        targets = [(user, os.path.join(args.out, f"bytebank-{name}-{stamp}{EXTENSIONS[fmt]}"))
+                   for user, name in names.items()]
+    else:
+        targets = [(args.user, args.out)]
+
+    status = 0
+    for user, path in targets:
+        try:
+            report = export_expenses(store, user, path, fmt, args.start, args.end, args.category, args.batch_size,
+                                     history=args.all_history)
+        except (OSError, ExportError) as e:
+            print(f"{user}: export failed: {e}", file=sys.stderr)
+            status = 1
+            continue
+        print(f"{user}: {report.summary()}")
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,17 +0,0 @@
-import json
-import os
-
-FILE_NAME = "expenses.json"
-
-def load_data():
-    if not os.path.exists(FILE_NAME):
-        return []
-    try:
-        with open(FILE_NAME, "r") as file:
-            return json.load(file)
-    except json.JSONDecodeError:
-        return []
-
-def save_data(data):
-    with open(FILE_NAME, "w") as file:
-        json.dump(data, file, indent=4)
\ No newline at end of file
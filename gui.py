@@ -1,42 +1,54 @@
 import tkinter as tk
-from tkinter import messagebox, simpledialog, scrolledtext, filedialog
+from tkinter import messagebox, simpledialog, filedialog
 from datetime import datetime
-import sqlite3
-import csv
+import argparse
+import importlib
 import os
-from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
-from matplotlib.figure import Figure
-
-DB_NAME = "bytebank.db"
-
-# ---------------- Database helpers ----------------
-def get_conn():
-    return sqlite3.connect(DB_NAME)
-
-def setup_db():
-    conn = get_conn()
-    cur = conn.cursor()
-    cur.execute("""
-    CREATE TABLE IF NOT EXISTS users (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        username TEXT UNIQUE NOT NULL,
-        password TEXT NOT NULL
-    )
-    """)
-    cur.execute("""
-    CREATE TABLE IF NOT EXISTS expenses (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        user TEXT NOT NULL,
-        date TEXT NOT NULL,
-        category TEXT NOT NULL,
-        description TEXT,
-        amount REAL NOT NULL
-    )
-    """)
-    conn.commit()
-    conn.close()
-
-setup_db()
+import threading
+from store import get_store, CATEGORIES
+from money import parse_money, format_amount
+from recurring import parse_schedule
+from categorize import Categorizer, parse_rule, rule_text
+from importer import import_file
+from exporter import export_expenses
+from expense_grid import open_expense_grid, SearchWindow
+from background import TkExecutor, ProgressDialog
+from auth import get_authenticator, LoginThrottled
+import diagnostics
+
+# ---------------- Charts ----------------
+# charts.py pulls in matplotlib and NumPy, which take longer to import than
+# the rest of the app put together. It is imported on first use instead of
+# at startup, and pre-warmed on a background thread once the login window is
+# up so the first graph click rarely has to wait for it.
+def load_charts():
+    return importlib.import_module("charts")
+
+def load_analytics():
+    # NumPy-backed like charts; None when NumPy is not installed.
+    try:
+        return importlib.import_module("analytics")
+    except ImportError:
+        return None
+
+def prewarm_charts():
+    threading.Thread(target=load_charts, name="bytebank-prewarm", daemon=True).start()
+
+# ---------------- Backend ----------------
+# By default the GUI opens bytebank.db itself. Started with --server it talks
+# to a running service.py instead (service.RemoteStore), so several clients
+# can share one database.
+remote = None
+
+def backend_store():
+    return remote if remote is not None else get_store()
+
+def backend_auth():
+    return remote if remote is not None else get_authenticator(get_store())
+
+# How often an open main window writes recurring expenses that have fallen due
+# and runs the store's maintenance pass.
+HOUSEKEEPING_MS = 60 * 60 * 1000
 
 # ---------------- Login / Register Window ----------------
 def start_login_window():
@@ -59,22 +71,41 @@ def start_login_window():
     entry_pass = tk.Entry(frame, show="*", width=28)
     entry_pass.grid(row=1, column=1, padx=5, pady=6)
 
+    # Password hashing is deliberately slow, so it runs on a worker thread
+    # and the buttons are disabled until the result comes back.
+    executor = TkExecutor(login_root, max_workers=1)
+    buttons = []
+    status = tk.Label(login_root, text="", fg="gray", bg="black", font=("Helvetica", 9))
+
+    def set_busy(busy, text=""):
+        for b in buttons:
+            b.configure(state="disabled" if busy else "normal")
+        status.configure(text=text)
+
+    def on_error(e):
+        set_busy(False)
+        if isinstance(e, LoginThrottled):
+            messagebox.showerror("Login blocked", str(e), parent=login_root)
+        else:
+            messagebox.showerror("Error", f"Something went wrong: {e}", parent=login_root)
+
     def register():
         username = entry_user.get().strip()
         password = entry_pass.get().strip()
         if not username or not password:
             messagebox.showwarning("Input error", "Please enter username and password", parent=login_root)
             return
-        conn = get_conn()
-        cur = conn.cursor()
-        try:
-            cur.execute("INSERT INTO users (username, password) VALUES (?, ?)", (username, password))
-            conn.commit()
-            messagebox.showinfo("Success", "Registration successful. You can now login.", parent=login_root)
-        except sqlite3.IntegrityError:
-            messagebox.showerror("Error", "Username already exists.", parent=login_root)
-        finally:
-            conn.close()
+
+        def done(created):
+            set_busy(False)
+            if created:
+                messagebox.showinfo("Success", "Registration successful. You can now login.", parent=login_root)
+            else:
+                messagebox.showerror("Error", "Username already exists.", parent=login_root)
+
+        set_busy(True, "Registering...")
+        executor.submit(lambda: backend_auth().register(username, password),
+                        on_done=done, on_error=on_error)
 
     def login():
         username = entry_user.get().strip()
@@ -82,36 +113,43 @@ def start_login_window():
         if not username or not password:
             messagebox.showwarning("Input error", "Please enter username and password", parent=login_root)
             return
-        conn = get_conn()
-        cur = conn.cursor()
-        cur.execute("SELECT * FROM users WHERE username=? AND password=?", (username, password))
-        user = cur.fetchone()
-        conn.close()
-        if user:
-            login_root.destroy()
-            open_main_window(username)
-        else:
-            messagebox.showerror("Login failed", "Invalid username or password", parent=login_root)
+
+        def done(ok):
+            set_busy(False)
+            if ok:
+                executor.shutdown()
+                login_root.destroy()
+                open_main_window(username)
+            else:
+                messagebox.showerror("Login failed", "Invalid username or password", parent=login_root)
+
+        set_busy(True, "Checking credentials...")
+        executor.submit(lambda: backend_auth().login(username, password),
+                        on_done=done, on_error=on_error)
 
     btn_frame = tk.Frame(login_root, bg="black")
     btn_frame.pack(pady=10)
 
     btn_style = {"width": 12, "bg": "white", "fg": "black", "font": ("Helvetica", 11, "bold"), "bd": 0, "activebackground": "#e0e0e0"}
-    tk.Button(btn_frame, text="Login", command=login, **btn_style).grid(row=0, column=0, padx=8)
-    tk.Button(btn_frame, text="Register", command=register, **btn_style).grid(row=0, column=1, padx=8)
+    buttons.append(tk.Button(btn_frame, text="Login", command=login, **btn_style))
+    buttons[-1].grid(row=0, column=0, padx=8)
+    buttons.append(tk.Button(btn_frame, text="Register", command=register, **btn_style))
+    buttons[-1].grid(row=0, column=1, padx=8)
 
     tk.Label(login_root, text="(Register a new user first if you don't have an account)",
              fg="gray", bg="black", font=("Helvetica", 9)).pack(pady=8)
+    status.pack()
+    login_root.after(500, prewarm_charts)
 
     login_root.mainloop()
 
 # ---------------- Main App Window ----------------
 def open_main_window(username):
-    setup_db()
+    store = backend_store()
 
     app = tk.Tk()
     app.title(f"ByteBank — {username}")
-    app.geometry("640x620")
+    app.geometry("640x480")
     app.configure(bg="black")
 
     header = tk.Label(app, text=f"ByteBank Expense Analyzer — {username}",
@@ -119,7 +157,7 @@ def open_main_window(username):
     header.pack(pady=12)
 
     def valid_category_input(prompt, default=None):
-        valid_categories = ["Food", "Transport", "Rent", "Bills", "Others"]
+        valid_categories = CATEGORIES
         while True:
             ans = simpledialog.askstring("Category", prompt, initialvalue=default, parent=app)
             if ans is None:
@@ -129,6 +167,14 @@ def open_main_window(username):
             else:
                 messagebox.showerror("Invalid", f"Choose category: {', '.join(valid_categories)}", parent=app)
 
+    def show_saved(title, message, alerts):
+        # Budget and spike alerts come back with the write, so they are shown
+        # in the same dialog that confirms it.
+        if alerts:
+            messagebox.showwarning(title, message + "\n\n" + "\n".join(text for _, text in alerts), parent=app)
+        else:
+            messagebox.showinfo(title, message, parent=app)
+
     # ---- CRUD Operations ----
     def add_expense():
         while True:
@@ -138,7 +184,7 @@ def open_main_window(username):
                 date_input = datetime.today().strftime("%Y-%m-%d")
                 break
             try:
-                datetime.strptime(date_input, "%Y-%m-%d")
+                date_input = datetime.strptime(date_input, "%Y-%m-%d").date().isoformat()
                 break
             except ValueError:
                 messagebox.showerror("Invalid", "Enter date in YYYY-MM-DD format.", parent=app)
@@ -149,43 +195,20 @@ def open_main_window(username):
         description = simpledialog.askstring("Description", "Enter description (optional):", parent=app)
 
         while True:
-            amount_input = simpledialog.askstring("Amount", "Enter amount (positive number):", parent=app)
+            amount_input = simpledialog.askstring("Amount", f"Enter amount in {store.currency} (or e.g. 12.50 USD):", parent=app)
             if amount_input is None: return
             try:
-                amount = float(amount_input)
+                amount, currency = parse_money(amount_input, store.currency)
                 if amount <= 0: raise ValueError
                 break
             except ValueError:
-                messagebox.showerror("Invalid", "Enter a valid positive number.", parent=app)
+                messagebox.showerror("Invalid", "Enter a valid positive amount.", parent=app)
 
-        conn = get_conn()
-        cur = conn.cursor()
-        cur.execute("INSERT INTO expenses (user, date, category, description, amount) VALUES (?, ?, ?, ?, ?)",
-                    (username, date_input, category, description or "", amount))
-        conn.commit()
-        conn.close()
-        messagebox.showinfo("Success", "Expense added.", parent=app)
+        store.add_expense(username, date_input, category, description, amount, currency)
+        show_saved("Success", "Expense added.", store.expense_alerts(username, date_input, category, amount, currency))
 
     def view_expenses():
-        conn = get_conn()
-        cur = conn.cursor()
-        cur.execute("SELECT id, date, category, description, amount FROM expenses WHERE user=? ORDER BY date DESC, id DESC", (username,))
-        rows = cur.fetchall()
-        conn.close()
-
-        win = tk.Toplevel(app)
-        win.title("All Expenses")
-        win.geometry("700x480")
-        win.configure(bg="white")
-        st = scrolledtext.ScrolledText(win, width=95, height=28)
-        st.pack(padx=8, pady=8)
-        st.insert(tk.END, "ID | Date       | Category   | Description                     | Amount\n")
-        st.insert(tk.END, "-"*95 + "\n")
-        for r in rows:
-            rid, date, cat, desc, amt = r
-            desc = (desc[:30] + "...") if desc and len(desc) > 33 else (desc or "")
-            st.insert(tk.END, f"{rid:3} | {date:10} | {cat:9} | {desc:30} | {amt:.2f}\n")
-        st.configure(state="disabled")
+        open_expense_grid(app, store, username, "All Expenses")
 
     def update_expense():
         try:
@@ -196,19 +219,15 @@ def open_main_window(username):
             messagebox.showerror("Invalid", "Enter a valid integer ID.", parent=app)
             return
 
-        conn = get_conn()
-        cur = conn.cursor()
-        cur.execute("SELECT id, date, category, description, amount FROM expenses WHERE id=? AND user=?", (exp_id, username))
-        r = cur.fetchone()
-        conn.close()
+        r = store.get_expense(username, exp_id)
         if not r:
             messagebox.showerror("Not found", "Expense ID not found for your account.", parent=app)
             return
 
-        _, date_old, cat_old, desc_old, amt_old = r
+        _, date_old, cat_old, desc_old, amt_old, cur_old = r
         date_new = simpledialog.askstring("Date", f"Enter new date ({date_old}) or leave empty to keep:", parent=app) or date_old
         try:
-            datetime.strptime(date_new, "%Y-%m-%d")
+            date_new = datetime.strptime(date_new, "%Y-%m-%d").date().isoformat()
         except ValueError:
             messagebox.showerror("Invalid", "Date must be YYYY-MM-DD.", parent=app)
             return
@@ -219,23 +238,21 @@ def open_main_window(username):
         description_new = simpledialog.askstring("Description", f"Enter new description or leave empty to keep:", parent=app)
         if description_new is None or description_new.strip() == "": description_new = desc_old
 
-        amt_input = simpledialog.askstring("Amount", f"Enter new amount ({amt_old}) or leave empty to keep:", parent=app)
-        if amt_input is None or amt_input.strip() == "": amount_new = amt_old
+        amt_input = simpledialog.askstring("Amount", f"Enter new amount ({format_amount(amt_old, cur_old, code=True)}) "
+                                           "or leave empty to keep:", parent=app)
+        if amt_input is None or amt_input.strip() == "": amount_new, currency_new = amt_old, cur_old
         else:
             try:
-                amount_new = float(amt_input)
+                amount_new, currency_new = parse_money(amt_input, cur_old)
                 if amount_new <= 0: raise ValueError
             except ValueError:
                 messagebox.showerror("Invalid", "Enter valid positive amount.", parent=app)
                 return
 
-        conn = get_conn()
-        cur = conn.cursor()
-        cur.execute("""UPDATE expenses SET date=?, category=?, description=?, amount=? WHERE id=? AND user=?""",
-                    (date_new, category_new, description_new, amount_new, exp_id, username))
-        conn.commit()
-        conn.close()
-        messagebox.showinfo("Success", "Expense updated.", parent=app)
+        store.update_expense(username, exp_id, date_new, category_new, description_new, amount_new, currency_new)
+        show_saved("Success", "Expense updated.",
+                   store.expense_alerts(username, date_new, category_new, amount_new, currency_new,
+                                        previous=(date_old, cat_old, amt_old, cur_old)))
 
     def delete_expense():
         try:
@@ -246,172 +263,401 @@ def open_main_window(username):
             messagebox.showerror("Invalid", "Enter a valid integer ID.", parent=app)
             return
 
-        conn = get_conn()
-        cur = conn.cursor()
-        cur.execute("SELECT id FROM expenses WHERE id=? AND user=?", (exp_id, username))
-        r = cur.fetchone()
-        conn.close()
-        if not r:
+        if not store.get_expense(username, exp_id):
             messagebox.showerror("Not found", "Expense ID not found for your account.", parent=app)
             return
 
         if not messagebox.askyesno("Confirm", f"Delete expense ID {exp_id}?"): return
 
-        conn = get_conn()
-        cur = conn.cursor()
-        cur.execute("DELETE FROM expenses WHERE id=? AND user=?", (exp_id, username))
-        conn.commit()
-        conn.close()
+        store.delete_expense(username, exp_id)
         messagebox.showinfo("Deleted", f"Expense ID {exp_id} deleted.", parent=app)
 
     def filter_expenses():
         choice = simpledialog.askstring("Filter", "Filter by (category/date):", parent=app)
         if choice is None: return
         choice = choice.strip().lower()
-        conn = get_conn()
-        cur = conn.cursor()
         if choice == "category":
             cat = simpledialog.askstring("Category", "Enter category to filter by:", parent=app)
-            if cat is None: conn.close(); return
-            cur.execute("SELECT id, date, category, description, amount FROM expenses WHERE user=? AND LOWER(category)=? ORDER BY date DESC",
-                        (username, cat.lower().title()))
+            if cat is None: return
+            filters = {"category": cat}
         elif choice == "date":
             dateq = simpledialog.askstring("Date", "Enter date (YYYY-MM-DD) to filter:", parent=app)
-            if dateq is None: conn.close(); return
-            try: datetime.strptime(dateq, "%Y-%m-%d")
-            except ValueError: messagebox.showerror("Invalid", "Date must be YYYY-MM-DD.", parent=app); conn.close(); return
-            cur.execute("SELECT id, date, category, description, amount FROM expenses WHERE user=? AND date=? ORDER BY id DESC", (username, dateq))
+            if dateq is None: return
+            try: dateq = datetime.strptime(dateq, "%Y-%m-%d").date().isoformat()
+            except ValueError: messagebox.showerror("Invalid", "Date must be YYYY-MM-DD.", parent=app); return
+            filters = {"date": dateq}
         else:
             messagebox.showerror("Invalid", "Enter 'category' or 'date'.", parent=app)
-            conn.close(); return
+            return
 
-        rows = cur.fetchall()
-        conn.close()
-        if not rows:
+        if not store.page_expenses(username, limit=1, **filters):
             messagebox.showinfo("No results", "No expenses found for that filter.", parent=app)
             return
+        open_expense_grid(app, store, username, "Filtered Expenses", **filters)
 
-        win = tk.Toplevel(app)
-        win.title("Filtered Expenses")
-        win.geometry("700x480")
-        win.configure(bg="white")
-        st = scrolledtext.ScrolledText(win, width=95, height=28)
-        st.pack(padx=8, pady=8)
-        st.insert(tk.END, "ID | Date       | Category   | Description                     | Amount\n")
-        st.insert(tk.END, "-"*95 + "\n")
-        for r in rows:
-            rid, date, cat, desc, amt = r
-            desc = (desc[:30] + "...") if desc and len(desc) > 33 else (desc or "")
-            st.insert(tk.END, f"{rid:3} | {date:10} | {cat:9} | {desc:30} | {amt:.2f}\n")
-        st.configure(state="disabled")
+    # --------- Background work ---------
+    # Queries that scan the user's history, exports and imports run on the
+    # executor's worker threads; their results come back on the Tk thread.
+    executor = TkExecutor(app)
+    if diagnostics.enabled_by_env():
+        diagnostics.enable(store, executor)
+
+    def run_in_background(title, message, fn, *args, on_done=None, with_task=False, on_cancel=None):
+        def on_error(e):
+            messagebox.showerror("Error", f"{title} failed: {e}", parent=app)
+        task = executor.submit(fn, *args, on_done=on_done, on_error=on_error, on_cancel=on_cancel, with_task=with_task)
+        ProgressDialog(app, task, title, message)
+        return task
+
+    def search_expenses():
+        SearchWindow(app, store, executor, username, CATEGORIES)
 
     def summarize_expenses():
-        conn = get_conn()
-        cur = conn.cursor()
-        cur.execute("SELECT SUM(amount) FROM expenses WHERE user=?", (username,))
-        total = cur.fetchone()[0] or 0.0
-        cur.execute("SELECT category, SUM(amount) FROM expenses WHERE user=? GROUP BY category", (username,))
-        rows = cur.fetchall()
-        conn.close()
-        text = f"Total Expenses: {total:.2f}\n\nCategory-wise breakdown:\n"
-        for cat, amt in rows:
-            text += f"{cat}: {amt:.2f}\n"
-        messagebox.showinfo("Summary", text, parent=app)
+        def query():
+            insights = None
+            analytics = load_analytics()
+            cache = analytics.get_cache(store) if analytics else None
+            if cache is not None:
+                insights = (cache.percentiles(username, (50, 90)), cache.top_n(username, 3),
+                            cache.group_by(username, "weekday"))
+            return (store.total_amount(username), store.category_totals(username), store.currency_totals(username),
+                    store.budgets(username), insights)
+
+        def show(result):
+            total, rows, currencies, budgets, insights = result
+            cur = store.currency
+            text = f"Total Expenses: {format_amount(total, cur, code=True)}\n\nCategory-wise breakdown:\n"
+            for cat, amt in rows:
+                text += f"{cat}: {format_amount(amt, cur)}\n"
+            others = [(code, amt) for code, amt in currencies if code != cur]
+            if others:
+                text += "\nOther currencies:\n" + "".join(f"{format_amount(amt, code, code=True)}\n" for code, amt in others)
+            if budgets:
+                text += "\nBudgets this month:\n"
+                for cat, limit, spent, code in budgets:
+                    text += (f"{cat}: {format_amount(spent, code)} of {format_amount(limit, code, code=True)}"
+                             + (" (over)" if spent > limit else "") + "\n")
+            if insights and insights[0]:
+                percentiles, top, weekdays = insights
+                text += (f"\nTypical expense: {format_amount(percentiles[50], cur)} "
+                         f"(90% are under {format_amount(percentiles[90], cur)})\n"
+                         f"Biggest day for spending: {max(weekdays, key=lambda w: w[1])[0]}\n"
+                         "Largest expenses:\n")
+                for _, date, cat, amt in top:
+                    text += f"{date} {cat}: {format_amount(amt, cur)}\n"
+            messagebox.showinfo("Summary", text, parent=app)
+
+        run_in_background("Summary", "Summarizing expenses...", query, on_done=show)
+
+    def manage_budgets():
+        current = "\n".join(f"{cat}: {format_amount(limit, code, code=True)} (spent {format_amount(spent, code)})"
+                            for cat, limit, spent, code in store.budgets(username))
+        category = valid_category_input("Monthly budget for which category?\n\n"
+                                        + (f"Current budgets:\n{current}" if current else "No budgets set yet."))
+        if category is None: return
+        limit_input = simpledialog.askstring("Budget", f"Monthly limit for {category} (leave empty to remove):", parent=app)
+        if limit_input is None: return
+        if not limit_input.strip():
+            store.set_budget(username, category, None)
+            messagebox.showinfo("Budget", f"Budget for {category} removed.", parent=app)
+            return
+        try:
+            limit, currency = parse_money(limit_input, store.currency)
+            if limit <= 0: raise ValueError
+        except ValueError:
+            messagebox.showerror("Invalid", "Enter a valid positive amount.", parent=app)
+            return
+        store.set_budget(username, category, limit, currency)
+        messagebox.showinfo("Budget", f"Budget for {category} set to {format_amount(limit, currency, code=True)} per month.",
+                            parent=app)
+
+    def manage_recurring():
+        rules = store.recurring_rules(username)
+        current = "\n".join(f"#{rid} {schedule}: {cat} {format_amount(amt, code, code=True)} {desc}"
+                            + (f" (next {nxt})" if nxt else " (finished)")
+                            for rid, cat, desc, amt, code, schedule, start, end, nxt in rules)
+        answer = simpledialog.askstring(
+            "Recurring", (f"Recurring expenses:\n{current}\n\n" if current else "No recurring expenses yet.\n\n")
+            + "Enter a schedule for a new one (day-of-month month day-of-week, e.g. \"1 * *\" for the 1st of "
+            "every month, \"* * MON\" for every Monday), or a rule number to remove it:", parent=app)
+        if answer is None or not answer.strip(): return
+        answer = answer.strip().lstrip("#")
+        if answer.isdigit():
+            if store.delete_recurring(username, int(answer)):
+                messagebox.showinfo("Recurring", f"Rule #{answer} removed. Expenses it already added are kept.", parent=app)
+            else:
+                messagebox.showerror("Recurring", f"No rule #{answer}.", parent=app)
+            return
+        try:
+            schedule = parse_schedule(answer).text
+        except ValueError as e:
+            messagebox.showerror("Invalid", str(e), parent=app)
+            return
+        category = valid_category_input("Category (Food, Transport, Rent, Bills, Others):")
+        if category is None: return
+        description = simpledialog.askstring("Description", "Description (optional):", parent=app)
+        amount_input = simpledialog.askstring("Amount", f"Amount in {store.currency} (or e.g. 12.50 USD):", parent=app)
+        if amount_input is None: return
+        try:
+            amount, currency = parse_money(amount_input, store.currency)
+            if amount <= 0: raise ValueError
+        except ValueError:
+            messagebox.showerror("Invalid", "Enter a valid positive amount.", parent=app)
+            return
+        start = simpledialog.askstring("Start", "First date (YYYY-MM-DD) or leave empty for today:", parent=app)
+        if start is None: return
+        start = start.strip() or datetime.today().strftime("%Y-%m-%d")
+        try:
+            store.add_recurring(username, category, description, amount, schedule, start, None, currency)
+        except ValueError as e:
+            messagebox.showerror("Invalid", str(e), parent=app)
+            return
+        # A start date in the past is caught up straight away.
+        if hasattr(store, "materialize_recurring"):
+            run_in_background("Recurring", "Adding due expenses...", store.materialize_recurring,
+                              on_done=lambda created: messagebox.showinfo(
+                                  "Recurring", f"Recurring expense saved; {created} due expenses added.", parent=app))
+        else:
+            messagebox.showinfo("Recurring", "Recurring expense saved.", parent=app)
+
+    # Rules that categorize imported rows with no category of their own.
+    def manage_category_rules():
+        rules = store.category_rules(username)
+        current = "\n".join(f"#{rid} {rule_text(kind, pattern)} -> {cat}" for rid, kind, pattern, cat in rules)
+        answer = simpledialog.askstring(
+            "Auto-categorize", (f"Rules:\n{current}\n\n" if current else "No rules yet.\n\n")
+            + "Enter a word or phrase found in descriptions (e.g. swiggy), a merchant name ending in * to match "
+            "words starting with it (e.g. amzn*), a /regular expression/, or a rule number to remove it:", parent=app)
+        if answer is None or not answer.strip(): return
+        answer = answer.strip()
+        if answer.lstrip("#").isdigit():
+            if not store.delete_category_rule(username, int(answer.lstrip("#"))):
+                messagebox.showerror("Auto-categorize", f"No rule {answer}.", parent=app)
+                return
+        else:
+            try:
+                kind, pattern = parse_rule(answer)
+            except ValueError as e:
+                messagebox.showerror("Invalid", str(e), parent=app)
+                return
+            category = valid_category_input(f"Category for {rule_text(kind, pattern)} (Food, Transport, Rent, Bills, Others):")
+            if category is None: return
+            store.add_category_rule(username, kind, pattern, category)
+        if not messagebox.askyesno("Auto-categorize", "Rules saved. Apply them to the expenses you already have?",
+                                   parent=app):
+            return
+
+        def apply_rules():
+            return store.recategorize(username, Categorizer.for_user(store, username, learn_history=False).categorize)
+
+        run_in_background("Auto-categorize", "Recategorizing expenses...", apply_rules,
+                          on_done=lambda changed: messagebox.showinfo(
+                              "Auto-categorize", f"{changed} expenses recategorized.", parent=app))
+
+    # Recurring expenses that fell due while the app was closed are written
+    # as soon as it opens, then checked again every hour for as long as it
+    # stays open, followed by the store's maintenance (free space, planner
+    # statistics). With service.py the service does both itself.
+    def housekeeping():
+        executor.submit(store.materialize_recurring)
+        executor.submit(store.maintain)
+        app.after(HOUSEKEEPING_MS, housekeeping)
+
+    if hasattr(store, "materialize_recurring"):
+        housekeeping()
 
     # --------- Matplotlib Graphs ---------
     def plot_category_expenses():
-        conn = get_conn()
-        cur = conn.cursor()
-        cur.execute("SELECT category, SUM(amount) FROM expenses WHERE user=? GROUP BY category", (username,))
-        rows = cur.fetchall()
-        conn.close()
+        run_in_background("Category-wise Graph", "Loading totals...", store.category_totals, username,
+                          on_done=show_category_plot)
 
+    def show_category_plot(rows):
         if not rows:
             messagebox.showinfo("No Data", "No expenses to plot.", parent=app)
             return
-
-        categories, amounts = zip(*rows)
-        fig = Figure(figsize=(5,5), dpi=100)
-        ax = fig.add_subplot(111)
-        ax.pie(amounts, labels=categories, autopct='%1.1f%%', startangle=90, colors=['#555','#888','#aaa','#ccc','#eee'])
-        ax.set_title(f"{username}'s Expenses by Category")
-
-        win = tk.Toplevel(app)
-        win.title("Category-wise Expenses")
-        canvas = FigureCanvasTkAgg(fig, master=win)
-        canvas.draw()
-        canvas.get_tk_widget().pack()
+        load_charts().show_category_chart(app, username, rows)
 
     def plot_date_expenses():
-        conn = get_conn()
-        cur = conn.cursor()
-        cur.execute("SELECT date, SUM(amount) FROM expenses WHERE user=? GROUP BY date ORDER BY date", (username,))
-        rows = cur.fetchall()
-        conn.close()
+        run_in_background("Date-wise Graph", "Loading date range...", store.date_bounds, username,
+                          on_done=show_date_plot)
 
-        if not rows:
+    def show_date_plot(bounds):
+        if not bounds:
             messagebox.showinfo("No Data", "No expenses to plot.", parent=app)
             return
+        load_charts().DateChart(app, store, executor, username, bounds)
 
-        dates, amounts = zip(*rows)
-        fig = Figure(figsize=(6,4), dpi=100)
-        ax = fig.add_subplot(111)
-        ax.bar(dates, amounts, color='black')
-        ax.set_xticks(range(len(dates)))
-        ax.set_xticklabels(dates, rotation=45)
-        ax.set_xlabel("Date")
-        ax.set_ylabel("Amount")
-        ax.set_title(f"{username}'s Expenses Over Time")
+    # --------- Export ---------
+    def export_data():
+        if not store.page_expenses(username, limit=1):
+            messagebox.showinfo("No data", "No expenses to export.", parent=app)
+            return
 
         win = tk.Toplevel(app)
-        win.title("Date-wise Expenses")
-        canvas = FigureCanvasTkAgg(fig, master=win)
-        canvas.draw()
-        canvas.get_tk_widget().pack()
-
-    # --------- CSV Export ---------
-    def export_csv():
-        conn = get_conn()
-        cur = conn.cursor()
-        cur.execute("SELECT id, date, category, description, amount FROM expenses WHERE user=? ORDER BY date DESC", (username,))
-        rows = cur.fetchall()
-        conn.close()
-        if not rows:
-            messagebox.showinfo("No data", "No expenses to export.", parent=app)
+        win.title("Export Expenses")
+        win.configure(bg="black")
+        form = tk.Frame(win, bg="black")
+        form.pack(padx=12, pady=10)
+        tk.Label(form, text="From (YYYY-MM-DD, optional):", fg="white", bg="black").grid(row=0, column=0, sticky="w", pady=4)
+        entry_from = tk.Entry(form, width=14)
+        entry_from.grid(row=0, column=1, padx=5, pady=4)
+        tk.Label(form, text="To (YYYY-MM-DD, optional):", fg="white", bg="black").grid(row=1, column=0, sticky="w", pady=4)
+        entry_to = tk.Entry(form, width=14)
+        entry_to.grid(row=1, column=1, padx=5, pady=4)
+        tk.Label(form, text="Category:", fg="white", bg="black").grid(row=2, column=0, sticky="w", pady=4)
+        category_var = tk.StringVar(value="All")
+        tk.OptionMenu(form, category_var, "All", *CATEGORIES).grid(row=2, column=1, sticky="w", padx=5, pady=4)
+        history_var = tk.BooleanVar(value=False)
+        if hasattr(store, "archive_years") and store.archive_years():
+            tk.Checkbutton(form, text="Include archived years", variable=history_var, fg="white", bg="black",
+                           selectcolor="black", activebackground="black").grid(row=3, column=0, columnspan=2,
+                                                                               sticky="w", pady=4)
+
+        def choose_file():
+            bounds = []
+            for entry in (entry_from, entry_to):
+                value = entry.get().strip()
+                if value:
+                    try: value = datetime.strptime(value, "%Y-%m-%d").date().isoformat()
+                    except ValueError: messagebox.showerror("Invalid", "Dates must be YYYY-MM-DD.", parent=win); return
+                bounds.append(value or None)
+            category = None if category_var.get() == "All" else category_var.get()
+            history = history_var.get()
+            fpath = filedialog.asksaveasfilename(defaultextension=".csv", parent=win, filetypes=[
+                ("CSV files", "*.csv"), ("Gzipped CSV", "*.csv.gz"), ("Parquet", "*.parquet"),
+                ("Arrow IPC", "*.arrow"), ("NumPy arrays", "*.npz")])
+            if not fpath:
+                return
+            win.destroy()
+
+            def write(task):
+                return export_expenses(store, username, fpath, start=bounds[0], end=bounds[1], category=category,
+                                       progress=task.report, history=history)
+
+            def done(report):
+                if not report.rows:
+                    messagebox.showinfo("Exported", f"No expenses matched; wrote an empty {os.path.basename(fpath)}", parent=app)
+                else:
+                    messagebox.showinfo("Exported", report.summary(), parent=app)
+
+            run_in_background("Export", "Exporting rows...", write, on_done=done, with_task=True)
+
+        tk.Button(win, text="Export...", command=choose_file, width=12, bg="white", fg="black", bd=0,
+                  activebackground="#e0e0e0").pack(pady=(0, 12))
+
+    # --------- Bulk Import ---------
+    def import_expenses():
+        fpath = filedialog.askopenfilename(filetypes=[("CSV or JSON files", "*.csv *.json"), ("CSV files", "*.csv"), ("JSON files", "*.json")], parent=app)
+        if not fpath:
             return
-        fpath = filedialog.asksaveasfilename(defaultextension=".csv", filetypes=[("CSV files","*.csv")], parent=app)
+        progress = {}
+
+        def load(task):
+            def report_progress(report):
+                progress["imported"] = report.imported
+                task.report(report.imported, message=f"Imported {report.imported:,} rows...")
+            return import_file(store, username, fpath, progress=report_progress)
+
+        def done(report):
+            text = report.summary()
+            if report.errors:
+                text += "\n\nFirst errors:\n" + "\n".join(f"{where}: {msg}" for where, msg in report.errors[:10])
+            messagebox.showinfo("Imported", text, parent=app)
+
+        def cancelled():
+            messagebox.showinfo("Import cancelled", f"Import stopped after {progress.get('imported', 0):,} rows.", parent=app)
+
+        run_in_background("Import", "Importing expenses...", load, on_done=done, on_cancel=cancelled, with_task=True)
+
+    # --------- Backup ---------
+    # A snapshot of the whole database, archive files included, while the
+    # app keeps running; writes made during the copy are not held up and are
+    # not part of it.
+    def backup_database():
+        fpath = filedialog.asksaveasfilename(defaultextension=".db", parent=app,
+                                             initialfile=f"bytebank-backup-{datetime.now():%Y%m%d}.db",
+                                             filetypes=[("SQLite database", "*.db")])
         if not fpath:
             return
-        try:
-            with open(fpath, "w", newline="", encoding="utf-8") as f:
-                writer = csv.writer(f)
-                writer.writerow(["ID","Date","Category","Description","Amount"])
-                for r in rows:
-                    writer.writerow(r)
-            messagebox.showinfo("Exported", f"Expenses exported to {os.path.basename(fpath)}", parent=app)
-        except Exception as e:
-            messagebox.showerror("Error", f"Export failed: {e}", parent=app)
+
+        def copy(task):
+            return store.backup(fpath, progress=lambda done, total: task.report(
+                done, total, f"Copying database... {done * 100 // max(total, 1)}%"))
+
+        def done(size):
+            text = f"Backed up {size / 1e6:.1f} MB to {os.path.basename(fpath)}."
+            years = store.archive_years()
+            if years:
+                text += f"\n\nArchived years ({', '.join(map(str, years))}) were copied to files next to it."
+            messagebox.showinfo("Backup", text, parent=app)
+
+        run_in_background("Backup", "Copying database...", copy, on_done=done, with_task=True)
 
     def about():
         messagebox.showinfo("About", "ByteBank — Digital Expense Analyzer\nDeveloped by: Akshaya\nTechnologies: Python, Tkinter, SQLite", parent=app)
 
+    # Hidden: Ctrl+Shift+D shows the slowest recent operations, turning
+    # instrumentation on for the rest of the session if it was off.
+    def open_diagnostics(event=None):
+        if diagnostics.current() is None:
+            if not messagebox.askyesno("Diagnostics", "Record timings of queries and actions for this session?", parent=app):
+                return
+        diagnostics.DiagnosticsWindow(app, diagnostics.enable(store, executor))
+
     def exit_app():
         if messagebox.askyesno("Exit", "Exit ByteBank?"):
+            executor.shutdown()
             app.destroy()
 
     # ---------------- Buttons ----------------
-    btn_opts = {"width": 34, "bg": "white", "fg": "black", "font": ("Helvetica", 12, "bold"), "bd": 0, "activebackground": "#e0e0e0"}
-
-    tk.Button(app, text="1. Add Expense", command=add_expense, **btn_opts).pack(pady=6)
-    tk.Button(app, text="2. View Expenses", command=view_expenses, **btn_opts).pack(pady=6)
-    tk.Button(app, text="3. Update Expense", command=update_expense, **btn_opts).pack(pady=6)
-    tk.Button(app, text="4. Delete Expense", command=delete_expense, **btn_opts).pack(pady=6)
-    tk.Button(app, text="5. Filter Expenses", command=filter_expenses, **btn_opts).pack(pady=6)
-    tk.Button(app, text="6. Summarize Expenses", command=summarize_expenses, **btn_opts).pack(pady=6)
-    tk.Button(app, text="7. Category-wise Graph", command=plot_category_expenses, **btn_opts).pack(pady=6)
-    tk.Button(app, text="8. Date-wise Graph", command=plot_date_expenses, **btn_opts).pack(pady=6)
-    tk.Button(app, text="9. Export to CSV", command=export_csv, **btn_opts).pack(pady=6)
-    tk.Button(app, text="10. About", command=about, **btn_opts).pack(pady=6)
-    tk.Button(app, text="11. Exit", command=exit_app, **btn_opts).pack(pady=12)
-
-    app.mainloop()
\ No newline at end of file
+    btn_opts = {"width": 24, "bg": "white", "fg": "black", "font": ("Helvetica", 12, "bold"), "bd": 0, "activebackground": "#e0e0e0"}
+
+    actions = [
+        ("Add Expense", add_expense),
+        ("View Expenses", view_expenses),
+        ("Update Expense", update_expense),
+        ("Delete Expense", delete_expense),
+        ("Filter Expenses", filter_expenses),
+        ("Search Expenses", search_expenses),
+        ("Summarize Expenses", summarize_expenses),
+        ("Budgets", manage_budgets),
+        ("Recurring", manage_recurring),
+        ("Category-wise Graph", plot_category_expenses),
+        ("Date-wise Graph", plot_date_expenses),
+        ("Export Expenses", export_data),
+        ("Import Expenses", import_expenses),
+    ]
+    # With --server the database, its backups and the categorization rules
+    # live with service.py.
+    if hasattr(store, "category_rules"):
+        actions.append(("Auto-categorize", manage_category_rules))
+    if hasattr(store, "backup"):
+        actions.append(("Backup", backup_database))
+    actions += [
+        ("About", about),
+        ("Exit", exit_app),
+    ]
+    btn_frame = tk.Frame(app, bg="black")
+    btn_frame.pack(pady=6)
+    for i, (label, command) in enumerate(actions):
+        tk.Button(btn_frame, text=f"{i + 1}. {label}", command=diagnostics.tk_command(label, command),
+                  **btn_opts).grid(row=i // 2, column=i % 2, padx=6, pady=6)
+    app.bind("<Control-Shift-D>", open_diagnostics)
+
+    app.mainloop()
+
+# ---------------- Entry point ----------------
+def main(argv=None):
+    global remote
+    parser = argparse.ArgumentParser(description="ByteBank expense analyzer.")
+    parser.add_argument("--server", help="use a running service.py (e.g. http://127.0.0.1:8765) instead of bytebank.db")
+    args = parser.parse_args(argv)
+    if args.server:
+        from service import RemoteStore
+        remote = RemoteStore(args.server)
+    else:
+        get_store()  # opens the database and runs schema migrations once
+    start_login_window()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,345 @@
+import argparse
+import csv
+import json
+import os
+import sys
+import time
+from datetime import datetime
+
+from store import get_store, CATEGORIES, DB_NAME
+from money import DEFAULT_CURRENCY, normalize_currency, parse_amount
+from categorize import Categorizer
+
+BATCH_SIZE = 5000
+MAX_REPORTED_ERRORS = 1000
+JSON_CHUNK_SIZE = 1 << 16
+# A decode error this close to the end of the buffer may only mean the
+# element runs into the next chunk (a cut number, literal or escape); one
+# element may not take more than JSON_MAX_ELEMENT characters.
+JSON_CUT_MARGIN = 16
+JSON_MAX_ELEMENT = 1 << 24
+# Rows with no category are categorized from the user's rules and history
+# (categorize.py); those nothing matches get this one.
+UNCATEGORIZED = "Others"
+
+
+class ImportFormatError(ValueError):
+    pass
+
+
+class ImportReport:
+    def __init__(self):
+        self.imported = 0
+        self.failed = 0
+        self.errors = []
+        self.elapsed = 0.0
+
+    @property
+    def rows_per_sec(self):
+        return self.imported / self.elapsed if self.elapsed > 0 else 0.0
+
+    def add_error(self, where, message):
+        self.failed += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append((where, message))
+
+    def summary(self):
+        return (f"Imported {self.imported} rows, {self.failed} rejected "
+                f"in {self.elapsed:.2f}s ({self.rows_per_sec:,.0f} rows/sec)")
+
+
+# ---------------- Validation ----------------
+def validate_row(date, category, description, amount, currency=DEFAULT_CURRENCY):
+    # Returns (date, category, description, amount_minor, currency), the
+    # amount parsed exactly into the currency's minor unit.
+    date = (date or "").strip()
+    try:
+        # fromisoformat is several times faster than strptime for the usual
+        # zero-padded form; anything else gets the original strptime check
+        # and is stored zero-padded, as every date query and rollup key
+        # assumes (2024-1-5 becomes 2024-01-05).
+        if len(date) == 10 and date[4] == "-" and date[7] == "-":
+            datetime.fromisoformat(date)
+        else:
+            date = datetime.strptime(date, "%Y-%m-%d").date().isoformat()
+    except ValueError:
+        raise ValueError(f"invalid date {date!r}, expected YYYY-MM-DD")
+    category = (category or "").strip().title()
+    if category not in CATEGORIES:
+        raise ValueError(f"invalid category {category!r}, expected one of {', '.join(CATEGORIES)}")
+    currency = normalize_currency(currency)
+    if amount is None or isinstance(amount, bool):
+        raise ValueError(f"invalid amount {amount!r}")
+    amount_minor = parse_amount(amount, currency)
+    if not amount_minor > 0:
+        raise ValueError(f"amount must be positive, got {amount}")
+    return date, category, (description or "").strip(), amount_minor, currency
+
+
+# ---------------- Readers ----------------
+# Each reader yields (where, fields) so errors can point back at the offending
+# line or record; fields is a (date, category, description, amount, currency)
+# tuple, currency None when the input has none, or an error message when the
+# record could not be split into those columns.
+def iter_csv_records(fp):
+    reader = csv.reader(fp)
+    header = next(reader, None)
+    if header is None:
+        return
+    columns = [h.strip().lower() for h in header]
+    try:
+        idx = [columns.index(name) for name in ("date", "description", "amount")]
+    except ValueError:
+        raise ImportFormatError("CSV header must contain Date, Description and Amount columns")
+    # Category is optional (bank statements have none) and so is Currency.
+    category = columns.index("category") if "category" in columns else None
+    currency = columns.index("currency") if "currency" in columns else None
+    width = max(idx + ([category] if category is not None else [])) + 1
+    for row in reader:
+        if not row:
+            continue
+        if len(row) < width:
+            yield f"line {reader.line_num}", f"expected at least {width} columns, got {len(row)}"
+            continue
+        code = row[currency] if currency is not None and currency < len(row) else None
+        date, description, amount = (row[i] for i in idx)
+        yield f"line {reader.line_num}", (date, row[category] if category is not None else None, description,
+                                          amount, code or None)
+
+
+def iter_json_objects(fp, chunk_size=JSON_CHUNK_SIZE, offset=0):
+    # Incrementally decodes the top-level array of the legacy expenses.json
+    # file, holding only the current chunk in memory instead of json.load-ing
+    # the whole document. Yields (object, end) where end is the character
+    # offset just past the object; passing it back as `offset` resumes with
+    # the next element without decoding anything before it.
+    decoder = json.JSONDecoder()
+    buf = ""
+    pos = 0
+    eof = False
+    started = offset > 0
+    base = offset
+    while offset > 0:
+        skipped = fp.read(min(chunk_size, offset))
+        if not skipped:
+            raise ImportFormatError("resume offset is past the end of the file")
+        offset -= len(skipped)
+
+    def fill():
+        nonlocal buf, pos, eof, base
+        chunk = fp.read(chunk_size)
+        if not chunk:
+            eof = True
+        base += pos
+        buf = buf[pos:] + chunk
+        pos = 0
+
+    while True:
+        while pos < len(buf) and buf[pos] in " \t\r\n" + ("," if started else ""):
+            pos += 1
+        if pos >= len(buf):
+            if eof:
+                raise ImportFormatError("unexpected end of JSON input")
+            fill()
+            continue
+        if not started:
+            if buf[pos] != "[":
+                raise ImportFormatError("expected a JSON array of expenses")
+            started = True
+            pos += 1
+            continue
+        if buf[pos] == "]":
+            return
+        try:
+            obj, end = decoder.raw_decode(buf, pos)
+        except json.JSONDecodeError as e:
+            # Only an error at the cut (or a string still open there) asks for
+            # more input; anywhere else the element is malformed, and reading
+            # on would buffer the rest of the file for nothing.
+            cut = e.pos >= len(buf) - JSON_CUT_MARGIN or e.msg.startswith("Unterminated string")
+            if eof or not cut:
+                raise ImportFormatError(f"malformed JSON at offset {base + e.pos}: {e.msg}")
+            if len(buf) - pos > JSON_MAX_ELEMENT:
+                raise ImportFormatError(f"JSON element at offset {base + pos} is larger than "
+                                        f"{JSON_MAX_ELEMENT} characters")
+            fill()
+            continue
+        pos = end
+        yield obj, base + end
+
+
+def json_fields(obj):
+    if not isinstance(obj, dict):
+        return "expected a JSON object"
+    obj = {str(k).lower(): v for k, v in obj.items()}
+    return obj.get("date"), obj.get("category"), obj.get("description"), obj.get("amount"), obj.get("currency")
+
+
+def iter_json_records(fp):
+    for n, (obj, _) in enumerate(iter_json_objects(fp), start=1):
+        yield f"record {n}", json_fields(obj)
+
+
+def detect_format(path):
+    ext = os.path.splitext(path)[1].lower()
+    if ext == ".json":
+        return "json"
+    if ext == ".csv":
+        return "csv"
+    raise ImportFormatError(f"cannot infer format of {path!r}, pass --format")
+
+
+# ---------------- Import ----------------
+def import_records(store, user, records, batch_size=BATCH_SIZE, progress=None, categorizer=None):
+    # Without a categorizer a row with no category is rejected.
+    report = ImportReport()
+    start = time.perf_counter()
+    batch = []
+    for where, fields in records:
+        if isinstance(fields, str):
+            report.add_error(where, fields)
+            continue
+        date, category, description, amount, currency = fields
+        if categorizer is not None and not (category or "").strip():
+            category = categorizer.categorize(description) or UNCATEGORIZED
+        try:
+            batch.append((user,) + validate_row(date, category, description, amount, currency or store.currency))
+        except ValueError as e:
+            report.add_error(where, str(e))
+            continue
+        if len(batch) >= batch_size:
+            report.imported += store.add_expenses(batch)
+            batch = []
+            if progress:
+                progress(report)
+    if batch:
+        report.imported += store.add_expenses(batch)
+    report.elapsed = time.perf_counter() - start
+    if progress:
+        progress(report)
+    return report
+
+
+# ---------------- Legacy JSON migration ----------------
+# The original app kept every expense in one expenses.json array, rewritten in
+# full on each save. migrate_json moves such a file into the database once:
+# after every batch it saves a checkpoint (the character offset just past the
+# last record handled, and how many records so far were rejected) in the same
+# transaction as the batch, so an interrupted run resumes exactly there
+# without re-reading what is already in, and running it again once it has
+# finished imports nothing.
+CHECKPOINT_PREFIX = "json-migration:"
+
+
+def migrate_json(store, user, path, batch_size=BATCH_SIZE, progress=None, restart=False):
+    # Returns (report, resumed, resumed_failed): the report covers this run;
+    # resumed is how many records earlier runs had already handled and
+    # resumed_failed how many of those they rejected. Raises
+    # ImportFormatError for malformed JSON (after saving everything before
+    # it), a file that changed since its migration started or one being
+    # migrated for another user.
+    key = CHECKPOINT_PREFIX + os.path.abspath(path)
+    stat = os.stat(path)
+    saved = None if restart else store.get_setting(key)
+    state = json.loads(saved) if saved else None
+    if state is not None:
+        if state["user"] != user:
+            raise ImportFormatError(f"already being migrated for user {state['user']!r}")
+        if (state["size"], state["mtime"]) != (stat.st_size, stat.st_mtime_ns):
+            raise ImportFormatError("file changed since its migration started; pass --restart to migrate it again")
+    else:
+        state = {"user": user, "size": stat.st_size, "mtime": stat.st_mtime_ns, "offset": 0, "records": 0,
+                 "failed": 0, "done": False}
+    resumed, resumed_failed = state["records"], state.get("failed", 0)
+    report = ImportReport()
+    if state["done"]:
+        return report, resumed, resumed_failed
+    start = time.perf_counter()
+    batch = []
+
+    def commit(offset, records, done=False):
+        nonlocal batch
+        state.update(offset=offset, records=records, failed=resumed_failed + report.failed, done=done)
+        report.imported += store.add_expenses(batch, (key, json.dumps(state)))
+        batch = []
+        if progress:
+            progress(report)
+
+    offset, records = state["offset"], state["records"]
+    with open(path, "r", newline="", encoding="utf-8") as fp:
+        try:
+            for obj, end in iter_json_objects(fp, offset=offset):
+                records += 1
+                fields = json_fields(obj)
+                try:
+                    if isinstance(fields, str):
+                        raise ValueError(fields)
+                    date, category, description, amount, currency = fields
+                    batch.append((user,) + validate_row(date, category, description, amount,
+                                                        currency or store.currency))
+                except ValueError as e:
+                    report.add_error(f"record {records}", str(e))
+                offset = end
+                if len(batch) >= batch_size:
+                    commit(offset, records)
+        except ImportFormatError as e:
+            if batch:
+                commit(offset, records)
+            raise ImportFormatError(f"after record {records}: {e}")
+    commit(offset, records, done=True)
+    report.elapsed = time.perf_counter() - start
+    return report, resumed, resumed_failed
+
+
+def import_file(store, user, path, fmt=None, batch_size=BATCH_SIZE, progress=None):
+    fmt = fmt or detect_format(path)
+    # Rules live with the database; a service.RemoteStore has none here.
+    categorizer = Categorizer.for_user(store, user) if hasattr(store, "category_rules") else None
+    with open(path, "r", newline="", encoding="utf-8") as fp:
+        records = iter_csv_records(fp) if fmt == "csv" else iter_json_records(fp)
+        return import_records(store, user, records, batch_size, progress, categorizer)
+
+
+# ---------------- CLI ----------------
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Bulk import expenses into ByteBank from CSV or legacy JSON.")
+    parser.add_argument("files", nargs="+", help="CSV (as written by Export to CSV) or expenses.json files")
+    parser.add_argument("--user", required=True, help="username the expenses belong to")
+    parser.add_argument("--format", choices=["csv", "json"], help="input format (default: from file extension)")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE, help="rows per transaction")
+    parser.add_argument("--db", default=DB_NAME, help="database file (default: %(default)s)")
+    parser.add_argument("--migrate", action="store_true",
+                        help="move legacy expenses.json files in once: resumable, and a finished file is skipped")
+    parser.add_argument("--restart", action="store_true", help="with --migrate, ignore any saved progress")
+    args = parser.parse_args(argv)
+
+    store = get_store(args.db)
+    status = 0
+    for path in args.files:
+        try:
+            if args.migrate:
+                report, resumed, resumed_failed = migrate_json(store, args.user, path, args.batch_size,
+                                                               restart=args.restart)
+                if resumed:
+                    print(f"{path}: {resumed} records were handled by an earlier run "
+                          f"({resumed_failed} of them rejected)")
+                    if resumed_failed:
+                        status = 1
+            else:
+                report = import_file(store, args.user, path, args.format, args.batch_size)
+        except (OSError, ImportFormatError) as e:
+            print(f"{path}: {e}", file=sys.stderr)
+            status = 1
+            continue
+        for where, message in report.errors:
+            print(f"{path}: {where}: {message}", file=sys.stderr)
+        if report.failed > len(report.errors):
+            print(f"{path}: ... {report.failed - len(report.errors)} more errors", file=sys.stderr)
+        print(f"{path}: {report.summary()}")
+        if report.failed:
+            status = 1
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,85 @@
+from decimal import Decimal, InvalidOperation
+
+# Amounts are stored as integers in the currency's minor unit (paise, cents),
+# so sums are exact and never pick up binary floating-point residue. Text and
+# floats are converted only at the edges: parse_amount on the way in,
+# format_amount on the way out.
+DEFAULT_CURRENCY = "INR"
+# ISO 4217 minor-unit exponents; any other code is assumed to use two.
+MINOR_UNITS = {
+    "INR": 2, "USD": 2, "EUR": 2, "GBP": 2, "AUD": 2, "CAD": 2, "SGD": 2, "AED": 2, "CHF": 2, "CNY": 2,
+    "JPY": 0, "KRW": 0, "VND": 0, "IDR": 2,
+    "BHD": 3, "KWD": 3, "OMR": 3, "JOD": 3, "TND": 3,
+}
+# Keeps totals of many expenses well inside SQLite's 64-bit integers.
+MAX_MINOR = 10 ** 15
+
+
+def exponent(currency):
+    return MINOR_UNITS.get(currency, 2)
+
+
+def normalize_currency(code):
+    code = (code or DEFAULT_CURRENCY).strip().upper()
+    if len(code) != 3 or not code.isalpha() or not code.isascii():
+        raise ValueError(f"invalid currency {code!r}, expected a 3-letter code such as {DEFAULT_CURRENCY}")
+    return code
+
+
+def parse_amount(value, currency=DEFAULT_CURRENCY):
+    # "1,234.50", 1234.5, Decimal("1234.50") -> 123450 for a two-decimal
+    # currency. Floats are read through their shortest repr, so 0.1 means
+    # 0.1 and not 0.1000000000000000055511151231257827. More decimal places
+    # than the currency has is an error rather than a silent rounding.
+    if isinstance(value, float):
+        value = repr(value)
+    try:
+        amount = Decimal(str(value).strip().replace(",", "").replace("_", ""))
+    except (InvalidOperation, ValueError):
+        raise ValueError(f"invalid amount {value!r}")
+    if not amount.is_finite():
+        raise ValueError(f"invalid amount {value!r}")
+    digits = exponent(currency)
+    minor = amount.scaleb(digits)
+    if minor != minor.to_integral_value():
+        raise ValueError(f"{currency} amounts have at most {digits} decimal places, got {value}")
+    minor = int(minor)
+    if abs(minor) > MAX_MINOR:
+        raise ValueError(f"amount {value} is too large")
+    return minor
+
+
+def parse_money(text, currency=DEFAULT_CURRENCY):
+    # User input with an optional currency code on either side:
+    # "12.50", "12.50 usd", "USD 12.50" -> (minor units, currency).
+    parts = str(text).split()
+    if len(parts) == 2:
+        code, value = (parts[0], parts[1]) if parts[0].isalpha() else (parts[1], parts[0])
+        currency = normalize_currency(code)
+    elif len(parts) == 1:
+        value = parts[0]
+    else:
+        raise ValueError(f"invalid amount {text!r}")
+    return parse_amount(value, currency), currency
+
+
+def to_decimal(minor, currency=DEFAULT_CURRENCY):
+    return Decimal(int(minor)).scaleb(-exponent(currency))
+
+
+def format_amount(minor, currency=DEFAULT_CURRENCY, code=False):
+    # 123450 -> "1234.50" (or "1234.50 INR" with code=True). Integer
+    # arithmetic only, since exports call this once per row.
+    digits = exponent(currency)
+    minor = int(minor)
+    if digits:
+        whole, frac = divmod(abs(minor), 10 ** digits)
+        text = f"{'-' if minor < 0 else ''}{whole}.{frac:0{digits}d}"
+    else:
+        text = str(minor)
+    return f"{text} {currency}" if code else text
+
+
+def to_units(minor, currency=DEFAULT_CURRENCY):
+    # Float value in major units, for charts and statistics only.
+    return minor / 10 ** exponent(currency)
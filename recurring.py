@@ -0,0 +1,125 @@
+import calendar
+from collections import namedtuple
+from datetime import date, timedelta
+from functools import lru_cache
+
+# Schedules for recurring expenses use the date part of a cron line: three
+# fields, day-of-month month day-of-week, e.g.
+#   "1 * *"        the 1st of every month (rent)
+#   "L * *"        the last day of every month
+#   "15 1,7 *"     15 January and 15 July
+#   "* * MON-FRI"  every weekday
+#   "*/14 * *"     the 1st, 15th and 29th of every month
+# Fields take *, numbers, names (JAN..DEC, SUN..SAT), lists, ranges and
+# /steps. As in cron, when both day fields are restricted a date matches
+# either of them. @daily, @weekly, @monthly and @yearly are accepted too.
+ALIASES = {
+    "@daily": "* * *",
+    "@weekly": "* * SUN",
+    "@monthly": "1 * *",
+    "@yearly": "1 1 *",
+    "@annually": "1 1 *",
+}
+MONTH_NAMES = ["JAN", "FEB", "MAR", "APR", "MAY", "JUN", "JUL", "AUG", "SEP", "OCT", "NOV", "DEC"]
+DAY_NAMES = ["SUN", "MON", "TUE", "WED", "THU", "FRI", "SAT"]
+# A schedule with no date in this many years (e.g. "31 2 *") never fires.
+MAX_SEARCH_YEARS = 8
+
+# days/months/weekdays are frozensets (weekdays 0=Sunday); any_day and
+# any_weekday record whether the field was "*", which decides how the two
+# day fields combine.
+Schedule = namedtuple("Schedule", "text days last_day any_day months weekdays any_weekday")
+
+
+def _parse_field(field, low, high, names=(), name_base=0, allow_last=False):
+    # Returns (values, last) where last is True when "L" (last day of the
+    # month) was given.
+    values = set()
+    last = False
+    for part in field.upper().split(","):
+        step = None
+        if "/" in part:
+            part, step_text = part.split("/", 1)
+            if not step_text.isdigit() or int(step_text) < 1:
+                raise ValueError(f"invalid step in {field!r}")
+            step = int(step_text)
+        if part == "L" and allow_last and step is None:
+            last = True
+            continue
+        if part == "*":
+            start, end = low, high
+        else:
+            bounds = part.split("-", 1)
+            try:
+                numbers = [names.index(b) + name_base if b in names else int(b) for b in bounds]
+            except ValueError:
+                raise ValueError(f"invalid value {part!r} in {field!r}")
+            start, end = numbers[0], numbers[-1]
+            # "5/10" means from the 5th every 10 days, as in cron.
+            if step is not None and len(bounds) == 1:
+                end = high
+        if not low <= start <= end <= high:
+            raise ValueError(f"{part!r} is out of range {low}-{high} in {field!r}")
+        values.update(range(start, end + 1, step or 1))
+    return frozenset(values), last
+
+
+@lru_cache(maxsize=256)
+def parse_schedule(text):
+    text = " ".join(str(text).split())
+    fields = ALIASES.get(text.lower(), text).split()
+    if len(fields) != 3:
+        raise ValueError("schedule needs three fields: day-of-month month day-of-week (e.g. \"1 * *\")")
+    day_field, month_field, weekday_field = fields
+    days, last_day = _parse_field(day_field, 1, 31, allow_last=True)
+    months, _ = _parse_field(month_field, 1, 12, MONTH_NAMES, 1)
+    weekdays, _ = _parse_field(weekday_field, 0, 7, DAY_NAMES)
+    # 7 is Sunday as well as 0.
+    if 7 in weekdays:
+        weekdays = (weekdays - {7}) | {0}
+    return Schedule(text, days, last_day, day_field == "*", months, weekdays, weekday_field == "*")
+
+
+@lru_cache(maxsize=4096)
+def _month_days(schedule, year, month):
+    # Sorted days of `month` the schedule fires on. Cached because many
+    # rules share a schedule and a catch-up walks the same months for each.
+    if month not in schedule.months:
+        return ()
+    first_weekday, length = calendar.monthrange(year, month)
+    by_day = {d for d in schedule.days if d <= length}
+    if schedule.last_day:
+        by_day.add(length)
+    # calendar counts Monday as 0; cron counts Sunday as 0.
+    first = (first_weekday + 1) % 7
+    by_weekday = {d for wd in schedule.weekdays for d in range((wd - first) % 7 + 1, length + 1, 7)}
+    if schedule.any_day and schedule.any_weekday:
+        matched = range(1, length + 1)
+    elif schedule.any_weekday:
+        matched = by_day
+    elif schedule.any_day:
+        matched = by_weekday
+    else:
+        matched = by_day | by_weekday
+    return tuple(sorted(matched))
+
+
+def occurrences(schedule, start, end):
+    # Dates from start to end (inclusive, datetime.date) the schedule fires
+    # on, in order.
+    year, month = start.year, start.month
+    while (year, month) <= (end.year, end.month):
+        for day in _month_days(schedule, year, month):
+            when = date(year, month, day)
+            if start <= when <= end:
+                yield when
+        year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+
+
+def next_occurrence(schedule, after, until=None):
+    # First date strictly after `after` (and not past `until`), or None.
+    start = after + timedelta(days=1)
+    limit = date(min(start.year + MAX_SEARCH_YEARS, 9999), 12, 31)
+    if until is not None:
+        limit = min(limit, until)
+    return next(occurrences(schedule, start, limit), None) if start <= limit else None
@@ -0,0 +1,791 @@
+import argparse
+import asyncio
+import csv
+import functools
+import http.client
+import io
+import json
+import re
+import secrets
+import sys
+import threading
+import time
+from collections import OrderedDict, namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit, parse_qs, urlencode
+
+from store import get_store, ExpenseStore, CATEGORIES, SORT_KEYS, DB_NAME
+from auth import get_authenticator, hash_password, LoginThrottled
+from importer import validate_row
+from exporter import HEADER as EXPORT_HEADER
+from money import DEFAULT_CURRENCY, normalize_currency, parse_amount, format_amount
+
+# Optional shared mode: one process owns bytebank.db and serves JSON over
+# HTTP on localhost, so several GUI clients (`python gui.py --server URL`)
+# can use the same database without fighting over its write lock.
+#   python service.py --db bytebank.db --port 8765
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+READERS = 4
+MAX_BODY = 1 << 20
+MAX_LIMIT = 1000
+EXPORT_BATCH = 2000
+EXPORT_FORMATS = ["csv", "jsonl"]
+# Recurring expenses are written when the service starts and then on this
+# interval, so rules fall due without any client being connected; the
+# store's maintenance pass runs on the same schedule.
+HOUSEKEEPING_INTERVAL = 3600
+# A login token lapses after SESSION_IDLE seconds without a request; beyond
+# MAX_SESSIONS live tokens the least recently used ones are dropped.
+SESSION_IDLE = 12 * 3600
+MAX_SESSIONS = 10_000
+
+STATUS_TEXT = {
+    200: "OK", 201: "Created", 400: "Bad Request", 401: "Unauthorized", 404: "Not Found",
+    405: "Method Not Allowed", 409: "Conflict", 413: "Payload Too Large", 429: "Too Many Requests",
+    500: "Internal Server Error",
+}
+
+
+Request = namedtuple("Request", "user token query body")
+
+
+class HTTPError(Exception):
+    def __init__(self, status, message, headers=None):
+        super().__init__(message)
+        self.status = status
+        self.headers = headers or {}
+
+
+def _int_arg(query, name, default, maximum=None):
+    value = query.get(name)
+    if value in (None, ""):
+        return default
+    try:
+        value = int(value)
+    except ValueError:
+        raise HTTPError(400, f"{name} must be an integer")
+    if value < 0:
+        raise HTTPError(400, f"{name} must not be negative")
+    return min(value, maximum) if maximum is not None else value
+
+
+def _key_arg(query, name, sort):
+    # Page keys travel as JSON arrays, e.g. after=["2024-05-01", 1234].
+    value = query.get(name)
+    if not value:
+        return None
+    try:
+        key = json.loads(value)
+    except ValueError:
+        raise HTTPError(400, f"{name} must be a JSON array")
+    if not isinstance(key, list) or len(key) != len(SORT_KEYS[sort]):
+        raise HTTPError(400, f"{name} must have {len(SORT_KEYS[sort])} elements for sort={sort}")
+    return tuple(key)
+
+
+def _minor_field(body, name, currency):
+    # Amounts arrive either as exact integer minor units (`<name>_minor`, as
+    # RemoteStore sends them) or as decimal text in major units (`<name>`,
+    # e.g. "1234.50"); floats are accepted but read through their repr.
+    minor = body.get(name + "_minor")
+    if minor is not None:
+        if not isinstance(minor, int) or isinstance(minor, bool):
+            raise HTTPError(400, f"{name}_minor must be an integer")
+        return minor
+    value = body.get(name)
+    if value is None:
+        return None
+    if isinstance(value, bool):
+        raise HTTPError(400, f"{name} must be a number")
+    return parse_amount(value, currency)
+
+
+def _expense_fields(body, default_currency):
+    currency = normalize_currency(body.get("currency") or default_currency)
+    minor = _minor_field(body, "amount", currency)
+    return validate_row(body.get("date"), body.get("category"), body.get("description"),
+                        None if minor is None else format_amount(minor, currency), currency)
+
+
+# ---------------- Server ----------------
+class ExpenseService:
+    # The event loop only parses requests and writes responses. Reads run on
+    # a pool of worker threads, each with its own WAL reader connection from
+    # the store; every write goes through a single writer thread, in arrival
+    # order, so clients never see "database is locked".
+    def __init__(self, store, readers=READERS):
+        self.store = store
+        self.auth = get_authenticator(store)
+        self.readers = ThreadPoolExecutor(max_workers=readers, thread_name_prefix="bytebank-reader")
+        self.writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="bytebank-writer")
+        # token -> (username, last used), least recently used first. Only
+        # touched on the event loop thread.
+        self.sessions = OrderedDict()
+        # (method, path pattern, handler, needs login)
+        self.routes = [
+            ("POST", r"/register", self.register, False),
+            ("POST", r"/login", self.login, False),
+            ("POST", r"/logout", self.logout, True),
+            ("GET", r"/expenses", self.list_expenses, True),
+            ("POST", r"/expenses", self.add_expense, True),
+            ("POST", r"/expenses/batch", self.add_expenses, True),
+            ("GET", r"/expenses/(\d+)", self.get_expense, True),
+            ("PUT", r"/expenses/(\d+)", self.update_expense, True),
+            ("DELETE", r"/expenses/(\d+)", self.delete_expense, True),
+            ("GET", r"/search", self.search, True),
+            ("GET", r"/count", self.count, True),
+            ("GET", r"/summary", self.summary, True),
+            ("GET", r"/currencies", self.currencies, True),
+            ("GET", r"/totals/day", self.day_totals, True),
+            ("GET", r"/totals/month", self.month_totals, True),
+            ("GET", r"/bounds", self.bounds, True),
+            ("GET", r"/budgets", self.list_budgets, True),
+            ("PUT", r"/budgets/(\w+)", self.set_budget, True),
+            ("GET", r"/recurring", self.list_recurring, True),
+            ("POST", r"/recurring", self.add_recurring, True),
+            ("DELETE", r"/recurring/(\d+)", self.delete_recurring, True),
+            ("GET", r"/alerts", self.alerts, True),
+            ("GET", r"/export", self.export, True),
+        ]
+        self.routes = [(m, re.compile(p), h, a) for m, p, h, a in self.routes]
+
+    async def read(self, fn, *args, **kwargs):
+        return await asyncio.get_running_loop().run_in_executor(self.readers, functools.partial(fn, *args, **kwargs))
+
+    async def write(self, fn, *args, **kwargs):
+        return await asyncio.get_running_loop().run_in_executor(self.writer, functools.partial(fn, *args, **kwargs))
+
+    def shutdown(self):
+        self.readers.shutdown(wait=False, cancel_futures=True)
+        self.writer.shutdown(wait=True)
+
+    # ---- Accounts ----
+    async def register(self, req):
+        username = str(req.body.get("username") or "").strip()
+        password = str(req.body.get("password") or "").strip()
+        if not username or not password:
+            raise HTTPError(400, "username and password are required")
+        # The KDF runs on a reader thread so the writer only does the insert.
+        password_hash = await self.read(hash_password, password, self.auth.params)
+        if not await self.write(self.store.create_user, username, password_hash):
+            raise HTTPError(409, "username already exists")
+        return 201, {"created": True}
+
+    async def login(self, req):
+        username = str(req.body.get("username") or "").strip()
+        password = str(req.body.get("password") or "").strip()
+        # Verified on a reader thread; an outdated hash is replaced through
+        # the writer like every other write.
+        ok, new_hash = await self.read(self.auth.authenticate, username, password)
+        if not ok:
+            raise HTTPError(401, "invalid username or password")
+        if new_hash is not None:
+            await self.write(self.store.set_password_hash, username, new_hash)
+        token = secrets.token_urlsafe(24)
+        self._expire_sessions(time.monotonic())
+        while len(self.sessions) >= MAX_SESSIONS:
+            self.sessions.popitem(last=False)
+        self.sessions[token] = (username, time.monotonic())
+        return 200, {"token": token, "currency": self.store.currency}
+
+    async def logout(self, req):
+        self.sessions.pop(req.token, None)
+        return 200, {}
+
+    def _session_user(self, token):
+        now = time.monotonic()
+        self._expire_sessions(now)
+        session = self.sessions.get(token)
+        if session is None:
+            return None
+        self.sessions[token] = (session[0], now)
+        self.sessions.move_to_end(token)
+        return session[0]
+
+    def _expire_sessions(self, now):
+        while self.sessions:
+            token, (_, used) = next(iter(self.sessions.items()))
+            if now - used <= SESSION_IDLE:
+                break
+            del self.sessions[token]
+
+    # ---- Expenses ----
+    async def list_expenses(self, req):
+        sort = req.query.get("sort", "date")
+        if sort not in SORT_KEYS:
+            raise HTTPError(400, f"sort must be one of {', '.join(SORT_KEYS)}")
+        rows = await self.read(self.store.page_expenses, req.user, sort, req.query.get("desc", "1") != "0",
+                               _key_arg(req.query, "after", sort), _key_arg(req.query, "before", sort),
+                               _int_arg(req.query, "limit", 200, MAX_LIMIT),
+                               req.query.get("category") or None, req.query.get("date") or None)
+        return 200, {"rows": rows}
+
+    async def add_expense(self, req):
+        fields = _expense_fields(req.body, self.store.currency)
+        expense_id = await self.write(self.store.add_expense, req.user, *fields)
+        return 201, {"id": expense_id}
+
+    async def add_expenses(self, req):
+        rows = req.body.get("rows")
+        if not isinstance(rows, list):
+            raise HTTPError(400, "expected {\"rows\": [[date, category, description, amount, currency], ...]}")
+        try:
+            batch = []
+            for date, category, description, amount, *currency in rows:
+                currency = (currency or [None])[0] or self.store.currency
+                batch.append((req.user,) + validate_row(date, category, description, amount, currency))
+        except (TypeError, ValueError) as e:
+            raise HTTPError(400, str(e))
+        return 201, {"imported": await self.write(self.store.add_expenses, batch)}
+
+    async def get_expense(self, req, expense_id):
+        row = await self.read(self.store.get_expense, req.user, int(expense_id))
+        if row is None:
+            raise HTTPError(404, "no such expense")
+        return 200, {"row": row}
+
+    async def update_expense(self, req, expense_id):
+        fields = _expense_fields(req.body, self.store.currency)
+        if not await self.write(self.store.update_expense, req.user, int(expense_id), *fields):
+            raise HTTPError(404, "no such expense")
+        return 200, {"updated": True}
+
+    async def delete_expense(self, req, expense_id):
+        if not await self.write(self.store.delete_expense, req.user, int(expense_id)):
+            raise HTTPError(404, "no such expense")
+        return 200, {"deleted": True}
+
+    async def search(self, req):
+        q = req.query
+        rows = await self.read(self.store.search_expenses, req.user, q.get("q", ""),
+                               q.get("from") or None, q.get("to") or None,
+                               _int_arg(q, "min", None), _int_arg(q, "max", None), q.get("category") or None,
+                               _int_arg(q, "limit", 100, MAX_LIMIT), _int_arg(q, "offset", 0))
+        return 200, {"rows": rows}
+
+    async def count(self, req):
+        return 200, {"count": await self.read(self.store.count_expenses, req.user, req.query.get("from") or None,
+                                              req.query.get("to") or None, req.query.get("category") or None)}
+
+    # ---- Aggregates ----
+    # Totals are integer minor units of ?currency= (default: the store's).
+    @staticmethod
+    def _currency(req):
+        code = req.query.get("currency")
+        return normalize_currency(code) if code else None
+
+    async def summary(self, req):
+        currency = self._currency(req)
+        total = await self.read(self.store.total_amount, req.user, currency)
+        return 200, {"total": total, "categories": await self.read(self.store.category_totals, req.user, currency)}
+
+    async def currencies(self, req):
+        return 200, {"rows": await self.read(self.store.currency_totals, req.user)}
+
+    async def day_totals(self, req):
+        return 200, {"rows": await self.read(self.store.date_totals, req.user, req.query.get("from") or None,
+                                             req.query.get("to") or None, self._currency(req))}
+
+    async def month_totals(self, req):
+        return 200, {"rows": await self.read(self.store.month_totals, req.user, req.query.get("from") or None,
+                                             req.query.get("to") or None, self._currency(req))}
+
+    async def bounds(self, req):
+        return 200, {"bounds": await self.read(self.store.date_bounds, req.user, self._currency(req))}
+
+    # ---- Budgets ----
+    async def list_budgets(self, req):
+        return 200, {"budgets": await self.read(self.store.budgets, req.user, req.query.get("month") or None)}
+
+    async def set_budget(self, req, category):
+        # Checked here like the category of every other write, so an unknown
+        # one is a 400 before anything reaches the writer.
+        category = category.title()
+        if category not in CATEGORIES:
+            raise HTTPError(400, f"invalid category {category!r}, expected one of {', '.join(CATEGORIES)}")
+        currency = normalize_currency(req.body.get("currency") or self.store.currency)
+        limit = _minor_field(req.body, "limit", currency)
+        if limit is not None and not limit > 0:
+            raise HTTPError(400, "limit must be positive")
+        await self.write(self.store.set_budget, req.user, category, limit, currency)
+        return 200, {}
+
+    async def alerts(self, req):
+        q = req.query
+        fields = validate_row(q.get("date"), q.get("category"), "", q.get("amount"),
+                              q.get("currency") or self.store.currency)
+        date, category, _, amount, currency = fields
+        previous = None
+        if q.get("previous_date"):
+            # The expense before an update, for the budget threshold check.
+            old = validate_row(q.get("previous_date"), q.get("previous_category"), "", q.get("previous_amount"),
+                               q.get("previous_currency") or self.store.currency)
+            previous = (old[0], old[1], old[3], old[4])
+        return 200, {"alerts": await self.read(self.store.expense_alerts, req.user, date, category, amount, currency,
+                                               previous)}
+
+    # ---- Recurring expenses ----
+    async def list_recurring(self, req):
+        return 200, {"rules": await self.read(self.store.recurring_rules, req.user)}
+
+    async def add_recurring(self, req):
+        body = req.body
+        start, category, description, amount, currency = _expense_fields(
+            dict(body, date=body.get("start")), self.store.currency)
+        rule_id = await self.write(self.store.add_recurring, req.user, category, description, amount,
+                                   str(body.get("schedule") or ""), start, body.get("end") or None, currency)
+        # Occurrences already due (a start date in the past) are written now.
+        created = await self.write(self.store.materialize_recurring)
+        return 201, {"id": rule_id, "created": created}
+
+    async def delete_recurring(self, req, rule_id):
+        if not await self.write(self.store.delete_recurring, req.user, int(rule_id)):
+            raise HTTPError(404, "no such recurring expense")
+        return 200, {"deleted": True}
+
+    async def housekeeping_loop(self, interval=HOUSEKEEPING_INTERVAL):
+        while True:
+            try:
+                created = await self.write(self.store.materialize_recurring)
+                if created:
+                    print(f"{created} recurring expenses written", file=sys.stderr)
+            except Exception as e:
+                print(f"recurring expenses: {type(e).__name__}: {e}", file=sys.stderr)
+            try:
+                await self.write(self.store.maintain)
+            except Exception as e:
+                print(f"maintenance: {type(e).__name__}: {e}", file=sys.stderr)
+            await asyncio.sleep(interval)
+
+    # ---- Export ----
+    async def export(self, req):
+        fmt = req.query.get("format", "csv")
+        if fmt not in EXPORT_FORMATS:
+            raise HTTPError(400, f"format must be one of {', '.join(EXPORT_FORMATS)}")
+        return ExportStream(self, req.user, fmt, req.query.get("from") or None, req.query.get("to") or None,
+                            req.query.get("category") or None)
+
+    # ---- HTTP ----
+    async def handle_connection(self, reader, writer):
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                method, target, version = request_line.decode("latin-1").split()
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                keep_alive = version == "HTTP/1.1" and headers.get("connection", "").lower() != "close"
+                length = int(headers.get("content-length") or 0)
+                if length > MAX_BODY:
+                    await self.send_json(writer, 413, {"error": "request body too large"}, False)
+                    break
+                body = await reader.readexactly(length) if length else b""
+                keep_alive = await self.dispatch(method, target, headers, body, writer, keep_alive)
+                if not keep_alive:
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    async def dispatch(self, method, target, headers, body, writer, keep_alive):
+        # Returns whether the connection can be reused.
+        split = urlsplit(target)
+        query = {k: v[-1] for k, v in parse_qs(split.query).items()}
+        try:
+            handler, args, needs_login = self._route(method, split.path)
+            user = token = None
+            if needs_login:
+                token = headers.get("authorization", "").removeprefix("Bearer ").strip()
+                user = self._session_user(token)
+                if user is None:
+                    raise HTTPError(401, "login required")
+            try:
+                payload = json.loads(body) if body else {}
+            except ValueError:
+                raise HTTPError(400, "request body must be JSON")
+            if not isinstance(payload, dict):
+                raise HTTPError(400, "request body must be a JSON object")
+            result = await handler(Request(user, token, query, payload), *args)
+        except HTTPError as e:
+            await self.send_json(writer, e.status, {"error": str(e)}, keep_alive, e.headers)
+            return keep_alive
+        except LoginThrottled as e:
+            await self.send_json(writer, 429, {"error": str(e)}, keep_alive,
+                                 {"Retry-After": str(int(e.retry_after) + 1)})
+            return keep_alive
+        except ValueError as e:
+            await self.send_json(writer, 400, {"error": str(e)}, keep_alive)
+            return keep_alive
+        except Exception as e:
+            print(f"{method} {split.path}: {type(e).__name__}: {e}", file=sys.stderr)
+            await self.send_json(writer, 500, {"error": "internal error"}, False)
+            return False
+        if isinstance(result, ExportStream):
+            return await result.send(writer, keep_alive)
+        status, payload = result
+        await self.send_json(writer, status, payload, keep_alive)
+        return keep_alive
+
+    def _route(self, method, path):
+        allowed = False
+        for route_method, pattern, handler, needs_login in self.routes:
+            match = pattern.fullmatch(path)
+            if match:
+                if route_method == method:
+                    return handler, match.groups(), needs_login
+                allowed = True
+        raise HTTPError(405 if allowed else 404, "method not allowed" if allowed else "not found")
+
+    @staticmethod
+    def _head(status, headers, keep_alive):
+        lines = [f"HTTP/1.1 {status} {STATUS_TEXT.get(status, '')}"]
+        lines += [f"{k}: {v}" for k, v in headers.items()]
+        lines.append(f"Connection: {'keep-alive' if keep_alive else 'close'}")
+        return ("\r\n".join(lines) + "\r\n\r\n").encode("latin-1")
+
+    async def send_json(self, writer, status, payload, keep_alive, extra_headers=None):
+        data = json.dumps(payload, separators=(",", ":")).encode("utf-8")
+        headers = {"Content-Type": "application/json", "Content-Length": len(data)}
+        headers.update(extra_headers or {})
+        writer.write(self._head(status, headers, keep_alive) + data)
+        await writer.drain()
+
+
+class ExportStream:
+    # Sent with chunked encoding: a reader thread walks the store's batch
+    # cursor and hands encoded chunks to the event loop through a small
+    # queue, so neither side holds more than a few batches.
+    def __init__(self, service, user, fmt, start, end, category):
+        self.service = service
+        self.args = (user, EXPORT_BATCH, start, end, category)
+        self.fmt = fmt
+        self.stopped = threading.Event()
+
+    def _encode(self, batch):
+        if self.fmt == "jsonl":
+            return "".join(json.dumps(row, separators=(",", ":")) + "\n" for row in batch).encode("utf-8")
+        return self._csv((rid, day, cat, desc, format_amount(minor, cur), cur)
+                         for rid, day, cat, desc, minor, cur in batch)
+
+    @staticmethod
+    def _csv(rows):
+        buf = io.StringIO()
+        csv.writer(buf).writerows(rows)
+        return buf.getvalue().encode("utf-8")
+
+    def _produce(self, loop, chunks):
+        def put(item):
+            asyncio.run_coroutine_threadsafe(chunks.put(item), loop).result()
+        try:
+            if self.fmt == "csv":
+                put(self._csv([EXPORT_HEADER]))
+            for batch in self.service.store.iter_expense_batches(*self.args):
+                if self.stopped.is_set():
+                    break
+                put(self._encode(batch))
+        finally:
+            put(None)
+
+    async def send(self, writer, keep_alive):
+        loop = asyncio.get_running_loop()
+        chunks = asyncio.Queue(maxsize=4)
+        producer = loop.run_in_executor(self.service.readers, self._produce, loop, chunks)
+        content_type = "text/csv; charset=utf-8" if self.fmt == "csv" else "application/x-ndjson"
+        try:
+            writer.write(ExpenseService._head(200, {"Content-Type": content_type, "Transfer-Encoding": "chunked"},
+                                              keep_alive))
+            while (chunk := await chunks.get()) is not None:
+                writer.write(b"%x\r\n%s\r\n" % (len(chunk), chunk))
+                await writer.drain()
+        except ConnectionError:
+            # Client went away: stop the producer and let it finish.
+            self.stopped.set()
+            while await chunks.get() is not None:
+                pass
+            try:
+                await producer
+            except Exception:
+                pass
+            return False
+        try:
+            await producer
+        except Exception as e:
+            # Closing without the final chunk tells the client the body is cut short.
+            print(f"export failed: {type(e).__name__}: {e}", file=sys.stderr)
+            return False
+        writer.write(b"0\r\n\r\n")
+        await writer.drain()
+        return keep_alive
+
+
+async def serve(store, host=DEFAULT_HOST, port=DEFAULT_PORT, readers=READERS, ready=None):
+    service = ExpenseService(store, readers)
+    server = await asyncio.start_server(service.handle_connection, host, port)
+    print(f"ByteBank service on http://{host}:{server.sockets[0].getsockname()[1]}", file=sys.stderr)
+    if ready is not None:
+        ready(server)
+    housekeeping = asyncio.create_task(service.housekeeping_loop())
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        housekeeping.cancel()
+        service.shutdown()
+
+
+# ---------------- Client ----------------
+class RemoteError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+class RemoteStore:
+    # Stands in for ExpenseStore (and auth.Authenticator) in the GUI when it
+    # runs against a service. Every call is scoped to the logged-in user on
+    # the server side; the `user` arguments are kept only so the signatures
+    # match ExpenseStore's. Each thread keeps its own keep-alive connection.
+    expense_key = staticmethod(ExpenseStore.expense_key)
+    has_fts = True
+
+    def __init__(self, url, timeout=30):
+        parts = urlsplit(url if "://" in url else "http://" + url)
+        self.host = parts.hostname or DEFAULT_HOST
+        self.port = parts.port or DEFAULT_PORT
+        self.timeout = timeout
+        self.token = None
+        self.user = None
+        # The server's default currency, learned at login.
+        self.currency = DEFAULT_CURRENCY
+        self._local = threading.local()
+
+    def _connection(self, fresh=False):
+        conn = getattr(self._local, "conn", None)
+        if conn is None or fresh:
+            if conn is not None:
+                conn.close()
+            conn = http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+            self._local.conn = conn
+        return conn
+
+    def _send(self, conn, method, path, params, body):
+        if params:
+            path += "?" + urlencode({k: v for k, v in params.items() if v is not None})
+        headers = {}
+        if self.token:
+            headers["Authorization"] = f"Bearer {self.token}"
+        data = None
+        if body is not None:
+            data = json.dumps(body).encode("utf-8")
+            headers["Content-Type"] = "application/json"
+        conn.request(method, path, data, headers)
+        return conn.getresponse()
+
+    def _request(self, method, path, params=None, body=None):
+        try:
+            resp = self._send(self._connection(), method, path, params, body)
+        except (http.client.RemoteDisconnected, BrokenPipeError, ConnectionResetError):
+            # The server closed an idle keep-alive connection; retry once.
+            resp = self._send(self._connection(fresh=True), method, path, params, body)
+        data = resp.read()
+        payload = json.loads(data) if data else {}
+        if resp.status == 429:
+            raise LoginThrottled(float(resp.getheader("Retry-After") or 1) - 1)
+        if resp.status >= 400:
+            raise RemoteError(resp.status, payload.get("error") or f"HTTP {resp.status}")
+        return payload
+
+    # ---- Accounts (auth.Authenticator interface) ----
+    def register(self, username, password):
+        try:
+            self._request("POST", "/register", body={"username": username, "password": password})
+        except RemoteError as e:
+            if e.status == 409:
+                return False
+            raise
+        return True
+
+    def login(self, username, password):
+        try:
+            session = self._request("POST", "/login", body={"username": username, "password": password})
+        except RemoteError as e:
+            if e.status == 401:
+                return False
+            raise
+        self.token = session["token"]
+        self.currency = session.get("currency", DEFAULT_CURRENCY)
+        self.user = username
+        return True
+
+    # ---- Expenses ----
+    def add_expense(self, user, date, category, description, amount_minor, currency=None):
+        return self._request("POST", "/expenses", body={
+            "date": date, "category": category, "description": description,
+            "amount_minor": amount_minor, "currency": currency or self.currency})["id"]
+
+    def add_expenses(self, rows):
+        rows = [[date, category, description, format_amount(minor, currency), currency]
+                for _, date, category, description, minor, currency in rows]
+        return self._request("POST", "/expenses/batch", body={"rows": rows})["imported"]
+
+    def get_expense(self, user, expense_id):
+        try:
+            return tuple(self._request("GET", f"/expenses/{int(expense_id)}")["row"])
+        except RemoteError as e:
+            if e.status == 404:
+                return None
+            raise
+
+    def update_expense(self, user, expense_id, date, category, description, amount_minor, currency=None):
+        try:
+            self._request("PUT", f"/expenses/{int(expense_id)}", body={
+                "date": date, "category": category, "description": description,
+                "amount_minor": amount_minor, "currency": currency or self.currency})
+        except RemoteError as e:
+            if e.status == 404:
+                return False
+            raise
+        return True
+
+    def delete_expense(self, user, expense_id):
+        try:
+            self._request("DELETE", f"/expenses/{int(expense_id)}")
+        except RemoteError as e:
+            if e.status == 404:
+                return False
+            raise
+        return True
+
+    def page_expenses(self, user, sort="date", descending=True, after=None, before=None,
+                      limit=200, category=None, date=None):
+        params = {"sort": sort, "desc": int(bool(descending)), "limit": limit, "category": category, "date": date,
+                  "after": json.dumps(list(after)) if after is not None else None,
+                  "before": json.dumps(list(before)) if before is not None else None}
+        return [tuple(r) for r in self._request("GET", "/expenses", params)["rows"]]
+
+    def search_expenses(self, user, text="", start=None, end=None, min_amount=None, max_amount=None,
+                        category=None, limit=100, offset=0):
+        params = {"q": text, "from": start, "to": end, "min": min_amount, "max": max_amount,
+                  "category": category, "limit": limit, "offset": offset}
+        return [tuple(r) for r in self._request("GET", "/search", params)["rows"]]
+
+    def count_expenses(self, user, start=None, end=None, category=None):
+        return self._request("GET", "/count", {"from": start, "to": end, "category": category})["count"]
+
+    def iter_expense_batches(self, user, batch_size=1000, start=None, end=None, category=None):
+        # Streams /export as JSON lines on a connection of its own, so other
+        # calls from this thread can interleave with a long export.
+        conn = http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+        try:
+            resp = self._send(conn, "GET", "/export", {"format": "jsonl", "from": start, "to": end,
+                                                       "category": category}, None)
+            if resp.status >= 400:
+                raise RemoteError(resp.status, (json.loads(resp.read() or b"{}")).get("error") or f"HTTP {resp.status}")
+            batch = []
+            for line in resp:
+                batch.append(tuple(json.loads(line)))
+                if len(batch) >= batch_size:
+                    yield batch
+                    batch = []
+            if batch:
+                yield batch
+        finally:
+            conn.close()
+
+    def iter_expenses(self, user, batch_size=1000, start=None, end=None, category=None):
+        for rows in self.iter_expense_batches(user, batch_size, start, end, category):
+            yield from rows
+
+    # ---- Aggregates ----
+    def _summary(self, currency):
+        return self._request("GET", "/summary", {"currency": currency})
+
+    def total_amount(self, user, currency=None):
+        return self._summary(currency)["total"]
+
+    def category_totals(self, user, currency=None):
+        return [tuple(r) for r in self._summary(currency)["categories"]]
+
+    def currency_totals(self, user):
+        return [tuple(r) for r in self._request("GET", "/currencies")["rows"]]
+
+    def date_totals(self, user, start=None, end=None, currency=None):
+        params = {"from": start, "to": end, "currency": currency}
+        return [tuple(r) for r in self._request("GET", "/totals/day", params)["rows"]]
+
+    def month_totals(self, user, start=None, end=None, currency=None):
+        params = {"from": start, "to": end, "currency": currency}
+        return [tuple(r) for r in self._request("GET", "/totals/month", params)["rows"]]
+
+    def date_bounds(self, user, currency=None):
+        bounds = self._request("GET", "/bounds", {"currency": currency})["bounds"]
+        return tuple(bounds) if bounds else None
+
+    # ---- Budgets ----
+    def set_budget(self, user, category, limit_minor, currency=None):
+        self._request("PUT", f"/budgets/{category.strip().title()}",
+                      body={"limit_minor": limit_minor, "currency": currency or self.currency})
+
+    def budgets(self, user, month=None):
+        return [tuple(r) for r in self._request("GET", "/budgets", {"month": month})["budgets"]]
+
+    def expense_alerts(self, user, date, category, amount_minor, currency=None, previous=None):
+        currency = currency or self.currency
+        params = {"date": date, "category": category, "amount": format_amount(amount_minor, currency),
+                  "currency": currency}
+        if previous is not None:
+            old_date, old_category, old_amount, old_currency = previous
+            old_currency = old_currency or self.currency
+            params.update(previous_date=old_date, previous_category=old_category,
+                          previous_amount=format_amount(old_amount, old_currency), previous_currency=old_currency)
+        return [tuple(a) for a in self._request("GET", "/alerts", params)["alerts"]]
+
+    # ---- Recurring expenses ----
+    # The service writes due occurrences itself; there is no
+    # materialize_recurring here.
+    def add_recurring(self, user, category, description, amount_minor, schedule, start_date, end_date=None,
+                      currency=None):
+        return self._request("POST", "/recurring", body={
+            "category": category, "description": description, "amount_minor": amount_minor,
+            "currency": currency or self.currency, "schedule": schedule, "start": start_date, "end": end_date})["id"]
+
+    def recurring_rules(self, user):
+        return [tuple(r) for r in self._request("GET", "/recurring")["rules"]]
+
+    def delete_recurring(self, user, rule_id):
+        try:
+            self._request("DELETE", f"/recurring/{int(rule_id)}")
+        except RemoteError as e:
+            if e.status == 404:
+                return False
+            raise
+        return True
+
+
+# ---------------- CLI ----------------
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve a ByteBank database to several clients over local HTTP.")
+    parser.add_argument("--db", default=DB_NAME, help="database file (default: %(default)s)")
+    parser.add_argument("--host", default=DEFAULT_HOST, help="address to listen on (default: %(default)s)")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT, help="port to listen on (default: %(default)s)")
+    parser.add_argument("--readers", type=int, default=READERS, help="reader threads (default: %(default)s)")
+    args = parser.parse_args(argv)
+
+    store = get_store(args.db)
+    try:
+        asyncio.run(serve(store, args.host, args.port, args.readers))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,1542 @@
+import argparse
+import datetime
+import json
+import math
+import os
+import re
+import sqlite3
+import sys
+import threading
+import time
+import atexit
+from contextlib import contextmanager
+
+from money import DEFAULT_CURRENCY, normalize_currency, format_amount
+from recurring import parse_schedule, occurrences, next_occurrence
+from categorize import Categorizer, check_rule, parse_rule, rule_text
+
+DB_NAME = "bytebank.db"
+
+CATEGORIES = ["Food", "Transport", "Rent", "Bills", "Others"]
+
+# Connection tuning applied once per connection. WAL lets readers run while a
+# write is in progress, NORMAL sync is safe under WAL and avoids an fsync per
+# commit, and the larger page cache / mmap keep hot index pages in memory.
+# Incremental auto-vacuum (see ExpenseStore.maintain) only takes hold on a new
+# file, and only when set before WAL; older databases switch over in compact().
+PRAGMAS = [
+    "PRAGMA auto_vacuum=INCREMENTAL",
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA cache_size=-16000",
+    "PRAGMA mmap_size=67108864",
+    "PRAGMA busy_timeout=5000",
+]
+
+# ---------------- SQL ----------------
+# Kept as module constants so sqlite3's statement cache reuses the prepared
+# statements across calls instead of re-parsing them.
+SQL_INSERT_USER = "INSERT INTO users (username, password) VALUES (?, ?)"
+SQL_GET_PASSWORD = "SELECT password FROM users WHERE username=?"
+SQL_SET_PASSWORD = "UPDATE users SET password=? WHERE username=?"
+SQL_GET_SETTING = "SELECT value FROM settings WHERE key=?"
+SQL_SET_SETTING = "INSERT INTO settings (key, value) VALUES (?, ?) ON CONFLICT (key) DO UPDATE SET value=excluded.value"
+
+SQL_INSERT_EXPENSE = ("INSERT INTO expenses (user, date, category, description, amount_minor, currency) "
+                      "VALUES (?, ?, ?, ?, ?, ?)")
+SQL_GET_EXPENSE = "SELECT id, date, category, description, amount_minor, currency FROM expenses WHERE id=? AND user=?"
+SQL_UPDATE_EXPENSE = ("UPDATE expenses SET date=?, category=?, description=?, amount_minor=?, currency=? "
+                      "WHERE id=? AND user=?")
+SQL_DELETE_EXPENSE = "DELETE FROM expenses WHERE id=? AND user=?"
+
+# Streaming reads with an optional inclusive date range, with and without a
+# category so each variant can use its (user, ..., date) index.
+SQL_STREAM = ("SELECT id, date, category, description, amount_minor, currency FROM expenses "
+              "WHERE user=? AND date BETWEEN ? AND ? ORDER BY date DESC, id DESC")
+SQL_STREAM_CATEGORY = ("SELECT id, date, category, description, amount_minor, currency FROM expenses "
+                       "WHERE user=? AND category=? AND date BETWEEN ? AND ? ORDER BY date DESC, id DESC")
+SQL_COUNT_RANGE = "SELECT COUNT(*) FROM expenses WHERE user=? AND date BETWEEN ? AND ?"
+SQL_COUNT_RANGE_CATEGORY = "SELECT COUNT(*) FROM expenses WHERE user=? AND category=? AND date BETWEEN ? AND ?"
+# The same reads over all history (see archive()).
+SQL_HISTORY_STREAM = SQL_STREAM.replace("FROM expenses", "FROM all_expenses")
+SQL_HISTORY_STREAM_CATEGORY = SQL_STREAM_CATEGORY.replace("FROM expenses", "FROM all_expenses")
+SQL_HISTORY_COUNT = SQL_COUNT_RANGE.replace("FROM expenses", "FROM all_expenses")
+SQL_HISTORY_COUNT_CATEGORY = SQL_COUNT_RANGE_CATEGORY.replace("FROM expenses", "FROM all_expenses")
+SQL_DERIVED_TRIGGERS = ("SELECT name FROM sqlite_master WHERE type='trigger' AND tbl_name='expenses' "
+                        "AND (name LIKE 'expenses_rollup_%' OR name LIKE 'expenses_fts_%')")
+SQL_HAS_FTS = "SELECT 1 FROM sqlite_master WHERE name='expenses_fts'"
+SQL_USERS = "SELECT DISTINCT user FROM rollup_category ORDER BY user"
+
+# Keyset pagination: each sortable column maps to the full ordering key
+# (always ending in id so it is unique), which the indexes below cover.
+SORT_KEYS = {
+    "date": ("date", "id"),
+    "category": ("category", "date", "id"),
+    "amount": ("amount_minor", "id"),
+}
+# Amounts are integers in the minor unit of the row's currency (see money.py).
+ROW_COLUMNS = ("id", "date", "category", "description", "amount_minor", "currency")
+
+# Aggregates read the rollup tables, so they cost O(#groups) rather than a
+# pass over every expense the user has. Totals are per currency (integer
+# minor units); amounts in different currencies are never added together.
+SQL_TOTAL = "SELECT SUM(total) FROM rollup_category WHERE user=? AND currency=?"
+SQL_CATEGORY_TOTALS = "SELECT category, total FROM rollup_category WHERE user=? AND currency=? ORDER BY category"
+SQL_DATE_TOTALS = ("SELECT day, total FROM rollup_day WHERE user=? AND currency=? AND day BETWEEN ? AND ? "
+                   "ORDER BY day")
+SQL_MONTH_TOTALS = ("SELECT month, total FROM rollup_month WHERE user=? AND currency=? AND month BETWEEN ? AND ? "
+                    "ORDER BY month")
+SQL_DATE_BOUNDS = "SELECT MIN(day), MAX(day) FROM rollup_day WHERE user=? AND currency=?"
+SQL_CURRENCIES = "SELECT currency, SUM(total) FROM rollup_category WHERE user=? GROUP BY currency ORDER BY currency"
+
+# Budgets and alerts read single rollup rows by primary key, so checking an
+# expense costs the same on an account with ten rows or ten million.
+SQL_SET_BUDGET = ("INSERT INTO budgets (user, category, limit_minor, currency) VALUES (?, ?, ?, ?) "
+                  "ON CONFLICT (user, category) DO UPDATE SET limit_minor=excluded.limit_minor, "
+                  "currency=excluded.currency")
+SQL_DELETE_BUDGET = "DELETE FROM budgets WHERE user=? AND category=?"
+SQL_BUDGETS = ("SELECT b.category, b.limit_minor, COALESCE(r.total, 0), b.currency FROM budgets b "
+               "LEFT JOIN rollup_category_month r ON r.user = b.user AND r.currency = b.currency "
+               "AND r.month_category = ? || ' ' || b.category "
+               "WHERE b.user=? ORDER BY b.category")
+SQL_BUDGET_STATUS = ("SELECT b.limit_minor, COALESCE(r.total, 0) FROM budgets b "
+                     "LEFT JOIN rollup_category_month r ON r.user = b.user AND r.currency = b.currency "
+                     "AND r.month_category = ? "
+                     "WHERE b.user=? AND b.category=? AND b.currency=?")
+SQL_CATEGORY_STATS = "SELECT total, count, sumsq FROM rollup_category WHERE user=? AND currency=? AND category=?"
+
+# Alert thresholds: warn once month-to-date spend crosses BUDGET_WARN of a
+# budget and on every expense once it is exceeded; flag an expense as a spike
+# when it is more than SPIKE_SIGMAS standard deviations above the mean of the
+# user's other expenses in that category (given at least SPIKE_MIN_COUNT).
+BUDGET_WARN = 0.8
+SPIKE_SIGMAS = 3.0
+SPIKE_MIN_COUNT = 10
+
+
+# ---------------- Schema migrations ----------------
+# Each entry upgrades the schema by one step; PRAGMA user_version records how
+# many have been applied, so existing bytebank.db files are brought forward
+# exactly once.
+def _migrate_base_schema(cur):
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS users (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        username TEXT UNIQUE NOT NULL,
+        password TEXT NOT NULL
+    )
+    """)
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS expenses (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        user TEXT NOT NULL,
+        date TEXT NOT NULL,
+        category TEXT NOT NULL,
+        description TEXT,
+        amount REAL NOT NULL
+    )
+    """)
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_expenses_user_date ON expenses (user, date, id)")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_expenses_user_category ON expenses (user, category, date)")
+
+
+def _migrate_amount_index(cur):
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_expenses_user_amount ON expenses (user, amount)")
+
+
+# ---------------- Rollups ----------------
+# Per user x currency x group running totals kept in step with expenses by
+# triggers, so every write path (GUI, importer, direct SQL) maintains them.
+# Each entry is (table, key column, key expression over an expenses row).
+# Totals are exact integer minor units. Besides total and count every group
+# keeps the sum of squared amounts, which gives the mean and standard
+# deviation of its expenses without reading them.
+ROLLUPS = [
+    ("rollup_category", "category", "{row}.category"),
+    ("rollup_day", "day", "{row}.date"),
+    ("rollup_month", "month", "substr({row}.date, 1, 7)"),
+    ("rollup_category_month", "month_category", "substr({row}.date, 1, 7) || ' ' || {row}.category"),
+]
+
+
+# The shape verify_rollups expects of date-derived keys.
+ROLLUP_KEY_SHAPES = [
+    ("rollup_day", "day", "[0-9][0-9][0-9][0-9]-[0-9][0-9]-[0-9][0-9]"),
+    ("rollup_month", "month", "[0-9][0-9][0-9][0-9]-[0-9][0-9]"),
+    ("rollup_category_month", "month_category", "[0-9][0-9][0-9][0-9]-[0-9][0-9] *"),
+]
+
+
+def _rollup_add_sql(table, key, expr, row):
+    value = expr.format(row=row)
+    return (f"INSERT INTO {table} (user, currency, {key}, total, count, sumsq) "
+            f"VALUES ({row}.user, {row}.currency, {value}, {row}.amount_minor, 1, "
+            f"CAST({row}.amount_minor AS REAL) * {row}.amount_minor) "
+            f"ON CONFLICT (user, currency, {key}) DO UPDATE SET total = total + excluded.total, "
+            f"count = count + 1, sumsq = sumsq + excluded.sumsq;")
+
+
+def _rollup_remove_sql(table, key, expr, row):
+    value = expr.format(row=row)
+    where = f"user = {row}.user AND currency = {row}.currency AND {key} = {value}"
+    return (f"UPDATE {table} SET total = total - {row}.amount_minor, count = count - 1, "
+            f"sumsq = sumsq - CAST({row}.amount_minor AS REAL) * {row}.amount_minor WHERE {where}; "
+            f"DELETE FROM {table} WHERE {where} AND count = 0;")
+
+
+def _install_rollup_triggers(cur):
+    adds = "\n".join(_rollup_add_sql(*r, "NEW") for r in ROLLUPS)
+    removes = "\n".join(_rollup_remove_sql(*r, "OLD") for r in ROLLUPS)
+    for name in ("expenses_rollup_insert", "expenses_rollup_delete", "expenses_rollup_update"):
+        cur.execute(f"DROP TRIGGER IF EXISTS {name}")
+    cur.execute(f"CREATE TRIGGER expenses_rollup_insert AFTER INSERT ON expenses BEGIN\n{adds}\nEND")
+    cur.execute(f"CREATE TRIGGER expenses_rollup_delete AFTER DELETE ON expenses BEGIN\n{removes}\nEND")
+    cur.execute("CREATE TRIGGER expenses_rollup_update AFTER UPDATE OF user, date, category, amount_minor, currency "
+                f"ON expenses BEGIN\n{removes}\n{adds}\nEND")
+
+
+def _fill_rollups(cur, user=None):
+    for table, key, expr in ROLLUPS:
+        value = expr.format(row="expenses")
+        select = (f"INSERT INTO {table} (user, currency, {key}, total, count, sumsq) "
+                  f"SELECT user, currency, {value}, SUM(amount_minor), COUNT(*), "
+                  f"TOTAL(CAST(amount_minor AS REAL) * amount_minor) FROM expenses")
+        if user is None:
+            cur.execute(f"DELETE FROM {table}")
+            cur.execute(f"{select} GROUP BY user, currency, {value}")
+        else:
+            cur.execute(f"DELETE FROM {table} WHERE user=?", (user,))
+            cur.execute(f"{select} WHERE user=? GROUP BY user, currency, {value}", (user,))
+
+
+def _merge_rollups(cur, where, params, sign=1):
+    # Adds (sign=1) or subtracts (sign=-1) the expenses matching `where` to
+    # or from the rollups instead of one trigger upsert per row and table:
+    # the rows are grouped once by user x currency x day x category (every
+    # rollup key derives from those) and each rollup then merges the much
+    # smaller grouped table.
+    cur.execute("DROP TABLE IF EXISTS temp.rollup_delta")
+    cur.execute(f"CREATE TEMP TABLE rollup_delta AS "
+                f"SELECT user, currency, date, category, {sign} * SUM(amount_minor) AS total, "
+                f"{sign} * COUNT(*) AS count, {sign} * TOTAL(CAST(amount_minor AS REAL) * amount_minor) AS sumsq "
+                f"FROM expenses WHERE {where} GROUP BY user, currency, date, category", params)
+    # (WHERE true keeps SQLite from reading ON CONFLICT as a join constraint.)
+    for table, key, expr in ROLLUPS:
+        value = expr.format(row="rollup_delta")
+        cur.execute(f"INSERT INTO {table} (user, currency, {key}, total, count, sumsq) "
+                    f"SELECT user, currency, {value}, SUM(total), SUM(count), TOTAL(sumsq) FROM rollup_delta "
+                    f"WHERE true GROUP BY user, currency, {value} "
+                    f"ON CONFLICT (user, currency, {key}) DO UPDATE SET total = total + excluded.total, "
+                    f"count = count + excluded.count, sumsq = sumsq + excluded.sumsq")
+        if sign < 0:
+            cur.execute(f"DELETE FROM {table} WHERE count = 0")
+    cur.execute("DROP TABLE temp.rollup_delta")
+
+
+def _create_rollup_tables(cur):
+    for table, key, _ in ROLLUPS:
+        cur.execute(f"""
+        CREATE TABLE IF NOT EXISTS {table} (
+            user TEXT NOT NULL,
+            currency TEXT NOT NULL,
+            {key} TEXT NOT NULL,
+            total INTEGER NOT NULL,
+            count INTEGER NOT NULL,
+            sumsq REAL NOT NULL DEFAULT 0,
+            PRIMARY KEY (user, currency, {key})
+        ) WITHOUT ROWID
+        """)
+
+
+# The rollup triggers and contents depend on the final expenses columns, so
+# the older steps below only create tables; _migrate_integer_amounts, the
+# last step, installs the triggers and fills every rollup once.
+def _migrate_rollups(cur):
+    _create_rollup_tables(cur)
+
+
+def _migrate_settings(cur):
+    cur.execute("CREATE TABLE IF NOT EXISTS settings (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+
+
+def _migrate_budgets(cur):
+    # Adds the per category x month rollup, the squared-amount column the
+    # alerts need and the budgets table.
+    _create_rollup_tables(cur)
+    for table, _, _ in ROLLUPS:
+        columns = [r[1] for r in cur.execute(f"PRAGMA table_info({table})")]
+        if "sumsq" not in columns:
+            cur.execute(f"ALTER TABLE {table} ADD COLUMN sumsq REAL NOT NULL DEFAULT 0")
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS budgets (
+        user TEXT NOT NULL,
+        category TEXT NOT NULL,
+        monthly_limit REAL NOT NULL,
+        PRIMARY KEY (user, category)
+    ) WITHOUT ROWID
+    """)
+
+
+# ---------------- Integer amounts ----------------
+# Amounts used to be REAL rupees. The upgrade adds amount_minor (paise) and
+# currency next to the old column, fills amount_minor in id-range batches of
+# BACKFILL_BATCH rows, each committed on its own so a large database never
+# sits in one huge write and an interrupted upgrade resumes where it stopped,
+# then rebuilds the table without the REAL column and the rollups over the
+# integers.
+BACKFILL_BATCH = 50_000
+LEGACY_CURRENCY = "INR"
+SQL_BACKFILL_AMOUNT = ("UPDATE expenses SET amount_minor = CAST(round(amount * 100) AS INTEGER) "
+                       "WHERE id BETWEEN ? AND ? AND amount_minor IS NULL")
+
+
+def _migrate_amount_columns(cur):
+    columns = [r[1] for r in cur.execute("PRAGMA table_info(expenses)")]
+    if "amount_minor" not in columns:
+        cur.execute("ALTER TABLE expenses ADD COLUMN amount_minor INTEGER")
+    if "currency" not in columns:
+        cur.execute(f"ALTER TABLE expenses ADD COLUMN currency TEXT NOT NULL DEFAULT '{LEGACY_CURRENCY}'")
+
+
+def _backfill_amount_minor(store):
+    low, high = store.conn.execute("SELECT MIN(id), MAX(id) FROM expenses").fetchone()
+    if low is None:
+        return
+    for start in range(low, high + 1, BACKFILL_BATCH):
+        with store.transaction() as cur:
+            cur.execute(SQL_BACKFILL_AMOUNT, (start, start + BACKFILL_BATCH - 1))
+
+
+# Runs outside the per-step transaction; see ExpenseStore.migrate.
+_backfill_amount_minor.batched = True
+
+
+def _migrate_integer_amounts(cur):
+    if cur.execute("SELECT 1 FROM expenses WHERE amount_minor IS NULL LIMIT 1").fetchone():
+        raise RuntimeError("amount backfill incomplete; run the migration again")
+    # Copied into a table without the REAL column rather than using ALTER
+    # TABLE DROP COLUMN (SQLite 3.35+), which would leave amount_minor as it
+    # was added, nullable. The AUTOINCREMENT counter is carried over so ids
+    # of deleted expenses are never handed out again; the old table's
+    # indexes and triggers go with it.
+    seq = cur.execute("SELECT seq FROM sqlite_sequence WHERE name='expenses'").fetchone()
+    cur.execute(f"""
+    CREATE TABLE expenses_new (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        user TEXT NOT NULL,
+        date TEXT NOT NULL,
+        category TEXT NOT NULL,
+        description TEXT,
+        amount_minor INTEGER NOT NULL,
+        currency TEXT NOT NULL DEFAULT '{LEGACY_CURRENCY}'
+    )
+    """)
+    cur.execute("INSERT INTO expenses_new SELECT id, user, date, category, description, amount_minor, currency "
+                "FROM expenses")
+    cur.execute("DROP TABLE expenses")
+    cur.execute("ALTER TABLE expenses_new RENAME TO expenses")
+    cur.execute("DELETE FROM sqlite_sequence WHERE name='expenses'")
+    if seq is not None:
+        cur.execute("INSERT INTO sqlite_sequence (name, seq) VALUES ('expenses', ?)", seq)
+    cur.execute("CREATE INDEX idx_expenses_user_date ON expenses (user, date, id)")
+    cur.execute("CREATE INDEX idx_expenses_user_category ON expenses (user, category, date)")
+    cur.execute("CREATE INDEX idx_expenses_user_amount ON expenses (user, amount_minor)")
+    for table, _, _ in ROLLUPS:
+        cur.execute(f"DROP TABLE IF EXISTS {table}")
+    _create_rollup_tables(cur)
+    cur.execute("""
+    CREATE TABLE budgets_new (
+        user TEXT NOT NULL,
+        category TEXT NOT NULL,
+        limit_minor INTEGER NOT NULL,
+        currency TEXT NOT NULL,
+        PRIMARY KEY (user, category)
+    ) WITHOUT ROWID
+    """)
+    cur.execute("INSERT INTO budgets_new SELECT user, category, CAST(round(monthly_limit * 100) AS INTEGER), ? "
+                "FROM budgets", (LEGACY_CURRENCY,))
+    cur.execute("DROP TABLE budgets")
+    cur.execute("ALTER TABLE budgets_new RENAME TO budgets")
+    _install_derived(cur)
+
+
+# ---------------- Full-text search ----------------
+# External-content FTS5 index over expenses (description, user), kept in sync
+# by triggers. Indexing the user column lets a search intersect the posting
+# lists for the query terms with the current user's instead of ranking every
+# matching row in the database. Builds without FTS5 fall back to LIKE.
+def _migrate_fts(cur):
+    try:
+        cur.execute("""
+        CREATE VIRTUAL TABLE IF NOT EXISTS expenses_fts USING fts5(
+            description, user,
+            content='expenses', content_rowid='id',
+            tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+        )
+        """)
+    except sqlite3.OperationalError:
+        return
+    _install_fts_triggers(cur)
+    cur.execute("INSERT INTO expenses_fts (expenses_fts) VALUES ('rebuild')")
+
+
+def _install_fts_triggers(cur):
+    cur.execute("""
+    CREATE TRIGGER IF NOT EXISTS expenses_fts_insert AFTER INSERT ON expenses BEGIN
+        INSERT INTO expenses_fts (rowid, description, user) VALUES (NEW.id, NEW.description, NEW.user);
+    END
+    """)
+    cur.execute("""
+    CREATE TRIGGER IF NOT EXISTS expenses_fts_delete AFTER DELETE ON expenses BEGIN
+        INSERT INTO expenses_fts (expenses_fts, rowid, description, user) VALUES ('delete', OLD.id, OLD.description, OLD.user);
+    END
+    """)
+    cur.execute("""
+    CREATE TRIGGER IF NOT EXISTS expenses_fts_update AFTER UPDATE OF description, user ON expenses BEGIN
+        INSERT INTO expenses_fts (expenses_fts, rowid, description, user) VALUES ('delete', OLD.id, OLD.description, OLD.user);
+        INSERT INTO expenses_fts (rowid, description, user) VALUES (NEW.id, NEW.description, NEW.user);
+    END
+    """)
+
+
+def _fts_phrase(text):
+    return '"' + text.replace('"', '""') + '"'
+
+
+def search_terms(text):
+    return re.findall(r"\w+", text.lower())
+
+
+def _install_derived(cur):
+    # (Re)creates every trigger-maintained table's triggers and contents.
+    _install_rollup_triggers(cur)
+    _fill_rollups(cur)
+    _migrate_fts(cur)
+
+
+# ---------------- Recurring expenses ----------------
+# A rule (recurring.py schedule plus the expense to create) remembers
+# next_date, its first occurrence not yet written to expenses; NULL once its
+# end_date has passed. Expenses created from a rule carry its id, and the
+# unique (recurring_id, date) index makes writing an occurrence twice a no-op,
+# so a catch-up that is interrupted or runs in two processes at once cannot
+# duplicate anything. Rule ids are AUTOINCREMENT so a deleted rule's id is
+# never reused for a new one.
+SQL_ADD_RULE = ("INSERT INTO recurring (user, category, description, amount_minor, currency, schedule, "
+                "start_date, end_date, next_date) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)")
+SQL_RULES = ("SELECT id, category, description, amount_minor, currency, schedule, start_date, end_date, next_date "
+             "FROM recurring WHERE user=? ORDER BY id")
+SQL_DELETE_RULE = "DELETE FROM recurring WHERE id=? AND user=?"
+SQL_DUE_RULES = "SELECT id, user, schedule, end_date, next_date FROM recurring WHERE next_date <= ?"
+SQL_ADVANCE_RULE = "UPDATE recurring SET next_date=? WHERE id=?"
+# One statement per rule, given its dates as a JSON array: the rule's columns
+# are read once by SQLite instead of bound from Python for every occurrence.
+SQL_INSERT_OCCURRENCES = ("INSERT OR IGNORE INTO expenses (user, date, category, description, amount_minor, "
+                          "currency, recurring_id) SELECT r.user, d.value, r.category, r.description, r.amount_minor, "
+                          "r.currency, r.id FROM recurring r, json_each(?) d WHERE r.id=?")
+SQL_MAX_EXPENSE_ID = "SELECT COALESCE(MAX(id), 0) FROM expenses"
+SQL_FTS_APPEND = ("INSERT INTO expenses_fts (rowid, description, user) "
+                  "SELECT id, description, user FROM expenses WHERE id > ?")
+
+
+def _migrate_recurring(cur):
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS recurring (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        user TEXT NOT NULL,
+        category TEXT NOT NULL,
+        description TEXT,
+        amount_minor INTEGER NOT NULL,
+        currency TEXT NOT NULL,
+        schedule TEXT NOT NULL,
+        start_date TEXT NOT NULL,
+        end_date TEXT,
+        next_date TEXT
+    )
+    """)
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_recurring_user ON recurring (user)")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_recurring_next ON recurring (next_date) WHERE next_date IS NOT NULL")
+    columns = [r[1] for r in cur.execute("PRAGMA table_info(expenses)")]
+    if "recurring_id" not in columns:
+        cur.execute("ALTER TABLE expenses ADD COLUMN recurring_id INTEGER")
+    cur.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_expenses_recurring ON expenses (recurring_id, date) "
+                "WHERE recurring_id IS NOT NULL")
+
+
+# ---------------- Category rules ----------------
+# Per-user auto-categorization rules (categorize.py); one rule per pattern,
+# so adding an existing pattern again only changes its category.
+SQL_ADD_CATEGORY_RULE = ("INSERT INTO category_rules (user, kind, pattern, category) VALUES (?, ?, ?, ?) "
+                         "ON CONFLICT (user, kind, pattern) DO UPDATE SET category=excluded.category")
+SQL_CATEGORY_RULES = "SELECT id, kind, pattern, category FROM category_rules WHERE user=? ORDER BY id"
+SQL_DELETE_CATEGORY_RULE = "DELETE FROM category_rules WHERE id=? AND user=?"
+SQL_DESCRIPTION_CATEGORIES = ("SELECT description, category, COUNT(*) FROM expenses WHERE user=? "
+                              "GROUP BY description, category")
+SQL_DISTINCT_DESCRIPTIONS = "SELECT DISTINCT description FROM expenses WHERE user=? AND description IS NOT NULL"
+SQL_DISTINCT_DESCRIPTIONS_CATEGORY = ("SELECT DISTINCT description FROM expenses WHERE user=? AND category=? "
+                                      "AND description IS NOT NULL")
+SQL_RECATEGORIZE_IDS = ("CREATE TEMP TABLE recategorized_ids AS SELECT e.id FROM expenses e "
+                        "JOIN temp.recategorized r ON r.description = e.description "
+                        "WHERE e.user=? AND e.category != r.category")
+SQL_RECATEGORIZE = ("UPDATE expenses SET category = (SELECT r.category FROM temp.recategorized r "
+                    "WHERE r.description = expenses.description) WHERE id IN (SELECT id FROM temp.recategorized_ids)")
+
+
+def _migrate_category_rules(cur):
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS category_rules (
+        id INTEGER PRIMARY KEY,
+        user TEXT NOT NULL,
+        kind TEXT NOT NULL,
+        pattern TEXT NOT NULL,
+        category TEXT NOT NULL,
+        UNIQUE (user, kind, pattern)
+    )
+    """)
+
+
+# ---------------- ISO dates ----------------
+# Older versions stored dates as typed once they parsed, so 2024-1-5 sits
+# next to 2024-01-05. Every date query, rollup key (substr(date, 1, 7)) and
+# the analytics cache assume the zero-padded form, so such rows are rewritten
+# once and the rollups rebuilt from the result.
+SQL_NON_ISO_DATES = ("SELECT id, date FROM expenses "
+                     "WHERE date NOT GLOB '[0-9][0-9][0-9][0-9]-[0-9][0-9]-[0-9][0-9]'")
+
+
+def iso_date(text):
+    # "2024-1-5" -> "2024-01-05"; ValueError when it is no date at all.
+    return datetime.datetime.strptime(text.strip(), "%Y-%m-%d").date().isoformat()
+
+
+def _migrate_iso_dates(cur):
+    fixed = []
+    for expense_id, date in cur.execute(SQL_NON_ISO_DATES).fetchall():
+        try:
+            fixed.append((iso_date(date), expense_id))
+        except ValueError:
+            # Not a date at all; nothing sensible to rewrite it to.
+            continue
+    if not fixed:
+        return
+    rollups = cur.execute("SELECT 1 FROM sqlite_master WHERE name='expenses_rollup_update'").fetchone()
+    cur.execute("DROP TRIGGER IF EXISTS expenses_rollup_update")
+    cur.executemany("UPDATE expenses SET date=? WHERE id=?", fixed)
+    if rollups:
+        _install_rollup_triggers(cur)
+        _fill_rollups(cur)
+
+
+MIGRATIONS = [
+    _migrate_base_schema,
+    _migrate_amount_index,
+    _migrate_rollups,
+    _migrate_settings,
+    _migrate_fts,
+    _migrate_budgets,
+    _migrate_amount_columns,
+    _backfill_amount_minor,
+    _migrate_integer_amounts,
+    _migrate_recurring,
+    _migrate_category_rules,
+    _migrate_iso_dates,
+]
+
+
+# ---------------- Backups, maintenance and archives ----------------
+# Backups copy BACKUP_PAGES pages per step of SQLite's backup API, with a
+# progress callback (and a chance to cancel) between steps.
+BACKUP_PAGES = 1024
+# Each maintain() run returns at most MAINTENANCE_PAGES free pages to the
+# filesystem, so the hourly pass never holds the write lock for long, and
+# lets PRAGMA optimize sample ANALYSIS_LIMIT rows per index.
+MAINTENANCE_PAGES = 1000
+ANALYSIS_LIMIT = 1000
+AUTO_VACUUM_INCREMENTAL = 2
+# archive() moves whole years of expenses into one file per year next to the
+# database (bytebank-archive-2019.db, ...). Reads over all history attach
+# those files, at most ATTACH_LIMIT per connection (SQLite's default cap).
+ARCHIVE_INFIX = "-archive-"
+ATTACH_LIMIT = 10
+ARCHIVE_COLUMNS = "id, user, date, category, description, amount_minor, currency, recurring_id"
+SQL_ARCHIVE_YEARS = "SELECT DISTINCT substr(month, 1, 4) FROM rollup_month WHERE month < ? ORDER BY 1"
+# Ids are never reused (AUTOINCREMENT), so REPLACE only meets rows copied by
+# an earlier, interrupted run and refreshes them.
+SQL_ARCHIVE_COPY = (f"INSERT OR REPLACE INTO archive.expenses ({ARCHIVE_COLUMNS}) "
+                    f"SELECT {ARCHIVE_COLUMNS} FROM main.expenses WHERE date >= ? AND date < ?")
+SQL_FTS_REMOVE = ("INSERT INTO expenses_fts (expenses_fts, rowid, description, user) "
+                  "SELECT 'delete', id, description, user FROM expenses WHERE {where}")
+
+
+def _create_archive(path):
+    conn = sqlite3.connect(path)
+    try:
+        conn.execute("""
+        CREATE TABLE IF NOT EXISTS expenses (
+            id INTEGER PRIMARY KEY,
+            user TEXT NOT NULL,
+            date TEXT NOT NULL,
+            category TEXT NOT NULL,
+            description TEXT,
+            amount_minor INTEGER NOT NULL,
+            currency TEXT NOT NULL,
+            recurring_id INTEGER
+        )
+        """)
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_expenses_user_date ON expenses (user, date, id)")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_expenses_user_category ON expenses (user, category, date)")
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def _backup_file(source, dest, progress):
+    # Copies the database open on `source` (closed afterwards) to dest; see
+    # ExpenseStore.backup().
+    part = dest + ".part"
+    if os.path.exists(part):
+        os.remove(part)
+    target = sqlite3.connect(part)
+    try:
+        try:
+            source.execute("BEGIN")
+            source.execute("SELECT COUNT(*) FROM sqlite_master").fetchone()
+            steps = None
+            if progress is not None:
+                steps = lambda status, remaining, total: progress(total - remaining, total)
+            source.backup(target, pages=BACKUP_PAGES, progress=steps)
+            source.execute("COMMIT")
+            # A standalone file, with no -wal or -shm to carry along.
+            target.execute("PRAGMA journal_mode=DELETE")
+        finally:
+            source.close()
+            target.close()
+    except BaseException:
+        os.remove(part)
+        raise
+    os.replace(part, dest)
+    return os.path.getsize(dest)
+
+
+def _history_view(years, lower, upper):
+    # all_expenses for one group of attached archives (a0, a1, ...) plus the
+    # main expenses dated in [lower, upper), so that every expense belongs to
+    # exactly one group even if an old date was added after archiving.
+    columns = "id, user, date, category, description, amount_minor, currency"
+    main = [f"date >= '{lower}'"] if lower else []
+    if upper:
+        main.append(f"date < '{upper}'")
+    parts = [f"SELECT {columns} FROM main.expenses" + (" WHERE " + " AND ".join(main) if main else "")]
+    parts += [f"SELECT {columns} FROM a{i}.expenses" for i in range(len(years))]
+    return "CREATE TEMP VIEW all_expenses AS " + " UNION ALL ".join(parts)
+
+
+# ---------------- Store ----------------
+# Batch inserts of at least this many rows maintain rollups and the search
+# index set-wise instead of through the per-row triggers.
+SET_BASED_ROWS = 2000
+
+
+class ExpenseStore:
+    def __init__(self, path=DB_NAME):
+        self.path = path
+        self.lock = threading.RLock()
+        self.conn = self._connect()
+        # Reads issued from worker threads get their own connection so they
+        # run alongside the owning thread under WAL instead of queueing on
+        # self.lock; all writes still go through self.conn.
+        self._owner = threading.get_ident()
+        self._local = threading.local()
+        self._readers = []
+        self._has_fts = None
+        # Called as query_hook(sql, params, seconds, rows) after every read
+        # when set; diagnostics.py uses it to time and EXPLAIN queries.
+        self.query_hook = None
+        # Called as listener(event, user, *details) after each committed
+        # write, outside the store lock: ("insert", user, (id, date, category,
+        # amount_minor, currency)), ("update", user, (...the same)),
+        # ("delete", user, id), ("invalidate", user) after a batch insert and
+        # ("invalidate", None) when everything may have changed.
+        self.listeners = []
+        self.migrate()
+        # Currency for new expenses and aggregates when callers give none.
+        self.currency = self.get_setting("currency", DEFAULT_CURRENCY)
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, isolation_level=None, check_same_thread=False,
+                               cached_statements=128)
+        for pragma in PRAGMAS:
+            conn.execute(pragma)
+        return conn
+
+    def _reader(self):
+        if threading.get_ident() == self._owner:
+            return None
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._connect()
+            self._local.conn = conn
+            with self.lock:
+                self._readers.append(conn)
+        return conn
+
+    def close(self):
+        with self.lock:
+            for conn in self._readers:
+                conn.close()
+            self._readers = []
+            if self.conn is not None:
+                self.conn.execute("PRAGMA optimize")
+                self.conn.close()
+                self.conn = None
+
+    @contextmanager
+    def transaction(self):
+        with self.lock:
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield self.conn.cursor()
+            except BaseException:
+                self.conn.execute("ROLLBACK")
+                raise
+            self.conn.execute("COMMIT")
+
+    @contextmanager
+    def bulk_load(self):
+        # For loads big enough that per-row trigger work dominates: drop the
+        # triggers that maintain derived data (rollups, search index), load,
+        # then rebuild each derived table in a single pass. Holds the write
+        # lock throughout so no other write slips in unmaintained.
+        with self.lock:
+            with self.transaction() as cur:
+                for (name,) in cur.execute(SQL_DERIVED_TRIGGERS).fetchall():
+                    cur.execute(f"DROP TRIGGER {name}")
+            try:
+                yield self
+            finally:
+                with self.transaction() as cur:
+                    _install_derived(cur)
+        self._notify("invalidate", None)
+
+    def migrate(self):
+        with self.lock:
+            version = self.conn.execute("PRAGMA user_version").fetchone()[0]
+            for step in range(version, len(MIGRATIONS)):
+                migration = MIGRATIONS[step]
+                if getattr(migration, "batched", False):
+                    # Commits its own batches and is safe to re-run, so the
+                    # version is only recorded once it has finished.
+                    migration(self)
+                    self.conn.execute(f"PRAGMA user_version={step + 1}")
+                    continue
+                with self.transaction() as cur:
+                    migration(cur)
+                    cur.execute(f"PRAGMA user_version={step + 1}")
+
+    def _read(self, sql, params, fetch):
+        reader = self._reader()
+        if reader is not None:
+            return fetch(reader.execute(sql, params))
+        with self.lock:
+            return fetch(self.conn.execute(sql, params))
+
+    def _fetchall(self, sql, params=()):
+        if self.query_hook is None:
+            return self._read(sql, params, sqlite3.Cursor.fetchall)
+        started = time.perf_counter()
+        rows = self._read(sql, params, sqlite3.Cursor.fetchall)
+        self.query_hook(sql, params, time.perf_counter() - started, len(rows))
+        return rows
+
+    def _fetchone(self, sql, params=()):
+        if self.query_hook is None:
+            return self._read(sql, params, sqlite3.Cursor.fetchone)
+        started = time.perf_counter()
+        row = self._read(sql, params, sqlite3.Cursor.fetchone)
+        self.query_hook(sql, params, time.perf_counter() - started, 0 if row is None else 1)
+        return row
+
+    def explain(self, sql, params=()):
+        # The plan SQLite picks for a read, one line per step (the detail
+        # column of EXPLAIN QUERY PLAN).
+        return [r[3] for r in self._read("EXPLAIN QUERY PLAN " + sql, params, sqlite3.Cursor.fetchall)]
+
+    # ---- Users ----
+    # Passwords are stored as whatever auth.hash_password produced; the
+    # store never sees or compares plaintext.
+    def create_user(self, username, password_hash):
+        try:
+            with self.transaction() as cur:
+                cur.execute(SQL_INSERT_USER, (username, password_hash))
+            return True
+        except sqlite3.IntegrityError:
+            return False
+
+    def get_password_hash(self, username):
+        row = self._fetchone(SQL_GET_PASSWORD, (username,))
+        return row[0] if row else None
+
+    def set_password_hash(self, username, password_hash):
+        with self.transaction() as cur:
+            cur.execute(SQL_SET_PASSWORD, (password_hash, username))
+
+    # ---- Settings ----
+    def get_setting(self, key, default=None):
+        row = self._fetchone(SQL_GET_SETTING, (key,))
+        return row[0] if row else default
+
+    def set_setting(self, key, value):
+        with self.transaction() as cur:
+            cur.execute(SQL_SET_SETTING, (key, value))
+
+    # ---- Expenses ----
+    def _notify(self, event, user, *details):
+        for listener in self.listeners:
+            listener(event, user, *details)
+
+    # Amounts are integers in the currency's minor unit; parse user input
+    # with money.parse_amount before it gets here.
+    def add_expense(self, user, date, category, description, amount_minor, currency=None):
+        currency = currency or self.currency
+        with self.transaction() as cur:
+            cur.execute(SQL_INSERT_EXPENSE, (user, date, category, description or "", amount_minor, currency))
+            expense_id = cur.lastrowid
+        self._notify("insert", user, (expense_id, date, category, amount_minor, currency))
+        return expense_id
+
+    def add_expenses(self, rows, setting=None):
+        # rows are (user, date, category, description, amount_minor, currency)
+        # tuples; one transaction and one executemany per call keeps bulk
+        # loads fast. `setting`, a (key, value) pair, is saved in the same
+        # transaction, so a checkpoint can never disagree with what was loaded.
+        with self.transaction() as cur:
+            self._insert_batch(cur, SQL_INSERT_EXPENSE, rows)
+            if setting is not None:
+                cur.execute(SQL_SET_SETTING, setting)
+        for user in {r[0] for r in rows}:
+            self._notify("invalidate", user)
+        return len(rows)
+
+    def _insert_batch(self, cur, sql, params, rows=None):
+        # Runs an insert executemany inside the caller's transaction and
+        # returns how many rows it wrote; `rows` is how many it may write
+        # when that is not one per params entry. From SET_BASED_ROWS up, the
+        # derived-data triggers are dropped for the insert and the new rows
+        # (every id above the old maximum, as ids only grow) are folded into
+        # the rollups and search index set-wise before the triggers come
+        # back; all in the same transaction, so readers never see it half done.
+        triggers = []
+        if (len(params) if rows is None else rows) >= SET_BASED_ROWS:
+            triggers = [name for (name,) in cur.execute(SQL_DERIVED_TRIGGERS).fetchall()]
+        if not triggers:
+            # Small batch, or inside bulk_load where the triggers are gone already.
+            cur.executemany(sql, params)
+            return cur.rowcount
+        after_id = cur.execute(SQL_MAX_EXPENSE_ID).fetchone()[0]
+        for name in triggers:
+            cur.execute(f"DROP TRIGGER {name}")
+        cur.executemany(sql, params)
+        written = cur.rowcount
+        if any(name.startswith("expenses_rollup_") for name in triggers):
+            _merge_rollups(cur, "id > ?", (after_id,))
+            _install_rollup_triggers(cur)
+        if any(name.startswith("expenses_fts_") for name in triggers):
+            cur.execute(SQL_FTS_APPEND, (after_id,))
+            _install_fts_triggers(cur)
+        return written
+
+    def _delete_batch(self, cur, where, params):
+        # The set-based counterpart of _insert_batch: deletes the expenses
+        # matching `where` inside the caller's transaction, subtracting them
+        # from the rollups and search index in one pass each rather than
+        # firing the per-row triggers, and returns how many went.
+        triggers = [name for (name,) in cur.execute(SQL_DERIVED_TRIGGERS).fetchall()]
+        rollups = any(name.startswith("expenses_rollup_") for name in triggers)
+        fts = any(name.startswith("expenses_fts_") for name in triggers)
+        if rollups:
+            _merge_rollups(cur, where, params, sign=-1)
+        if fts:
+            cur.execute(SQL_FTS_REMOVE.format(where=where), params)
+        for name in triggers:
+            cur.execute(f"DROP TRIGGER {name}")
+        cur.execute(f"DELETE FROM expenses WHERE {where}", params)
+        deleted = cur.rowcount
+        if rollups:
+            _install_rollup_triggers(cur)
+        if fts:
+            _install_fts_triggers(cur)
+        return deleted
+
+    def get_expense(self, user, expense_id):
+        return self._fetchone(SQL_GET_EXPENSE, (expense_id, user))
+
+    def update_expense(self, user, expense_id, date, category, description, amount_minor, currency=None):
+        currency = currency or self.currency
+        with self.transaction() as cur:
+            cur.execute(SQL_UPDATE_EXPENSE, (date, category, description, amount_minor, currency, expense_id, user))
+            updated = cur.rowcount > 0
+        if updated:
+            self._notify("update", user, (expense_id, date, category, amount_minor, currency))
+        return updated
+
+    def delete_expense(self, user, expense_id):
+        with self.transaction() as cur:
+            cur.execute(SQL_DELETE_EXPENSE, (expense_id, user))
+            deleted = cur.rowcount > 0
+        if deleted:
+            self._notify("delete", user, expense_id)
+        return deleted
+
+    def page_expenses(self, user, sort="date", descending=True, after=None, before=None,
+                      limit=200, category=None, date=None):
+        # Returns up to `limit` rows strictly after the key `after` (or, when
+        # scrolling back up, the rows just before `before`, still in display
+        # order). Keys come from expense_key() on a previously returned row.
+        key_cols = SORT_KEYS[sort]
+        backward = before is not None
+        sql = self._page_sql(key_cols, descending != backward, category is not None,
+                             date is not None, after is not None or backward)
+        params = [user]
+        if category is not None:
+            params.append(category.strip().title())
+        if date is not None:
+            params.append(date)
+        if backward:
+            params.extend(before)
+        elif after is not None:
+            params.extend(after)
+        params.append(limit)
+        rows = self._fetchall(sql, params)
+        if backward:
+            rows.reverse()
+        return rows
+
+    @staticmethod
+    def expense_key(row, sort="date"):
+        return tuple(row[ROW_COLUMNS.index(col)] for col in SORT_KEYS[sort])
+
+    _page_sql_cache = {}
+
+    @classmethod
+    def _page_sql(cls, key_cols, descending, by_category, by_date, keyed):
+        cache_key = (key_cols, descending, by_category, by_date, keyed)
+        sql = cls._page_sql_cache.get(cache_key)
+        if sql is None:
+            where = ["user=?"]
+            if by_category:
+                where.append("category=?")
+            if by_date:
+                where.append("date=?")
+            if keyed:
+                cols = ", ".join(key_cols)
+                marks = ", ".join("?" * len(key_cols))
+                where.append(f"({cols}) {'<' if descending else '>'} ({marks})")
+            direction = " DESC" if descending else ""
+            order = ", ".join(col + direction for col in key_cols)
+            sql = (f"SELECT id, date, category, description, amount_minor, currency FROM expenses "
+                   f"WHERE {' AND '.join(where)} ORDER BY {order} LIMIT ?")
+            cls._page_sql_cache[cache_key] = sql
+        return sql
+
+    def expense_users(self):
+        return [r[0] for r in self._fetchall(SQL_USERS)]
+
+    @staticmethod
+    def _stream_params(user, start, end, category):
+        bounds = (start or "", end or "9999")
+        if category is None:
+            return (user,) + bounds
+        return (user, category.strip().title()) + bounds
+
+    @property
+    def has_fts(self):
+        if self._has_fts is None:
+            self._has_fts = self._fetchone(SQL_HAS_FTS) is not None
+        return self._has_fts
+
+    def search_expenses(self, user, text="", start=None, end=None, min_amount=None, max_amount=None,
+                        category=None, limit=100, offset=0):
+        # Every word in `text` must match, as a prefix, somewhere in the
+        # description; results are ranked by bm25 relevance. Without any
+        # words this is a plain filtered listing, newest first.
+        terms = search_terms(text)
+        where = ["e.user=?"]
+        params = [user]
+        if start or end:
+            where.append("e.date BETWEEN ? AND ?")
+            params += [start or "", end or "9999"]
+        if min_amount is not None or max_amount is not None:
+            # Bounds are minor units, compared within any currency.
+            where.append("e.amount_minor BETWEEN ? AND ?")
+            params += [min_amount if min_amount is not None else float("-inf"),
+                       max_amount if max_amount is not None else float("inf")]
+        if category:
+            where.append("e.category=?")
+            params.append(category.strip().title())
+        columns = "e.id, e.date, e.category, e.description, e.amount_minor, e.currency"
+        if terms and self.has_fts:
+            match = ("description: (" + " ".join(_fts_phrase(t) + "*" for t in terms) + ") "
+                     "AND user: " + _fts_phrase(user))
+            sql = (f"SELECT {columns} FROM expenses_fts JOIN expenses e ON e.id = expenses_fts.rowid "
+                   f"WHERE expenses_fts MATCH ? AND {' AND '.join(where)} "
+                   f"ORDER BY bm25(expenses_fts, 1.0, 0.0), e.date DESC LIMIT ? OFFSET ?")
+            params.insert(0, match)
+        else:
+            for term in terms:
+                where.append("e.description LIKE ?")
+                params.append(f"%{term}%")
+            sql = (f"SELECT {columns} FROM expenses e WHERE {' AND '.join(where)} "
+                   f"ORDER BY e.date DESC, e.id DESC LIMIT ? OFFSET ?")
+        params += [limit, offset]
+        return self._fetchall(sql, params)
+
+    def count_expenses(self, user, start=None, end=None, category=None):
+        sql = SQL_COUNT_RANGE if category is None else SQL_COUNT_RANGE_CATEGORY
+        return self._fetchone(sql, self._stream_params(user, start, end, category))[0]
+
+    def iter_expense_batches(self, user, batch_size=1000, start=None, end=None, category=None):
+        # Walks a single cursor with fetchmany, so only one batch of rows is
+        # in memory at a time however large the user's history is.
+        sql = SQL_STREAM if category is None else SQL_STREAM_CATEGORY
+        reader = self._reader()
+        lock = self.lock if reader is None else threading.Lock()
+        with lock:
+            cur = (reader or self.conn).execute(sql, self._stream_params(user, start, end, category))
+        while True:
+            with lock:
+                rows = cur.fetchmany(batch_size)
+            if not rows:
+                break
+            yield rows
+
+    def iter_expenses(self, user, batch_size=1000, start=None, end=None, category=None):
+        for rows in self.iter_expense_batches(user, batch_size, start, end, category):
+            yield from rows
+
+    # ---- Aggregates ----
+    # Every aggregate covers one currency, the store's default unless given;
+    # totals are integer minor units.
+    def total_amount(self, user, currency=None):
+        return self._fetchone(SQL_TOTAL, (user, currency or self.currency))[0] or 0
+
+    def category_totals(self, user, currency=None):
+        return self._fetchall(SQL_CATEGORY_TOTALS, (user, currency or self.currency))
+
+    # start/end are inclusive YYYY-MM-DD strings; None leaves that side open.
+    def date_totals(self, user, start=None, end=None, currency=None):
+        return self._fetchall(SQL_DATE_TOTALS, (user, currency or self.currency, start or "", end or "9999"))
+
+    def month_totals(self, user, start=None, end=None, currency=None):
+        return self._fetchall(SQL_MONTH_TOTALS, (user, currency or self.currency,
+                                                 (start or "")[:7], (end or "9999")[:7]))
+
+    def date_bounds(self, user, currency=None):
+        first, last = self._fetchone(SQL_DATE_BOUNDS, (user, currency or self.currency))
+        return (first, last) if first is not None else None
+
+    def currency_totals(self, user):
+        # (currency, total) for every currency the user has spent in.
+        return self._fetchall(SQL_CURRENCIES, (user,))
+
+    # ---- Budgets and alerts ----
+    def set_budget(self, user, category, limit_minor, currency=None):
+        # A limit of None removes the category's budget.
+        category = category.strip().title()
+        if category not in CATEGORIES:
+            raise ValueError(f"invalid category {category!r}, expected one of {', '.join(CATEGORIES)}")
+        with self.transaction() as cur:
+            if limit_minor is None:
+                cur.execute(SQL_DELETE_BUDGET, (user, category))
+            else:
+                cur.execute(SQL_SET_BUDGET, (user, category, limit_minor, currency or self.currency))
+
+    def budgets(self, user, month=None):
+        # (category, limit, spent in `month`, currency) for every budget the
+        # user has set; month is YYYY-MM and defaults to the current one. Only
+        # expenses in the budget's currency count towards it.
+        month = month or datetime.date.today().isoformat()[:7]
+        return self._fetchall(SQL_BUDGETS, (month, user))
+
+    def expense_alerts(self, user, date, category, amount_minor, currency=None, previous=None):
+        # Call right after writing an expense with these values; after an
+        # update, `previous` is its (date, category, amount_minor, currency)
+        # from before. Returns a list of (kind, message): "budget" when the
+        # write takes its category-month to BUDGET_WARN of the budget or when
+        # the month is beyond it, "spike" when the expense is far above the
+        # user's usual spend in that category.
+        category = category.strip().title()
+        currency = currency or self.currency
+        alerts = []
+        month = date[:7]
+        row = self._fetchone(SQL_BUDGET_STATUS, (f"{month} {category}", user, category, currency))
+        if row is not None:
+            limit, spent = row
+            # What the category-month had before this write.
+            before = spent - amount_minor
+            if previous is not None:
+                old_date, old_category, old_amount, old_currency = previous
+                if (old_date[:7], old_category.strip().title(), old_currency or self.currency) == \
+                        (month, category, currency):
+                    before += old_amount
+            shown = f"{format_amount(spent, currency)} of {format_amount(limit, currency)}"
+            if spent > limit:
+                alerts.append(("budget", f"{category} is over its {month} budget: {shown}."))
+            elif spent >= limit * BUDGET_WARN > before:
+                alerts.append(("budget", f"{category} has used {spent / limit:.0%} of its {month} budget ({shown})."))
+        row = self._fetchone(SQL_CATEGORY_STATS, (user, currency, category))
+        if row is not None:
+            # Mean and spread of the other expenses in the category.
+            total, count = row[0] - amount_minor, row[1] - 1
+            sumsq = row[2] - float(amount_minor) * amount_minor
+            if count >= SPIKE_MIN_COUNT:
+                mean = total / count
+                std = math.sqrt(max(sumsq / count - mean * mean, 0.0))
+                if amount_minor > mean + SPIKE_SIGMAS * std and amount_minor > mean * 1.5:
+                    alerts.append(("spike", f"{format_amount(amount_minor, currency)} is unusually large for "
+                                            f"{category} (typical {format_amount(round(mean), currency)} "
+                                            f"± {format_amount(round(std), currency)})."))
+        return alerts
+
+    # ---- Recurring expenses ----
+    def add_recurring(self, user, category, description, amount_minor, schedule, start_date, end_date=None,
+                      currency=None):
+        # schedule is a recurring.py schedule ("1 * *", "@weekly", ...);
+        # dates are YYYY-MM-DD. Raises ValueError for a bad schedule or dates
+        # and for a rule that would never fire. Occurrences already due are
+        # written by the next materialize_recurring call.
+        parsed = parse_schedule(schedule)
+        start = datetime.date.fromisoformat(start_date)
+        end = datetime.date.fromisoformat(end_date) if end_date else None
+        first = next_occurrence(parsed, start - datetime.timedelta(days=1), end)
+        if first is None:
+            raise ValueError(f"schedule {parsed.text!r} has no dates from {start_date}"
+                             + (f" to {end_date}" if end_date else ""))
+        with self.transaction() as cur:
+            cur.execute(SQL_ADD_RULE, (user, category.strip().title(), description or "", amount_minor,
+                                       currency or self.currency, parsed.text, start_date, end_date,
+                                       first.isoformat()))
+            return cur.lastrowid
+
+    def recurring_rules(self, user):
+        # (id, category, description, amount_minor, currency, schedule,
+        # start_date, end_date, next_date) per rule; next_date is None once
+        # the rule has finished.
+        return self._fetchall(SQL_RULES, (user,))
+
+    def delete_recurring(self, user, rule_id):
+        # Stops the rule; expenses it already created are kept.
+        with self.transaction() as cur:
+            cur.execute(SQL_DELETE_RULE, (rule_id, user))
+            return cur.rowcount > 0
+
+    def materialize_recurring(self, today=None):
+        # Writes every occurrence of every rule due on or before `today`
+        # (a datetime.date, default today) and moves each rule's next_date
+        # past it, all in one transaction. Returns the number of expenses
+        # created. Safe to call as often as you like: with nothing due it is
+        # one indexed lookup, and occurrences are never written twice.
+        today = today or datetime.date.today()
+        with self.transaction() as cur:
+            due = cur.execute(SQL_DUE_RULES, (today.isoformat(),)).fetchall()
+            if not due:
+                return 0
+            batches, advanced, users = [], [], set()
+            occurring = 0
+            for rule_id, user, schedule, end_date, next_date in due:
+                parsed = parse_schedule(schedule)
+                end = datetime.date.fromisoformat(end_date) if end_date else None
+                dates = [when.isoformat() for when in
+                         occurrences(parsed, datetime.date.fromisoformat(next_date), min(today, end) if end else today)]
+                if dates:
+                    batches.append((json.dumps(dates), rule_id))
+                    occurring += len(dates)
+                    users.add(user)
+                following = next_occurrence(parsed, today, end)
+                advanced.append((following.isoformat() if following else None, rule_id))
+            written = self._insert_batch(cur, SQL_INSERT_OCCURRENCES, batches, occurring) if batches else 0
+            cur.executemany(SQL_ADVANCE_RULE, advanced)
+        for user in users:
+            self._notify("invalidate", user)
+        return written
+
+    # ---- Backups and maintenance ----
+    def backup(self, dest, progress=None):
+        # Online snapshot into `dest` through SQLite's backup API, followed
+        # by a copy of every archive file named as archive() would name it
+        # next to dest (bytebank-backup-archive-2019.db, ...), so the set
+        # restores together. Each copy runs on a connection of its own inside
+        # one read transaction, so under WAL the store keeps writing meanwhile
+        # and the snapshot is the database exactly as it was when the backup
+        # started (without that, every write in between would restart the
+        # copy). The archives are copied after the database: a year archived
+        # while the backup runs is then in both copies, never in neither.
+        # progress(pages_done, pages_total) runs between steps of each file;
+        # an exception from it (such as background.Cancelled) abandons the
+        # copy. Every file is written to its name + ".part" and renamed, so
+        # none is ever half written. Returns the total size.
+        if os.path.abspath(dest) == os.path.abspath(self.path):
+            raise ValueError("cannot back up a database over itself")
+        size = _backup_file(self._connect(), dest, progress)
+        stem = os.path.splitext(dest)[0]
+        for year in self.archive_years():
+            source = sqlite3.connect(self._archive_path(year), isolation_level=None)
+            size += _backup_file(source, f"{stem}{ARCHIVE_INFIX}{year}.db", progress)
+        return size
+
+    def maintain(self, max_pages=MAINTENANCE_PAGES):
+        # Periodic upkeep, run hourly by the GUI and the service: gives up to
+        # max_pages free pages back to the filesystem when the database is in
+        # incremental auto-vacuum mode (created by this version, or compacted
+        # once) and refreshes planner statistics that have gone stale.
+        # Returns the number of pages freed.
+        freed = 0
+        with self.lock:
+            if self.conn.execute("PRAGMA auto_vacuum").fetchone()[0] == AUTO_VACUUM_INCREMENTAL:
+                free = self.conn.execute("PRAGMA freelist_count").fetchone()[0]
+                if free:
+                    # executescript steps the pragma to completion; execute
+                    # would stop after the first page.
+                    self.conn.executescript(f"PRAGMA incremental_vacuum({min(free, max_pages)})")
+                    freed = free - self.conn.execute("PRAGMA freelist_count").fetchone()[0]
+            self.conn.execute(f"PRAGMA analysis_limit={ANALYSIS_LIMIT}")
+            self.conn.execute("PRAGMA optimize")
+        return freed
+
+    def compact(self):
+        # Full VACUUM: rewrites the file without free pages and in page
+        # order, and moves a database that predates incremental auto-vacuum
+        # over to it so maintain() keeps it compact from then on; then a full
+        # ANALYZE. Needs free disk space about the size of the database and
+        # holds off every write until done, so it is left to the CLI.
+        # Returns (bytes before, bytes after).
+        with self.lock:
+            before = os.path.getsize(self.path)
+            self.conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+            self.conn.execute("VACUUM")
+            self.conn.execute("PRAGMA analysis_limit=0")
+            self.conn.execute("ANALYZE")
+            self.conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+            return before, os.path.getsize(self.path)
+
+    # ---- Archives ----
+    def _archive_path(self, year):
+        return f"{os.path.splitext(self.path)[0]}{ARCHIVE_INFIX}{year}.db"
+
+    def archive_years(self):
+        # Years that have an archive file, oldest first.
+        stem = os.path.basename(os.path.splitext(self.path)[0])
+        pattern = re.compile(re.escape(stem + ARCHIVE_INFIX) + r"(\d{4})\.db$")
+        folder = os.path.dirname(os.path.abspath(self.path))
+        return sorted(int(m.group(1)) for m in map(pattern.match, os.listdir(folder)) if m)
+
+    def archive(self, older_than, today=None, progress=None):
+        # Moves every calendar year whose expenses are all more than
+        # `older_than` years old into its archive file, oldest first, and
+        # returns [(year, expenses moved)]. Archived expenses leave the
+        # rollups, so totals, charts and budgets cover the years kept;
+        # iter_history_batches() and count_history() read everything.
+        # progress(done, total, message) runs before each year.
+        if older_than < 1:
+            raise ValueError("older_than must be at least one year")
+        today = today or datetime.date.today()
+        years = [int(y) for (y,) in self._fetchall(SQL_ARCHIVE_YEARS, (str(today.year - older_than),))]
+        moved = []
+        try:
+            for done, year in enumerate(years):
+                if progress is not None:
+                    progress(done, len(years), f"Archiving {year}")
+                moved.append((year, self._archive_year(year)))
+        finally:
+            if moved:
+                self._notify("invalidate", None)
+        return moved
+
+    def _archive_year(self, year):
+        path = self._archive_path(year)
+        _create_archive(path)
+        bounds = (str(year), str(year + 1))
+        with self.lock:
+            # ATTACH and DETACH cannot run inside a transaction.
+            self.conn.execute("ATTACH DATABASE ? AS archive", (path,))
+            try:
+                # Two transactions, as with the main database in WAL mode one
+                # spanning both files would not be atomic anyway. The copy
+                # commits first, so an interruption leaves the year in both
+                # files, never in neither, and archiving again finishes it.
+                with self.transaction() as cur:
+                    cur.execute(SQL_ARCHIVE_COPY, bounds)
+                with self.transaction() as cur:
+                    return self._delete_batch(cur, "date >= ? AND date < ?", bounds)
+            finally:
+                self.conn.execute("DETACH DATABASE archive")
+
+    def _history_groups(self, start, end):
+        # Yields connections whose TEMP VIEW all_expenses covers main and up
+        # to ATTACH_LIMIT of the archives overlapping [start, end], newest
+        # years first. Main's rows are split by the same year bounds, so every
+        # expense is in exactly one group and each group's dates all follow
+        # the next group's; per-group date order concatenates into one.
+        years = [y for y in reversed(self.archive_years())
+                 if (start or "") < str(y + 1) and str(y) <= (end or "9999")]
+        groups = [years[i:i + ATTACH_LIMIT] for i in range(0, len(years), ATTACH_LIMIT)] or [[]]
+        upper = None
+        for n, group in enumerate(groups):
+            lower = str(group[-1]) if n < len(groups) - 1 else None
+            conn = self._connect()
+            try:
+                for i, year in enumerate(group):
+                    conn.execute(f"ATTACH DATABASE ? AS a{i}", (self._archive_path(year),))
+                conn.execute(_history_view(group, lower, upper))
+                yield conn
+            finally:
+                conn.close()
+            upper = lower
+
+    def count_history(self, user, start=None, end=None, category=None):
+        sql = SQL_HISTORY_COUNT if category is None else SQL_HISTORY_COUNT_CATEGORY
+        params = self._stream_params(user, start, end, category)
+        return sum(conn.execute(sql, params).fetchone()[0] for conn in self._history_groups(start, end))
+
+    def iter_history_batches(self, user, batch_size=1000, start=None, end=None, category=None):
+        # iter_expense_batches over all history, archived years included.
+        sql = SQL_HISTORY_STREAM if category is None else SQL_HISTORY_STREAM_CATEGORY
+        params = self._stream_params(user, start, end, category)
+        for conn in self._history_groups(start, end):
+            cur = conn.execute(sql, params)
+            while True:
+                rows = cur.fetchmany(batch_size)
+                if not rows:
+                    break
+                yield rows
+
+    # ---- Category rules ----
+    def add_category_rule(self, user, kind, pattern, category):
+        pattern = check_rule(kind, pattern)
+        category = category.strip().title()
+        if category not in CATEGORIES:
+            raise ValueError(f"invalid category {category!r}, expected one of {', '.join(CATEGORIES)}")
+        with self.transaction() as cur:
+            cur.execute(SQL_ADD_CATEGORY_RULE, (user, kind, pattern, category))
+
+    def category_rules(self, user):
+        # (id, kind, pattern, category), oldest first.
+        return self._fetchall(SQL_CATEGORY_RULES, (user,))
+
+    def delete_category_rule(self, user, rule_id):
+        with self.transaction() as cur:
+            cur.execute(SQL_DELETE_CATEGORY_RULE, (rule_id, user))
+            return cur.rowcount > 0
+
+    def description_categories(self, user):
+        # (description, category, count) over the user's history, what
+        # categorize.Categorizer learns from.
+        return self._fetchall(SQL_DESCRIPTION_CATEGORIES, (user,))
+
+    def recategorize(self, user, categorize, only=None):
+        # Relabels the user's expenses (just those now in category `only`,
+        # when given) with categorize(description), which returns a category
+        # or None to leave the expense as it is; returns how many changed.
+        # Each distinct description is categorized once. One transaction:
+        # from SET_BASED_ROWS changes up, the changed rows leave the rollups,
+        # are relabelled and go back in set-wise rather than through the
+        # per-row update trigger.
+        with self.transaction() as cur:
+            if only is None:
+                descriptions = cur.execute(SQL_DISTINCT_DESCRIPTIONS, (user,)).fetchall()
+            else:
+                only = only.strip().title()
+                descriptions = cur.execute(SQL_DISTINCT_DESCRIPTIONS_CATEGORY, (user, only)).fetchall()
+            labels = []
+            for (description,) in descriptions:
+                category = categorize(description)
+                if category in CATEGORIES:
+                    labels.append((description, category))
+            cur.execute("DROP TABLE IF EXISTS temp.recategorized")
+            cur.execute("DROP TABLE IF EXISTS temp.recategorized_ids")
+            cur.execute("CREATE TEMP TABLE recategorized (description TEXT PRIMARY KEY, category TEXT NOT NULL)")
+            cur.executemany("INSERT INTO temp.recategorized VALUES (?, ?)", labels)
+            sql, params = SQL_RECATEGORIZE_IDS, (user,)
+            if only is not None:
+                sql, params = sql + " AND e.category = ?", (user, only)
+            cur.execute(sql, params)
+            changed = cur.execute("SELECT COUNT(*) FROM temp.recategorized_ids").fetchone()[0]
+            rollups = changed >= SET_BASED_ROWS and any(
+                name == "expenses_rollup_update" for (name,) in cur.execute(SQL_DERIVED_TRIGGERS).fetchall())
+            where = "id IN (SELECT id FROM temp.recategorized_ids)"
+            if rollups:
+                _merge_rollups(cur, where, (), sign=-1)
+                cur.execute("DROP TRIGGER expenses_rollup_update")
+            cur.execute(SQL_RECATEGORIZE)
+            if rollups:
+                _merge_rollups(cur, where, ())
+                _install_rollup_triggers(cur)
+            cur.execute("DROP TABLE temp.recategorized")
+            cur.execute("DROP TABLE temp.recategorized_ids")
+        if changed:
+            self._notify("invalidate", user)
+        return changed
+
+    # ---- Rollup maintenance ----
+    def rebuild_rollups(self, user=None):
+        with self.transaction() as cur:
+            # Dates the rollups cannot key by calendar day are fixed first.
+            _migrate_iso_dates(cur)
+            _fill_rollups(cur, user)
+
+    def verify_rollups(self):
+        # Recomputes every group from expenses and returns the ones whose
+        # stored (total, count) differ: (table, user, key, expected, stored).
+        # Totals are integers, so any difference at all is drift.
+        drift = []
+        for table, key, expr in ROLLUPS:
+            value = expr.format(row="expenses")
+            fresh = (f"SELECT user, currency, {value} AS {key}, SUM(amount_minor) AS total, COUNT(*) AS count "
+                     f"FROM expenses GROUP BY user, currency, {value}")
+            join = f"r.user = f.user AND r.currency = f.currency AND r.{key} = f.{key}"
+            rows = self._fetchall(f"""
+                SELECT f.user, f.currency, f.{key}, f.total, f.count, r.total, r.count
+                FROM ({fresh}) f LEFT JOIN {table} r ON {join}
+                WHERE r.count IS NULL OR r.count != f.count OR r.total != f.total
+                UNION ALL
+                SELECT r.user, r.currency, r.{key}, NULL, NULL, r.total, r.count
+                FROM {table} r LEFT JOIN ({fresh}) f ON {join}
+                WHERE f.count IS NULL
+            """)
+            for user, currency, group, total, count, r_total, r_count in rows:
+                drift.append((table, user, f"{currency} {group}", (total, count), (r_total, r_count)))
+        # Comparing against the same key expression cannot see a key built
+        # from a malformed date (2024-1-5 gives the month "2024-1-"), so day
+        # and month keys are also checked for their calendar shape.
+        for table, key, pattern in ROLLUP_KEY_SHAPES:
+            for user, currency, group, total, count in self._fetchall(
+                    f"SELECT user, currency, {key}, total, count FROM {table} WHERE {key} NOT GLOB ?", (pattern,)):
+                drift.append((table, user, f"{currency} {group}", "a calendar date key", (total, count)))
+        return drift
+
+
+# ---------------- Shared instance ----------------
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_store(path=DB_NAME):
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = ExpenseStore(path)
+        return _store
+
+
+def close_store():
+    global _store
+    with _store_lock:
+        if _store is not None:
+            _store.close()
+            _store = None
+
+
+atexit.register(close_store)
+
+
+# ---------------- CLI ----------------
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="ByteBank database maintenance.")
+    parser.add_argument("--db", default=DB_NAME, help="database file (default: %(default)s)")
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("migrate", help="bring the schema up to date")
+    verify = commands.add_parser("verify-rollups", help="check summary tables against expenses")
+    verify.add_argument("--fix", action="store_true", help="rebuild the rollups if drift is found")
+    commands.add_parser("rebuild-rollups", help="recompute summary tables from expenses")
+    currency = commands.add_parser("currency", help="show or set the default currency for new expenses and totals")
+    currency.add_argument("code", nargs="?", help="ISO 4217 code, e.g. INR or USD")
+    recurring = commands.add_parser("recurring", help="write every recurring expense that has fallen due")
+    recurring.add_argument("--today", type=datetime.date.fromisoformat, help="catch up to this date (YYYY-MM-DD)")
+    rules = commands.add_parser("rules", help="list, add or remove a user's auto-categorization rules")
+    rules.add_argument("--user", required=True)
+    rules.add_argument("--add", nargs=2, metavar=("PATTERN", "CATEGORY"),
+                       help="keyword, merchant* or /regex/ and the category it means")
+    rules.add_argument("--delete", type=int, metavar="ID", help="remove a rule by its id")
+    recategorize = commands.add_parser("recategorize", help="apply a user's rules to the expenses already stored")
+    recategorize.add_argument("--user", required=True)
+    recategorize.add_argument("--only", metavar="CATEGORY", help="only relabel expenses now in this category")
+    recategorize.add_argument("--learn", action="store_true",
+                              help="also use what the user's history says where no rule matches")
+    backup = commands.add_parser("backup", help="copy the database to a file while it stays in use")
+    backup.add_argument("dest", help="backup file to write")
+    commands.add_parser("maintain", help="return some free space to the filesystem and refresh statistics")
+    commands.add_parser("compact", help="rewrite the database without free space (blocks writes while it runs)")
+    archive = commands.add_parser("archive", help="move old years of expenses into per-year archive files")
+    archive.add_argument("--older-than", type=int, required=True, metavar="YEARS",
+                         help="archive each year whose expenses are all more than this many years old")
+    args = parser.parse_args(argv)
+
+    store = get_store(args.db)
+    if args.command == "migrate":
+        version = store.conn.execute("PRAGMA user_version").fetchone()[0]
+        print(f"{args.db}: schema version {version}")
+    elif args.command == "rebuild-rollups":
+        store.rebuild_rollups()
+        print("Rollups rebuilt.")
+    elif args.command == "currency":
+        if args.code:
+            store.set_setting("currency", normalize_currency(args.code))
+        print(f"Default currency: {store.get_setting('currency', DEFAULT_CURRENCY)}")
+    elif args.command == "recurring":
+        started = time.perf_counter()
+        created = store.materialize_recurring(args.today)
+        print(f"{created} recurring expenses written in {time.perf_counter() - started:.2f}s.")
+    elif args.command == "rules":
+        if args.add:
+            try:
+                kind, pattern = parse_rule(args.add[0])
+                store.add_category_rule(args.user, kind, pattern, args.add[1])
+            except ValueError as e:
+                print(e, file=sys.stderr)
+                return 1
+        if args.delete is not None and not store.delete_category_rule(args.user, args.delete):
+            print(f"No rule {args.delete}.", file=sys.stderr)
+            return 1
+        for rule_id, kind, pattern, category in store.category_rules(args.user):
+            print(f"{rule_id:5}  {rule_text(kind, pattern)} -> {category}")
+    elif args.command == "recategorize":
+        started = time.perf_counter()
+        categorizer = Categorizer.for_user(store, args.user, args.learn)
+        changed = store.recategorize(args.user, categorizer.categorize, args.only)
+        print(f"{changed} expenses recategorized in {time.perf_counter() - started:.2f}s.")
+    elif args.command == "backup":
+        started = time.perf_counter()
+        size = store.backup(args.dest)
+        print(f"Backed up {size / 1e6:.1f} MB to {args.dest} in {time.perf_counter() - started:.2f}s.")
+        years = store.archive_years()
+        if years:
+            print(f"Archived years {', '.join(map(str, years))} copied alongside it.")
+    elif args.command == "maintain":
+        print(f"{store.maintain()} free pages released.")
+    elif args.command == "compact":
+        before, after = store.compact()
+        print(f"{args.db}: {before / 1e6:.1f} MB -> {after / 1e6:.1f} MB")
+    elif args.command == "archive":
+        moved = store.archive(args.older_than)
+        for year, count in moved:
+            print(f"{year}: {count} expenses -> {store._archive_path(year)}")
+        if not moved:
+            print("Nothing old enough to archive.")
+    elif args.command == "verify-rollups":
+        drift = store.verify_rollups()
+        for table, user, group, expected, stored in drift[:50]:
+            print(f"{table}: {user} / {group}: expected {expected}, stored {stored}")
+        if not drift:
+            print("Rollups consistent.")
+            return 0
+        print(f"{len(drift)} drifted groups.")
+        if args.fix:
+            store.rebuild_rollups()
+            print("Rollups rebuilt.")
+            return 0
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,10 @@
+import pytest
+
+from store import ExpenseStore
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = ExpenseStore(str(tmp_path / "bytebank.db"))
+    yield store
+    store.close()
@@ -0,0 +1,44 @@
+import pytest
+
+
+def test_budget_needs_a_known_category(store):
+    store.set_budget("ann", " food ", 50000)
+    assert [row[0] for row in store.budgets("ann")] == ["Food"]
+    for category in ("Foo", "", "Food2"):
+        with pytest.raises(ValueError):
+            store.set_budget("ann", category, 50000)
+        with pytest.raises(ValueError):
+            store.set_budget("ann", category, None)
+    assert [row[0] for row in store.budgets("ann")] == ["Food"]
+    store.set_budget("ann", "FOOD", None)
+    assert store.budgets("ann") == []
+
+
+def budget_alerts(store, *args, **kwargs):
+    return [message for kind, message in store.expense_alerts("ann", *args, **kwargs) if kind == "budget"]
+
+
+def test_warning_only_when_the_write_crosses_the_threshold(store):
+    store.set_budget("ann", "Food", 12000)
+    expense_id = store.add_expense("ann", "2024-05-03", "Food", "x", 10000)
+    assert budget_alerts(store, "2024-05-03", "Food", 10000) == [
+        "Food has used 83% of its 2024-05 budget (100.00 of 120.00)."]
+    # Already past 80% before the edit: no second warning.
+    store.update_expense("ann", expense_id, "2024-05-03", "Food", "x", 10100)
+    assert budget_alerts(store, "2024-05-03", "Food", 10100, previous=("2024-05-03", "Food", 10000, "INR")) == []
+    # Edited down below the threshold and back up across it.
+    store.update_expense("ann", expense_id, "2024-05-03", "Food", "x", 5000)
+    assert budget_alerts(store, "2024-05-03", "Food", 5000, previous=("2024-05-03", "Food", 10100, "INR")) == []
+    store.update_expense("ann", expense_id, "2024-05-03", "Food", "x", 9900)
+    assert len(budget_alerts(store, "2024-05-03", "Food", 9900, previous=("2024-05-03", "Food", 5000, "INR"))) == 1
+
+
+def test_update_moving_into_the_month_counts_in_full(store):
+    store.set_budget("ann", "Food", 12000)
+    expense_id = store.add_expense("ann", "2024-04-30", "Food", "x", 10000)
+    store.update_expense("ann", expense_id, "2024-05-01", "Food", "x", 10000)
+    assert len(budget_alerts(store, "2024-05-01", "Food", 10000, previous=("2024-04-30", "Food", 10000, "INR"))) == 1
+    other = store.add_expense("ann", "2024-05-02", "Bills", "x", 5000)
+    store.update_expense("ann", other, "2024-05-02", "Food", "x", 5000)
+    assert budget_alerts(store, "2024-05-02", "Food", 5000, previous=("2024-05-02", "Bills", 5000, "INR")) == [
+        "Food is over its 2024-05 budget: 150.00 of 120.00."]
@@ -0,0 +1,51 @@
+from datetime import date
+
+import pytest
+
+np = pytest.importorskip("numpy")
+pytest.importorskip("matplotlib")
+
+from charts import load_series  # noqa: E402
+
+
+@pytest.fixture
+def spend(store):
+    # 100 on every day of 2024, 1000 on the 1st of each month.
+    rows = []
+    for month in range(1, 13):
+        for day in range(1, 32):
+            try:
+                when = date(2024, month, day).isoformat()
+            except ValueError:
+                break
+            rows.append(("ann", when, "Food", "x", 1100 if day == 1 else 100, "INR"))
+    store.add_expenses(rows)
+    return store
+
+
+def month_series(store, start, end, bucket="month"):
+    left, _, totals = load_series(store, "ann", date.fromisoformat(start), date.fromisoformat(end), bucket)
+    return [str(d) for d in left], totals.tolist()
+
+
+def test_partial_edge_months_count_only_the_days_in_range(spend):
+    # 17 days of January, all of February, 10 days of March.
+    assert month_series(spend, "2024-01-15", "2024-03-10") == (
+        ["2024-01-01", "2024-02-01", "2024-03-01"], [1700, 1000 + 29 * 100, 1000 + 10 * 100])
+
+
+def test_range_inside_one_month(spend):
+    assert month_series(spend, "2024-05-02", "2024-05-04") == (["2024-05-01"], [300])
+    assert month_series(spend, "2024-05-01", "2024-05-31") == (["2024-05-01"], [1000 + 31 * 100])
+
+
+def test_year_buckets_match_the_daily_sum(spend):
+    _, totals = month_series(spend, "2024-02-10", "2024-11-20", "year")
+    days = spend.date_totals("ann", "2024-02-10", "2024-11-20")
+    assert totals == [sum(total for _, total in days)]
+
+
+def test_edge_month_without_spend_in_range(store):
+    store.add_expense("ann", "2024-01-02", "Food", "x", 500)
+    store.add_expense("ann", "2024-02-20", "Food", "x", 700)
+    assert month_series(store, "2024-01-10", "2024-02-15") == ([], [])
@@ -0,0 +1,27 @@
+import csv
+import gzip
+import os
+
+from exporter import main
+from store import close_store
+
+
+def test_all_users_get_their_own_file(store, tmp_path):
+    users = ["a b", "a_b", "a.b", "Ann", "ann", "bob"]
+    for i, user in enumerate(users):
+        store.add_expense(user, "2024-01-05", "Food", user, 100 + i)
+    out = tmp_path / "exports"
+    try:
+        assert main(["--all-users", "--out", str(out), "--db", store.path]) == 0
+    finally:
+        close_store()
+    files = os.listdir(out)
+    assert len(files) == len(users)
+    assert len({name.lower() for name in files}) == len(users)
+    assert any(name.startswith("bytebank-bob-") for name in files)
+    exported = set()
+    for name in files:
+        with gzip.open(out / name, "rt", newline="") as fp:
+            rows = list(csv.reader(fp))[1:]
+        exported.update(row[3] for row in rows)
+    assert exported == set(users)
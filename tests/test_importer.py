@@ -0,0 +1,134 @@
+import io
+import json
+
+import pytest
+
+import importer
+from importer import ImportFormatError, iter_json_objects, migrate_json, main
+from store import close_store
+
+
+def records(count):
+    # Every tenth record has an amount that cannot be parsed.
+    return [{"Date": f"2024-{i % 12 + 1:02d}-{i % 28 + 1:02d}", "Category": "Food",
+             "Description": f"café \"{i}\" " + "x" * (i % 40), "Amount": "n/a" if i % 10 == 9 else i + 0.5}
+            for i in range(count)]
+
+
+class Interrupt(Exception):
+    pass
+
+
+def interrupt_after(batches):
+    calls = []
+
+    def progress(report):
+        calls.append(report)
+        if len(calls) == batches:
+            raise Interrupt()
+    return progress
+
+
+# ---------------- Incremental JSON ----------------
+@pytest.mark.parametrize("chunk_size", [1, 7, 64, 4096])
+def test_objects_across_chunks_and_resume(chunk_size):
+    data = records(300)
+    text = json.dumps(data, indent=1)
+    decoded = list(iter_json_objects(io.StringIO(text), chunk_size))
+    assert [obj for obj, _ in decoded] == data
+    end = decoded[149][1]
+    assert [obj for obj, _ in iter_json_objects(io.StringIO(text), chunk_size, end)] == data[150:]
+
+
+def test_malformed_element_reports_offset_without_reading_on():
+    text = json.dumps(records(2000))
+    bad = text.index('"Date"', 500)
+    text = text[:bad] + "Date" + text[bad + 6:]
+
+    class Counting(io.StringIO):
+        reads = 0
+
+        def read(self, size=-1):
+            Counting.reads += 1
+            return super().read(size)
+
+    with pytest.raises(ImportFormatError, match=f"offset {bad}:"):
+        list(iter_json_objects(Counting(text), 256))
+    assert Counting.reads <= bad // 256 + 2
+
+
+@pytest.mark.parametrize("text", ["", "{}", "[1, 2", "[{\"a\": 1}"])
+def test_not_an_array(text):
+    with pytest.raises(ImportFormatError):
+        list(iter_json_objects(io.StringIO(text)))
+
+
+# ---------------- Migration ----------------
+@pytest.fixture
+def legacy(tmp_path):
+    path = tmp_path / "expenses.json"
+    path.write_text(json.dumps(records(250)), encoding="utf-8")
+    return str(path)
+
+
+def test_migration_resumes_where_it_stopped(store, legacy):
+    with pytest.raises(Interrupt):
+        migrate_json(store, "ann", legacy, batch_size=40, progress=interrupt_after(2))
+    assert store.count_expenses("ann") == 80
+    report, resumed, resumed_failed = migrate_json(store, "ann", legacy, batch_size=40)
+    # 250 records, 25 of them rejected: 8 by the interrupted run, the rest
+    # by this one, and nothing is imported twice.
+    assert (resumed, resumed_failed) == (88, 8)
+    assert (report.imported, report.failed, len(report.errors)) == (145, 17, 17)
+    assert store.count_expenses("ann") == 225
+    descriptions = [row[0] for row in store.conn.execute("SELECT description FROM expenses ORDER BY id")]
+    assert descriptions == [r["Description"].strip() for r in records(250) if r["Amount"] != "n/a"]
+    assert store.verify_rollups() == []
+
+
+def test_finished_migration_imports_nothing(store, legacy):
+    migrate_json(store, "ann", legacy)
+    report, resumed, resumed_failed = migrate_json(store, "ann", legacy)
+    assert (report.imported, report.failed, resumed, resumed_failed) == (0, 0, 250, 25)
+    assert store.count_expenses("ann") == 225
+
+
+def test_restart_and_guards(store, legacy, tmp_path):
+    with pytest.raises(Interrupt):
+        migrate_json(store, "ann", legacy, batch_size=40, progress=interrupt_after(1))
+    with pytest.raises(ImportFormatError, match="another|already"):
+        migrate_json(store, "bob", legacy)
+    with open(legacy, "a", encoding="utf-8") as fp:
+        fp.write("\n")
+    with pytest.raises(ImportFormatError, match="changed"):
+        migrate_json(store, "ann", legacy)
+    report, resumed, resumed_failed = migrate_json(store, "ann", legacy, restart=True)
+    assert (report.imported, resumed, resumed_failed) == (225, 0, 0)
+
+
+def test_malformed_file_keeps_what_came_before(store, tmp_path):
+    path = tmp_path / "expenses.json"
+    text = json.dumps(records(100))
+    cut = text.index("{", 1000)
+    path.write_text(text[:cut] + "{oops" + text[cut + 1:], encoding="utf-8")
+    with pytest.raises(ImportFormatError):
+        migrate_json(store, "ann", str(path), batch_size=1000)
+    saved = json.loads(store.get_setting(importer.CHECKPOINT_PREFIX + str(path)))
+    assert saved["records"] > 0
+    assert saved["records"] == store.count_expenses("ann") + saved["failed"]
+    assert not saved["done"]
+
+
+def test_cli_reports_earlier_and_current_rejections_apart(store, legacy, capsys, monkeypatch):
+    with pytest.raises(Interrupt):
+        migrate_json(store, "ann", legacy, batch_size=40, progress=interrupt_after(2))
+    monkeypatch.setattr(importer, "MAX_REPORTED_ERRORS", 10)
+    try:
+        assert main([legacy, "--user", "ann", "--migrate", "--db", store.path]) == 1
+    finally:
+        close_store()
+    out, err = capsys.readouterr()
+    assert "88 records were handled by an earlier run (8 of them rejected)" in out
+    assert "Imported 145 rows, 17 rejected" in out
+    assert err.count("invalid amount") == 10
+    assert "... 7 more errors" in err
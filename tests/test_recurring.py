@@ -0,0 +1,110 @@
+from datetime import date
+
+import pytest
+
+from recurring import parse_schedule, occurrences, next_occurrence
+
+
+def dates(schedule, start, end):
+    return [d.isoformat() for d in occurrences(parse_schedule(schedule), date.fromisoformat(start),
+                                               date.fromisoformat(end))]
+
+
+# ---------------- Schedules ----------------
+def test_last_day_of_month():
+    assert dates("L * *", "2024-01-01", "2024-04-30") == ["2024-01-31", "2024-02-29", "2024-03-31", "2024-04-30"]
+
+
+def test_day_past_month_end_is_skipped():
+    assert dates("31 * *", "2024-01-01", "2024-05-31") == ["2024-01-31", "2024-03-31", "2024-05-31"]
+
+
+def test_lists_names_and_steps():
+    assert dates("15 1,7 *", "2024-01-01", "2025-01-31") == ["2024-01-15", "2024-07-15", "2025-01-15"]
+    assert dates("15 JAN,JUL *", "2024-01-01", "2024-12-31") == ["2024-01-15", "2024-07-15"]
+    assert dates("*/14 * *", "2024-02-01", "2024-03-31") == ["2024-02-01", "2024-02-15", "2024-02-29",
+                                                            "2024-03-01", "2024-03-15", "2024-03-29"]
+    assert dates("* * MON-FRI", "2024-06-08", "2024-06-16") == ["2024-06-10", "2024-06-11", "2024-06-12",
+                                                                "2024-06-13", "2024-06-14"]
+
+
+def test_both_day_fields_match_either():
+    # As in cron: the 1st, and every Sunday.
+    assert dates("1 * SUN", "2024-09-01", "2024-09-30") == ["2024-09-01", "2024-09-08", "2024-09-15",
+                                                           "2024-09-22", "2024-09-29"]
+
+
+def test_aliases():
+    assert parse_schedule("@monthly") == parse_schedule("1 * *")._replace(text="@monthly")
+    assert dates("@weekly", "2024-06-01", "2024-06-30") == ["2024-06-02", "2024-06-09", "2024-06-16",
+                                                           "2024-06-23", "2024-06-30"]
+    assert dates("* * 7", "2024-06-01", "2024-06-10") == dates("* * 0", "2024-06-01", "2024-06-10")
+
+
+@pytest.mark.parametrize("text", ["1 *", "32 * *", "1 13 *", "1 * FUNDAY", "*/0 * *", "L/2 * *"])
+def test_invalid_schedules(text):
+    with pytest.raises(ValueError):
+        parse_schedule(text)
+
+
+def test_next_occurrence():
+    monthly = parse_schedule("1 * *")
+    assert next_occurrence(monthly, date(2024, 1, 1)) == date(2024, 2, 1)
+    assert next_occurrence(monthly, date(2023, 12, 31)) == date(2024, 1, 1)
+    assert next_occurrence(monthly, date(2024, 1, 1), until=date(2024, 1, 31)) is None
+    assert next_occurrence(parse_schedule("31 2 *"), date(2024, 1, 1)) is None
+
+
+# ---------------- Materialization ----------------
+def recurring_expenses(store, user="ann"):
+    return store.conn.execute("SELECT date, category, amount_minor, recurring_id FROM expenses WHERE user=? "
+                              "ORDER BY date", (user,)).fetchall()
+
+
+def test_materialize_catches_up_once(store):
+    rule = store.add_recurring("ann", "bills", "Rent", 1500000, "1 * *", "2024-01-15")
+    assert store.recurring_rules("ann")[0][-1] == "2024-02-01"
+    assert store.materialize_recurring(date(2024, 4, 10)) == 3
+    assert recurring_expenses(store) == [(d, "Bills", 1500000, rule) for d in ("2024-02-01", "2024-03-01", "2024-04-01")]
+    assert store.materialize_recurring(date(2024, 4, 10)) == 0
+    assert store.materialize_recurring(date(2024, 4, 30)) == 0
+    assert store.materialize_recurring(date(2024, 5, 1)) == 1
+    assert store.recurring_rules("ann")[0][-1] == "2024-06-01"
+    assert len(recurring_expenses(store)) == 4
+    assert store.verify_rollups() == []
+
+
+def test_materialize_is_idempotent_when_rerun(store):
+    # A catch-up interrupted before next_date was saved, or run by two
+    # processes at once, meets occurrences already written.
+    store.add_recurring("ann", "Food", "Lunch", 250, "* * MON-FRI", "2024-06-03")
+    written = store.materialize_recurring(date(2024, 6, 30))
+    assert written == 20
+    with store.transaction() as cur:
+        cur.execute("UPDATE recurring SET next_date='2024-06-03'")
+    assert store.materialize_recurring(date(2024, 7, 5)) == 5
+    assert len(recurring_expenses(store)) == 25
+    assert store.verify_rollups() == []
+
+
+def test_rule_ends(store):
+    store.add_recurring("ann", "Bills", "Gym", 999, "L * *", "2024-01-01", "2024-03-15")
+    assert store.materialize_recurring(date(2024, 12, 31)) == 2
+    assert [row[0] for row in recurring_expenses(store)] == ["2024-01-31", "2024-02-29"]
+    assert store.recurring_rules("ann")[0][-1] is None
+    assert store.materialize_recurring(date(2025, 12, 31)) == 0
+
+
+def test_deleted_rule_keeps_its_expenses(store):
+    rule = store.add_recurring("ann", "Bills", "Phone", 500, "@monthly", "2024-01-01")
+    store.materialize_recurring(date(2024, 3, 1))
+    assert store.delete_recurring("ann", rule)
+    assert store.materialize_recurring(date(2024, 6, 1)) == 0
+    assert len(recurring_expenses(store)) == 3
+
+
+def test_rule_that_never_fires(store):
+    with pytest.raises(ValueError):
+        store.add_recurring("ann", "Bills", "Never", 1, "31 2 *", "2024-01-01")
+    with pytest.raises(ValueError):
+        store.add_recurring("ann", "Bills", "Too late", 1, "1 * *", "2024-01-02", "2024-01-31")
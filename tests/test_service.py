@@ -0,0 +1,77 @@
+import asyncio
+import types
+
+import pytest
+
+import service
+from service import ExpenseService, HTTPError
+
+
+@pytest.fixture
+def svc(store):
+    svc = ExpenseService(store)
+    run(svc.register(request(body={"username": "ann", "password": "pw"})))
+    yield svc
+    svc.shutdown()
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+def request(user=None, token=None, query=None, body=None):
+    return types.SimpleNamespace(user=user, token=token, query=query or {}, body=body or {})
+
+
+def login(svc):
+    return run(svc.login(request(body={"username": "ann", "password": "pw"})))[1]["token"]
+
+
+# ---------------- Sessions ----------------
+def test_idle_sessions_expire(svc, monkeypatch):
+    clock = [1000.0]
+    monkeypatch.setattr(service.time, "monotonic", lambda: clock[0])
+    token = login(svc)
+    clock[0] += service.SESSION_IDLE - 1
+    assert svc._session_user(token) == "ann"
+    # Each request starts the idle period again.
+    clock[0] += service.SESSION_IDLE - 1
+    assert svc._session_user(token) == "ann"
+    clock[0] += service.SESSION_IDLE + 1
+    assert svc._session_user(token) is None
+    assert token not in svc.sessions
+
+
+def test_session_table_is_capped(svc, monkeypatch):
+    monkeypatch.setattr(service, "MAX_SESSIONS", 3)
+    tokens = [login(svc) for _ in range(3)]
+    svc._session_user(tokens[0])
+    newest = login(svc)
+    assert len(svc.sessions) == 3
+    # The least recently used token went, not the oldest login.
+    assert svc._session_user(tokens[1]) is None
+    assert [svc._session_user(t) for t in (tokens[0], tokens[2], newest)] == ["ann"] * 3
+
+
+def test_logout(svc):
+    token = login(svc)
+    run(svc.logout(request("ann", token)))
+    assert svc._session_user(token) is None
+
+
+# ---------------- Budgets ----------------
+def test_budget_for_unknown_category_is_rejected(svc):
+    with pytest.raises(HTTPError) as e:
+        run(svc.set_budget(request("ann", body={"limit": "500"}), "Foo"))
+    assert e.value.status == 400
+    assert run(svc.set_budget(request("ann", body={"limit": "500"}), "food")) == (200, {})
+    assert [row[0] for row in svc.store.budgets("ann")] == ["Food"]
+
+
+def test_alerts_take_the_previous_values(svc):
+    svc.store.set_budget("ann", "Food", 12000)
+    svc.store.add_expense("ann", "2024-05-03", "Food", "x", 10100)
+    query = {"date": "2024-05-03", "category": "Food", "amount": "101.00"}
+    assert run(svc.alerts(request("ann", query=query)))[1]["alerts"]
+    previous = {"previous_date": "2024-05-03", "previous_category": "Food", "previous_amount": "100.00"}
+    assert run(svc.alerts(request("ann", query=dict(query, **previous))))[1]["alerts"] == []